@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import shutil
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, Iterator, Optional
 
 from .project import ensure_src_on_path, profile_root
 
@@ -11,7 +12,18 @@ from .project import ensure_src_on_path, profile_root
 ensure_src_on_path()
 
 from core.auth import LoginStatus, YuqueAuth  # type: ignore  # noqa: E402
-from utils.browser import BrowserManager  # type: ignore  # noqa: E402
+from core.client import YuqueClient  # type: ignore  # noqa: E402
+
+
+# clients kept open by a running daemon, keyed by profile
+_warm_clients: Dict[str, Any] = {}
+
+
+def set_warm_client(profile: str, client: Optional[Any]) -> None:
+    if client is None:
+        _warm_clients.pop(profile, None)
+    else:
+        _warm_clients[profile] = client
 
 
 @dataclass(frozen=True)
@@ -26,31 +38,88 @@ class ProfileAuth:
     def profile_cookies(self) -> Path:
         return self.state_dir / "cookies.json"
 
-    def status(self) -> Dict[str, str]:
+    @property
+    def login_cache(self) -> Path:
+        return self.state_dir / "login_check.json"
+
+    def status(self, no_browser: bool = False) -> Dict[str, Any]:
+        """Check the saved login via the cached result or a small API call.
+
+        The dashboard page is only loaded when the API answer is ambiguous and
+        a browser is allowed.
+        """
         self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._sync_profile_to_legacy()
+        auth = YuqueAuth(login_cache_file=self.login_cache)
+        if no_browser or auth.has_valid_cookies():
+            client = YuqueClient(None)
+            client.auth = auth
+            status = client.verify_login()
+            return self._status_payload(status, "browserless", client.login_check_source)
+
+        from utils.browser import BrowserManager  # type: ignore
+
         manager = BrowserManager()
         page = manager.start(headless=True)
         try:
-            self._sync_profile_to_legacy()
-            auth = YuqueAuth()
-            status = auth.check_login_status(page)
+            client = YuqueClient(page)
+            client.auth = auth
+            status = client.verify_login()
             self._sync_legacy_to_profile()
-            return {
-                "profile": self.profile,
-                "status": _status_name(status),
-                "cookies_file": str(self.profile_cookies),
-                "has_local_cookies": self.profile_cookies.exists(),
-            }
+            return self._status_payload(status, "browser", client.login_check_source)
+        finally:
+            manager.quit()
+
+    def _status_payload(self, status: LoginStatus, mode: str, checked_via: Optional[str]) -> Dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "status": _status_name(status),
+            "mode": mode,
+            "checked_via": checked_via,
+            "cookies_file": str(self.profile_cookies),
+            "has_local_cookies": self.profile_cookies.exists(),
+        }
+
+    @contextmanager
+    def open_client(self, no_browser: bool = False) -> Iterator[Any]:
+        """Yield an authenticated YuqueClient.
+
+        Cookies saved for the profile are loaded straight into a requests
+        session; Chromium is only started when they are missing or expired
+        and ``no_browser`` is not set. Inside the daemon each request gets a
+        fork of the profile's warm client: connections and cookies are shared,
+        poll policy, rate limits and counters are the request's own.
+        """
+        warm = _warm_clients.get(self.profile)
+        if warm is not None:
+            yield warm.fork()
+            return
+
+        self._sync_profile_to_legacy()
+        auth = YuqueAuth()
+        if no_browser or auth.has_valid_cookies():
+            if not auth.read_cookies():
+                raise RuntimeError(f"login required: no saved cookies for profile {self.profile}")
+            yield YuqueClient(None)
+            return
+
+        from utils.browser import BrowserManager  # type: ignore
+
+        manager = BrowserManager()
+        page = manager.start(headless=True)
+        try:
+            auth.load_cookies(page)
+            yield YuqueClient(page)
         finally:
             manager.quit()
 
     def login(self) -> Dict[str, str]:
         self.state_dir.mkdir(parents=True, exist_ok=True)
+        from utils.browser import BrowserManager  # type: ignore
+
         manager = BrowserManager()
         page = manager.start(headless=False)
         try:
-            from core.client import YuqueClient  # type: ignore
-
             client = YuqueClient(page)
             ok = client.login()
             if ok:
@@ -64,7 +133,7 @@ class ProfileAuth:
             manager.quit()
 
     def logout(self) -> Dict[str, str]:
-        auth = YuqueAuth()
+        auth = YuqueAuth(login_cache_file=self.login_cache)
         auth.clear_credentials()
         if self.profile_cookies.exists():
             self.profile_cookies.unlink()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .defaults import DEFAULT_CACHE_TTL
+from .project import ensure_src_on_path, profile_root
+
+
+ensure_src_on_path()
+
+from core.models import Document, Repository  # type: ignore  # noqa: E402
+
+
+CACHE_VERSION = 1
+
+
+def cache_dir(profile: str) -> Path:
+    return profile_root(profile) / "cache"
+
+
+class CatalogCache:
+    """Profile-scoped cache of the repository list and per-book catalogs.
+
+    The repository list expires after ``ttl`` seconds. A cached catalog is reused
+    while its book's version marker (from the repository list) is unchanged, so
+    it is only re-downloaded when the book actually changed; books without a
+    marker fall back to the TTL.
+    """
+
+    def __init__(self, profile: str, ttl: float = DEFAULT_CACHE_TTL, refresh: bool = False):
+        self.profile = profile
+        self.ttl = ttl
+        self.refresh = refresh
+        self.root = cache_dir(profile)
+        self._lock = threading.Lock()
+        self._repos: Optional[List[Repository]] = None
+        self._repos_cached = False
+        self._counts = {
+            "repos": {"hits": 0, "misses": 0},
+            "catalogs": {"hits": 0, "misses": 0},
+        }
+
+    def repositories(self, client: Any, force: bool = False) -> List[Repository]:
+        with self._lock:
+            if self._repos is not None and not force:
+                return list(self._repos)
+        cached = None if self.refresh or force else self._read("repos.json")
+        repos = None
+        if cached is not None and time.time() - cached["saved_at"] < self.ttl:
+            repos = _load_items(Repository, cached)
+        hit = repos is not None
+        if hit:
+            self._count("repos", "hits")
+        else:
+            repos = client.get_repositories()
+            self._count("repos", "misses")
+            if repos:
+                self._write("repos.json", {"items": [r.to_dict() for r in repos]})
+        with self._lock:
+            self._repos = list(repos)
+            self._repos_cached = hit
+        return repos
+
+    def find_repo(self, client: Any, repo_id: int) -> Repository:
+        repo = _find(self.repositories(client), repo_id)
+        if repo is None and self._repos_cached:
+            # the cached list may predate the repository; fetch it once
+            repo = _find(self.repositories(client, force=True), repo_id)
+        if repo is None:
+            raise ValueError(f"repository not found: {repo_id}")
+        return repo
+
+    def catalog(self, client: Any, repo: Repository) -> List[Document]:
+        name = f"catalog/{int(repo.id)}.json"
+        marker = repo.version_marker
+        cached = None if self.refresh else self._read(name)
+        if cached is not None and _catalog_fresh(cached, marker, self.ttl):
+            nodes = _load_items(Document, cached)
+            if nodes is not None:
+                self._count("catalogs", "hits")
+                return nodes
+
+        nodes = client.get_catalog_nodes(repo)
+        self._count("catalogs", "misses")
+        if nodes:
+            self._write(name, {"marker": marker, "items": [n.to_dict() for n in nodes]})
+        return nodes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "refresh": self.refresh,
+                **{kind: dict(counts) for kind, counts in self._counts.items()},
+            }
+
+    def _count(self, kind: str, outcome: str) -> None:
+        with self._lock:
+            self._counts[kind][outcome] += 1
+
+    def _read(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with (self.root / name).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return None
+        return data
+
+    def _write(self, name: str, payload: Dict[str, Any]) -> None:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": CACHE_VERSION, "saved_at": time.time(), **payload}
+        fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            Path(tmp_name).replace(path)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+
+
+def _catalog_fresh(cached: Dict[str, Any], marker: str, ttl: float) -> bool:
+    if marker:
+        return cached.get("marker") == marker
+    return time.time() - cached.get("saved_at", 0) < ttl
+
+
+def _load_items(model: Any, cached: Dict[str, Any]) -> Optional[List[Any]]:
+    try:
+        return [model.from_dict(item) for item in cached["items"]]
+    except (KeyError, TypeError):
+        # written by an older model layout
+        return None
+
+
+def _find(repos: List[Repository], repo_id: int) -> Optional[Repository]:
+    return next((r for r in repos if int(r.id) == int(repo_id)), None)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.validators import PROFILE_RE
+from .project import profile_root
+
+
+NO_DAEMON_ENV = "CLI_ANYTHING_YUQUE_NO_DAEMON"
+GLOBAL_VALUE_OPTIONS = {"--profile", "--output-dir"}
+PATH_OPTIONS = {"--output-dir", "--stats", "--archive"}
+# --stream: the daemon replays output only after the command finishes;
+# --record/--replay swap the transport of the client, which the daemon shares
+LOCAL_ONLY_OPTIONS = {"--stream", "--record", "--replay"}
+FORWARDED_COMMANDS = {("repo", None), ("export", None), ("auth", "status")}
+
+
+def socket_path(profile: str) -> Path:
+    return profile_root(profile) / "daemon.sock"
+
+
+def should_forward(argv: List[str]) -> bool:
+    if os.environ.get(NO_DAEMON_ENV) == "1":
+        return False
+    if any(arg.split("=", 1)[0] in LOCAL_ONLY_OPTIONS for arg in argv):
+        return False
+    words = _command_words(argv)
+    if not words:
+        return False
+    group = words[0]
+    sub = words[1] if len(words) > 1 else None
+    return (group, None) in FORWARDED_COMMANDS or (group, sub) in FORWARDED_COMMANDS
+
+
+def profile_from_argv(argv: List[str]) -> str:
+    profile = "default"
+    for i, arg in enumerate(argv):
+        if arg == "--profile" and i + 1 < len(argv):
+            profile = argv[i + 1]
+        elif arg.startswith("--profile="):
+            profile = arg.split("=", 1)[1]
+    return profile
+
+
+def absolutize_argv(argv: List[str], cwd: str) -> List[str]:
+    """Make cwd-relative paths explicit, since the daemon runs in its own directory."""
+    result: List[str] = []
+    has_output_dir = False
+    it = iter(argv)
+    for arg in it:
+        name = arg.split("=", 1)[0]
+        if name not in PATH_OPTIONS:
+            result.append(arg)
+            continue
+        has_output_dir = has_output_dir or name == "--output-dir"
+        if "=" in arg:
+            result.append(f"{name}=" + os.path.join(cwd, os.path.expanduser(arg.split("=", 1)[1])))
+            continue
+        value = next(it, None)
+        result.append(arg)
+        if value is not None:
+            result.append(os.path.join(cwd, os.path.expanduser(value)))
+    if not has_output_dir:
+        # same location the exporter would pick relative to the caller's cwd
+        result = ["--output-dir", os.path.join(cwd, "yuque_export")] + result
+    return result
+
+
+def request(profile: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Send one request to the profile's daemon; None when no daemon is listening."""
+    path = socket_path(profile)
+    if not path.exists():
+        return None
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        # stale socket file left by a daemon that is no longer running
+        sock.close()
+        return None
+    with sock, sock.makefile("rw", encoding="utf-8") as stream:
+        stream.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise RuntimeError(f"daemon closed the connection: {path}")
+    return json.loads(line)
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Run argv in the daemon and replay its output; None when no daemon is running."""
+    profile = profile_from_argv(argv)
+    if not PROFILE_RE.match(profile):
+        return None
+    response = request(profile, {"op": "run", "argv": absolutize_argv(argv, os.getcwd())})
+    if response is None:
+        return None
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    sys.stdout.flush()
+    return int(response.get("exit_code", 0))
+
+
+class HarnessDaemon:
+    """Serve harness commands over a Unix socket with one warm client per profile."""
+
+    def __init__(self, profile: str, invoke: Callable[[List[str]], int], no_browser: bool = False):
+        self.profile = profile
+        self.invoke = invoke
+        self.no_browser = no_browser
+        self.path = socket_path(profile)
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[Any] = None
+
+    def serve(self, ready: Optional[threading.Event] = None) -> None:
+        import socketserver
+
+        from .auth import ProfileAuth, set_warm_client
+        from ..utils.output import ThreadRoutedStream
+
+        if request(self.profile, {"op": "ping"}, timeout=2) is not None:
+            raise RuntimeError(f"daemon already running for profile {self.profile}: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                response = daemon.handle(json.loads(line))
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        stdout, stderr = sys.stdout, sys.stderr
+        with ProfileAuth(self.profile).open_client(no_browser=self.no_browser) as client:
+            set_warm_client(self.profile, client)
+            sys.stdout = ThreadRoutedStream(0, stdout)
+            sys.stderr = ThreadRoutedStream(1, stderr)
+            old_umask = os.umask(0o077)
+            try:
+                self._server = socketserver.ThreadingUnixStreamServer(str(self.path), Handler)
+                self._server.daemon_threads = True
+            finally:
+                os.umask(old_umask)
+            try:
+                if ready is not None:
+                    ready.set()
+                self._server.serve_forever()
+            finally:
+                self._server.server_close()
+                self.path.unlink(missing_ok=True)
+                sys.stdout, sys.stderr = stdout, stderr
+                set_warm_client(self.profile, None)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def handle(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        op = payload.get("op")
+        if op == "ping":
+            return self.status()
+        if op == "stop":
+            self.shutdown()
+            return {**self.status(), "stopping": True}
+        if op == "run":
+            with self._lock:
+                self.requests += 1
+            return self._run(list(payload.get("argv", [])))
+        return {"exit_code": 2, "stdout": "", "stderr": f"unknown daemon op: {op}\n"}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "pid": os.getpid(),
+            "socket": str(self.path),
+            "started_at": self.started_at,
+            "requests": self.requests,
+        }
+
+    def _run(self, argv: List[str]) -> Dict[str, Any]:
+        from ..utils.output import captured_streams
+
+        out, err = io.StringIO(), io.StringIO()
+        with captured_streams(out, err):
+            exit_code = self.invoke(argv)
+        return {"exit_code": exit_code, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def _command_words(argv: List[str]) -> List[str]:
+    words: List[str] = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg in GLOBAL_VALUE_OPTIONS:
+            skip = True
+            continue
+        if arg.startswith("-"):
+            continue
+        words.append(arg)
+        if len(words) == 2:
+            break
+    return words
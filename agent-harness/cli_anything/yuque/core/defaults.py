@@ -0,0 +1,5 @@
+from __future__ import annotations
+
+# Kept free of heavy imports: the CLI reads these while building its options.
+DEFAULT_CACHE_TTL = 600.0
+DEFAULT_MAX_POLLS_PER_SECOND = 5.0
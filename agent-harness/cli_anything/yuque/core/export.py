@@ -1,20 +1,36 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+import posixpath
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from .audit import append_audit
 from .auth import ProfileAuth
+from .cache import CatalogCache
+from .defaults import DEFAULT_CACHE_TTL, DEFAULT_MAX_POLLS_PER_SECOND
+from .journal import RunJournal
 from .project import ensure_src_on_path
 
 
 ensure_src_on_path()
 
-from core.auth import YuqueAuth  # type: ignore  # noqa: E402
+from core.archive import ArchiveWriter, archive_kind  # type: ignore  # noqa: E402,F401
+from core.assets import AssetCache, AssetLocalizer  # type: ignore  # noqa: E402
+from core.blobstore import BlobStore  # type: ignore  # noqa: E402
+from core.catalog import CatalogTree  # type: ignore  # noqa: E402
 from core.client import ExportType, YuqueClient  # type: ignore  # noqa: E402
 from core.exporter import DocumentExporter  # type: ignore  # noqa: E402
-from utils.browser import BrowserManager  # type: ignore  # noqa: E402
+from core.manifest import ExportManifest  # type: ignore  # noqa: E402
+from core.metrics import DocMetrics, DocTiming, StageStats, write_rows  # type: ignore  # noqa: E402
+from core.pipeline import iter_polled, run_bounded  # type: ignore  # noqa: E402
+from core.poller import ExportPoller  # type: ignore  # noqa: E402
+from core.polling import PollPolicy  # type: ignore  # noqa: E402
 
 
 FORMAT_TO_EXPORT_TYPE = {
@@ -24,142 +40,745 @@ FORMAT_TO_EXPORT_TYPE = {
     "lake": ExportType.LAKEBOOK,
 }
 
+SUCCESS_STATUSES = {"ok", "empty", "directory", "skipped"}
+# archive output buffers each document in memory up to this size, then in a temp file
+ARCHIVE_SPOOL_BYTES = 8 * 1024 * 1024
+
+EventSink = Callable[[Dict[str, Any]], None]
+
 
 class ExportService:
-    def __init__(self, profile: str, output_dir: Optional[str] = None):
+    def __init__(
+        self,
+        profile: str,
+        output_dir: Optional[str] = None,
+        no_browser: bool = False,
+        poll_policy: Optional[PollPolicy] = None,
+        max_polls_per_second: float = DEFAULT_MAX_POLLS_PER_SECOND,
+        api_rate: Optional[float] = None,
+        download_rate: Optional[float] = None,
+        incremental: bool = False,
+        dedupe: bool = False,
+        localize_assets: bool = False,
+        asset_concurrency: int = 4,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        refresh: bool = False,
+        events: Optional[EventSink] = None,
+        stats_file: Optional[str] = None,
+        record: Optional[str] = None,
+        replay: Optional[str] = None,
+        replay_latency_scale: float = 1.0,
+        archive: Optional[str] = None,
+    ):
+        """``events`` receives progress events as they happen (plan, doc_started,
+        doc_finished, repo_finished, summary). When it is set, finished items are
+        only delivered through events and results carry no ``items`` list, so
+        memory does not grow with the number of documents. ``stats_file`` receives
+        the per-document timings of the run (CSV for a ``.csv`` suffix, else JSON).
+
+        ``dedupe`` stores every download once in a content-addressed blob store
+        under the output directory and hardlinks identical files to it.
+        ``localize_assets`` downloads the images and attachments referenced by
+        markdown exports into a shared cache under the output directory (at most
+        ``asset_concurrency`` at a time, each URL once) and rewrites the links to
+        relative paths.
+
+        ``record`` captures every HTTP exchange of the run into a cassette file;
+        ``replay`` serves a recorded cassette instead of the network (no login
+        needed), scaling recorded latencies by ``replay_latency_scale``. Both bypass
+        the repository cache so the cassette covers every request.
+
+        ``archive`` writes every document into one zip/tar archive (by suffix)
+        through a single writer thread instead of creating files under the output
+        directory; it excludes ``incremental``, ``dedupe`` and ``localize_assets``,
+        which work on the exported files.
+        """
+        if archive and (incremental or dedupe or localize_assets):
+            raise ValueError("archive output cannot be combined with incremental, dedupe or localize_assets")
         self.profile = profile
         self.output_dir = Path(output_dir).expanduser() if output_dir else None
+        self.no_browser = no_browser
+        self.poll_policy = poll_policy or PollPolicy()
+        self.max_polls_per_second = max_polls_per_second
+        self.api_rate = api_rate
+        self.download_rate = download_rate
+        self.incremental = incremental
+        self.dedupe = dedupe
+        self.localize_assets = localize_assets
+        self.asset_concurrency = asset_concurrency
+        self.record = Path(record).expanduser() if record else None
+        self.replay = Path(replay).expanduser() if replay else None
+        self.replay_latency_scale = replay_latency_scale
+        self.cassette: Optional[Dict[str, Any]] = None
+        self.cache = CatalogCache(profile, ttl=cache_ttl, refresh=refresh or bool(record or replay))
+        self.events = events
+        self._events_lock = threading.Lock()
+        self.stats_file = Path(stats_file).expanduser() if stats_file else None
+        self.archive = Path(archive).expanduser() if archive else None
+
+    @property
+    def streaming(self) -> bool:
+        return self.events is not None
+
+    def _emit(self, event: str, **fields: Any) -> None:
+        if self.events is None:
+            return
+        payload = {"event": event, "ts": datetime.now(timezone.utc).isoformat(), **fields}
+        with self._events_lock:
+            self.events(payload)
 
     def run(
         self,
         repo_id: int,
-        fmt: str,
+        fmt: Union[str, Sequence[str]],
         all_docs: bool,
         node_uuids: Iterable[str],
+        concurrency: int = 1,
     ) -> Dict[str, Any]:
-        auth = ProfileAuth(self.profile)
-        auth._sync_profile_to_legacy()
-        manager = BrowserManager()
-        page = manager.start(headless=True)
-        try:
-            auth = YuqueAuth()
-            auth.load_cookies(page)
-            client = YuqueClient(page)
-            repos = client.get_repositories()
-            repo = next((r for r in repos if int(r.id) == int(repo_id)), None)
-            if not repo:
-                raise ValueError(f"repository not found: {repo_id}")
+        """``fmt`` may name several formats: the catalog is planned once and every
+        (document, format) job runs through the same client, with items grouped
+        per document."""
+        fmt = _format_param(_formats(fmt))
+        node_uuids = list(node_uuids)
+        journal = self._create_journal("run", [repo_id], fmt, all_docs, node_uuids, concurrency)
+        return self._run_single(journal, repo_id, fmt, all_docs, node_uuids, concurrency)
+
+    def batch(
+        self,
+        repo_ids: Iterable[int],
+        fmt: Union[str, Sequence[str]],
+        all_docs: bool,
+        node_uuids: Iterable[str],
+        concurrency: int = 1,
+        repo_concurrency: int = 1,
+    ) -> Dict[str, Any]:
+        fmt = _format_param(_formats(fmt))
+        repo_ids = list(repo_ids)
+        node_uuids = list(node_uuids)
+        journal = self._create_journal(
+            "batch", repo_ids, fmt, all_docs, node_uuids, concurrency, repo_concurrency=repo_concurrency,
+        )
+        return self._run_batch(journal, repo_ids, fmt, all_docs, node_uuids, concurrency, repo_concurrency)
 
-            nodes = client.get_catalog_nodes(repo)
-            selected = _select_nodes(nodes, all_docs=all_docs, node_uuids=set(node_uuids))
+    def resume(self, run_id: str) -> Dict[str, Any]:
+        journal = RunJournal.open(self.profile, run_id)
+        params = journal.params
+        if params.get("archive"):
+            raise ValueError(
+                f"cannot resume an archive export: {params['archive']} is rewritten from scratch, run the export again"
+            )
+        self.output_dir = Path(params["output_dir"]) if params.get("output_dir") else None
+        self.incremental = bool(params.get("incremental"))
+        self.dedupe = bool(params.get("dedupe"))
+        self.localize_assets = bool(params.get("localize_assets"))
+        self.asset_concurrency = params.get("asset_concurrency", self.asset_concurrency)
+        args = (params["format"], params["all_docs"], params["node_uuids"], params["concurrency"])
+        if params["command"] == "batch":
+            return self._run_batch(journal, params["repo_ids"], *args, params.get("repo_concurrency", 1))
+        return self._run_single(journal, params["repo_ids"][0], *args)
 
-            exporter = DocumentExporter(output_dir=self.output_dir)
-            export_type = FORMAT_TO_EXPORT_TYPE[fmt]
-
-            exported = []
-            path_map = _build_path_map(nodes)
-            for doc in selected:
-                full_path = path_map.get(doc.uuid, "")
-                path_parts = full_path.split("/") if full_path else []
-                rel_dir = "/".join(path_parts[:-1]) if len(path_parts) > 1 else ""
-                extension = ".md" if fmt == "markdown" else f".{fmt}"
-                save_path = exporter.get_save_path(doc, repo.name, extension=extension, relative_path=rel_dir)
-
-                if doc.type == "TITLE":
-                    exported.append({"doc": asdict(doc), "status": "directory", "path": str(save_path.parent)})
-                    continue
-
-                url = client.export_document(doc, export_type)
-                if url == "EMPTY_DOC":
-                    save_path.touch(exist_ok=True)
-                    if fmt == "markdown":
-                        exporter.add_metadata(save_path, doc)
-                    exported.append({"doc": asdict(doc), "status": "empty", "path": str(save_path)})
-                    continue
-
-                if not url:
-                    exported.append({"doc": asdict(doc), "status": "failed", "path": str(save_path)})
-                    continue
-
-                ok = client.download_file(url, str(save_path))
-                if ok and fmt == "markdown":
-                    exporter.add_metadata(save_path, doc)
-                exported.append({"doc": asdict(doc), "status": "ok" if ok else "failed", "path": str(save_path)})
-
-            summary = {
-                "repo": asdict(repo),
+    def _create_journal(
+        self,
+        command: str,
+        repo_ids: List[int],
+        fmt: Union[str, List[str]],
+        all_docs: bool,
+        node_uuids: List[str],
+        concurrency: int,
+        repo_concurrency: int = 1,
+    ) -> RunJournal:
+        return RunJournal.create(
+            self.profile,
+            {
+                "command": command,
+                "repo_ids": repo_ids,
                 "format": fmt,
-                "requested": len(selected),
-                "success": len([x for x in exported if x["status"] in {"ok", "empty", "directory"}]),
-                "items": exported,
-            }
-            append_audit(
-                self.profile,
-                {
-                    "event": "export.run",
-                    "repo_id": repo_id,
-                    "format": fmt,
-                    "requested": summary["requested"],
-                    "success": summary["success"],
-                },
+                "all_docs": all_docs,
+                "node_uuids": node_uuids,
+                "concurrency": concurrency,
+                "repo_concurrency": repo_concurrency,
+                "incremental": self.incremental,
+                "dedupe": self.dedupe,
+                "localize_assets": self.localize_assets,
+                "asset_concurrency": self.asset_concurrency,
+                "archive": str(self.archive) if self.archive else None,
+                "output_dir": str(self.output_dir) if self.output_dir else None,
+            },
+        )
+
+    @contextmanager
+    def _session(self, journal: RunJournal, concurrency: int) -> Iterator[_RunContext]:
+        """One authenticated client (and poller/manifest) shared by every repo of a run."""
+        with self._open_client() as client:
+            client.poll_policy = self.poll_policy
+            client.set_rate_limits(api_rate=self.api_rate, download_rate=self.download_rate)
+            exporter = DocumentExporter(output_dir=self.output_dir)
+            manifest = ExportManifest(exporter.output_dir) if self.incremental else None
+            blobs = BlobStore(exporter.output_dir / BlobStore.DIR_NAME) if self.dedupe else None
+            assets = None
+            if self.localize_assets:
+                assets = AssetLocalizer(
+                    client, exporter.output_dir / AssetCache.DIR_NAME, concurrency=self.asset_concurrency,
+                )
+            archive = ArchiveWriter(self.archive) if self.archive is not None else None
+            try:
+                if concurrency > 1:
+                    with ExportPoller(client, max_polls_per_second=self.max_polls_per_second) as poller:
+                        yield _RunContext(client, exporter, journal, manifest, poller, blobs, assets, archive)
+                else:
+                    yield _RunContext(client, exporter, journal, manifest, None, blobs, assets, archive)
+            finally:
+                if archive is not None:
+                    archive.close()
+                if assets is not None:
+                    assets.close()
+                if manifest is not None:
+                    manifest.save()
+
+    @contextmanager
+    def _open_client(self) -> Iterator[Any]:
+        if self.replay is not None:
+            client = YuqueClient(None)
+            with client.replaying(str(self.replay), latency_scale=self.replay_latency_scale) as replayer:
+                try:
+                    yield client
+                finally:
+                    self.cassette = replayer.stats()
+            return
+        with ProfileAuth(self.profile).open_client(no_browser=self.no_browser) as client:
+            if self.record is None:
+                yield client
+                return
+            with client.recording(str(self.record)) as recorder:
+                try:
+                    yield client
+                finally:
+                    self.cassette = recorder.stats()
+
+    def _run_single(
+        self,
+        journal: RunJournal,
+        repo_id: int,
+        fmt: Union[str, List[str]],
+        all_docs: bool,
+        node_uuids: List[str],
+        concurrency: int,
+    ) -> Dict[str, Any]:
+        with self._session(journal, concurrency) as run:
+            summary = self._run_repo(run, repo_id, fmt, all_docs, node_uuids, concurrency)
+        self._finish_reports(run, summary)
+        journal.finish({"requested": summary["requested"], "success": summary["success"]})
+        self._emit("summary", data=summary)
+        return summary
+
+    def _run_batch(
+        self,
+        journal: RunJournal,
+        repo_ids: List[int],
+        fmt: Union[str, List[str]],
+        all_docs: bool,
+        node_uuids: List[str],
+        concurrency: int,
+        repo_concurrency: int = 1,
+    ) -> Dict[str, Any]:
+        with self._session(journal, concurrency) as run:
+            self.cache.repositories(run.client)
+            export_repo = partial(
+                self._run_repo, run, fmt=fmt, all_docs=all_docs, node_uuids=node_uuids, concurrency=concurrency,
             )
-            return summary
-        finally:
-            manager.quit()
-
-    def batch(self, repo_ids: Iterable[int], fmt: str, all_docs: bool, node_uuids: Iterable[str]) -> Dict[str, Any]:
-        results = [
-            self.run(repo_id=r, fmt=fmt, all_docs=all_docs, node_uuids=node_uuids)
-            for r in repo_ids
-        ]
-        return {
+            results = run_bounded(repo_ids, export_repo, repo_concurrency)
+            client_stats = _client_stats(run.client)
+        journal.finish({
+            "requested": sum(r["requested"] for r in results),
+            "success": sum(r["success"] for r in results),
+        })
+        summary = {
+            "run_id": journal.run_id,
             "count": len(results),
+            "repo_concurrency": repo_concurrency,
+            "client": client_stats,
             "results": results,
         }
+        self._finish_reports(run, summary)
+        self._emit("summary", data=summary)
+        return summary
+
+    def _finish_reports(self, run: _RunContext, summary: Dict[str, Any]) -> None:
+        if run.blobs is not None:
+            summary["dedupe"] = run.blobs.stats()
+        if run.assets is not None:
+            summary["assets"] = run.assets.stats()
+        if run.archive is not None:
+            summary["archive"] = run.archive.stats()
+        if self.cassette is not None:
+            summary["cassette"] = self.cassette
+        if self.stats_file is not None:
+            rows = [row for metrics in run.doc_metrics for row in metrics.rows()]
+            summary["stats_file"] = str(write_rows(self.stats_file, rows))
+
+    def _run_repo(
+        self,
+        run: _RunContext,
+        repo_id: int,
+        fmt: Union[str, List[str]],
+        all_docs: bool,
+        node_uuids: List[str],
+        concurrency: int,
+    ) -> Dict[str, Any]:
+        client, exporter, journal, manifest = run.client, run.exporter, run.journal, run.manifest
+        repo = self.cache.find_repo(client, repo_id)
+        nodes = self.cache.catalog(client, repo)
+        tree = CatalogTree(nodes)
+        selected = list(nodes) if all_docs else tree.select(node_uuids)
+        fmts = _formats(fmt)
+        jobs = _plan_jobs(selected, fmts)
+        # archive entries are renamed by the writer itself
+        renames = _reserve_names(exporter, repo, tree, jobs) if run.archive is None else {}
+
+        stats = StageStats()
+        metrics = DocMetrics(keep_rows=self.stats_file is not None)
+        run.doc_metrics.append(metrics)
+        resumed = journal.completed(repo_id)
+        pending, carried, counts = _plan_incremental(
+            manifest, [job for job in jobs if _job_key(*job) not in resumed],
+        )
+        resumed_keys = [_job_key(*job) for job in jobs if _job_key(*job) in resumed]
+        carried.update({key: resumed[key] for key in resumed_keys})
+        self._emit(
+            "plan",
+            run_id=journal.run_id,
+            repo=repo.to_dict(),
+            format=fmt,
+            requested=len(selected),
+            jobs=len(jobs),
+            pending=len(pending),
+            resumed=len(resumed_keys),
+            incremental=counts,
+        )
+        if self.streaming:
+            for key, item in carried.items():
+                self._emit("doc_finished", repo_id=repo_id, item=item)
+                carried[key] = _compact_item(item)
+
+        def on_started(doc: Any, doc_fmt: str) -> None:
+            self._emit(
+                "doc_started", repo_id=repo_id, uuid=doc.uuid, title=doc.title, type=doc.type, format=doc_fmt,
+            )
+
+        def on_done(doc: Any, doc_fmt: str, item: Dict[str, Any]) -> Dict[str, Any]:
+            if run.assets is not None and doc_fmt == "markdown" and item["status"] == "ok":
+                # before the manifest hashes the file, so incremental runs see the rewritten links
+                with stats.track("assets"):
+                    item["assets"] = run.assets.localize(Path(item["path"]))
+            if manifest is not None and item["status"] in {"ok", "empty"}:
+                manifest.record(doc, doc_fmt, Path(item["path"]))
+            if "timing" in item:
+                metrics.add(
+                    item["timing"], repo_id=repo_id, uuid=doc.uuid, doc_id=doc.doc_id,
+                    title=doc.title, format=doc_fmt, status=item["status"], path=item["path"],
+                )
+            journal.record(repo_id, item)
+            if not self.streaming:
+                return item
+            self._emit("doc_finished", repo_id=repo_id, item=item)
+            return _compact_item(item)
+
+        if run.poller is not None:
+            exported = _export_polled(
+                client, exporter, repo, tree, stats, run.blobs, run.archive, renames,
+                pending, concurrency, run.poller, on_done, on_started,
+            )
+        else:
+            export_one = partial(
+                _export_doc, client, exporter, repo, tree, stats, run.blobs, run.archive, renames, on_done, on_started,
+            )
+            exported = run_bounded(pending, export_one, concurrency)
+        items = _merge_items(jobs, carried, exported)
+        job_success = len([x for x in items if x["status"] in SUCCESS_STATUSES])
+        if len(fmts) > 1:
+            items = _group_items(jobs, items)
+
+        summary = {
+            "run_id": journal.run_id,
+            "repo": repo.to_dict(),
+            "format": fmt,
+            "requested": len(selected),
+            "success": len([x for x in items if x["status"] in SUCCESS_STATUSES]),
+            "jobs": {"requested": len(jobs), "success": job_success},
+            "resumed": len(resumed_keys),
+            "incremental": counts,
+            "concurrency": concurrency,
+            "throughput": stats.summary(),
+            "doc_metrics": metrics.summary(),
+            **_client_stats(client),
+        }
+        if not self.streaming:
+            summary["items"] = items
+        append_audit(
+            self.profile,
+            {
+                "event": "export.run",
+                "run_id": journal.run_id,
+                "repo_id": repo_id,
+                "format": fmt,
+                "requested": summary["requested"],
+                "success": summary["success"],
+                "resumed": summary["resumed"],
+                "concurrency": concurrency,
+                "incremental": counts,
+                "polling": summary["polling"],
+            },
+        )
+        self._emit("repo_finished", repo_id=repo_id, data=summary)
+        return summary
+
+
+@dataclass
+class _RunContext:
+    client: Any
+    exporter: Any
+    journal: RunJournal
+    manifest: Optional[ExportManifest]
+    poller: Optional[ExportPoller]
+    blobs: Optional[BlobStore] = None
+    assets: Optional[AssetLocalizer] = None
+    archive: Optional[ArchiveWriter] = None
+    doc_metrics: List[DocMetrics] = field(default_factory=list)
+
+
+def _client_stats(client: Any) -> Dict[str, Any]:
+    # client-wide counters; in a batch they accumulate across repos sharing the client
+    return {
+        "cdp_calls": client.cdp_calls,
+        "polling": client.export_latency.summary(),
+        "export_requests": client.export_requests,
+        "rate_limit": client.rate_limit_stats(),
+    }
+
+
+def build_poll_policy(deadline: Optional[float] = None, max_interval: Optional[float] = None) -> PollPolicy:
+    policy = PollPolicy()
+    if deadline is not None:
+        policy = replace(policy, deadline=deadline, format_deadlines={})
+    if max_interval is not None:
+        policy = replace(policy, max_interval=max_interval)
+    return policy
+
+
+def _formats(fmt: Union[str, Sequence[str]]) -> List[str]:
+    """Normalize one format or several to a de-duplicated list."""
+    fmts = [fmt] if isinstance(fmt, str) else list(dict.fromkeys(fmt))
+    if not fmts:
+        raise ValueError("at least one format is required")
+    return fmts
+
+
+def _format_param(fmts: List[str]) -> Union[str, List[str]]:
+    # single-format runs keep the plain string in journals, events and results
+    return fmts[0] if len(fmts) == 1 else list(fmts)
+
+
+def _plan_jobs(docs: List[Any], fmts: List[str]) -> List[Tuple[Any, str]]:
+    """One (doc, format) job per document and format, document-major; folders once."""
+    jobs: List[Tuple[Any, str]] = []
+    for doc in docs:
+        if doc.type == "TITLE":
+            jobs.append((doc, fmts[0]))
+        else:
+            jobs.extend((doc, fmt) for fmt in fmts)
+    return jobs
+
+
+def _job_key(doc: Any, fmt: str) -> str:
+    return f"{doc.uuid}:{fmt}"
+
+
+def _extension(fmt: str) -> str:
+    return ".md" if fmt == "markdown" else f".{fmt}"
+
+
+def _reserve_names(exporter: Any, repo: Any, tree: CatalogTree, jobs: List[Tuple[Any, str]]) -> Dict[str, str]:
+    """File names for jobs whose save path another job already took, by job key.
+
+    Same-titled documents in one folder would otherwise share a file (and, downloaded
+    concurrently, its .part). Reserved in catalog order before dispatch, so every run
+    picks the same names; the later document gets its slug appended, like archive entries.
+    """
+    taken = set()
+    renames: Dict[str, str] = {}
+    for doc, fmt in jobs:
+        if doc.type == "TITLE":
+            continue
+        path = exporter.relative_save_path(
+            doc, repo.name, extension=_extension(fmt), relative_path=tree.dir_path(doc.uuid),
+        )
+        tag = doc.slug or str(doc.id)
+        candidate, index = path, 1
+        # case-insensitive file systems would still collide
+        while candidate.as_posix().casefold() in taken:
+            index += 1
+            suffix = f"-{tag}" if index == 2 else f"-{tag}-{index}"
+            candidate = path.with_name(f"{path.stem}{suffix}{path.suffix}")
+        taken.add(candidate.as_posix().casefold())
+        if candidate != path:
+            renames[_job_key(doc, fmt)] = candidate.name
+    return renames
+
+
+def _export_doc(
+    client: Any,
+    exporter: Any,
+    repo: Any,
+    tree: CatalogTree,
+    stats: StageStats,
+    blobs: Optional[BlobStore],
+    archive: Optional[ArchiveWriter],
+    renames: Dict[str, str],
+    on_done: Optional[Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]],
+    on_started: Optional[Callable[[Any, str], None]],
+    job: Tuple[Any, str],
+) -> Dict[str, Any]:
+    doc, fmt = job
+    if on_started is not None:
+        on_started(doc, fmt)
+    url, timing = None, None
+    if doc.type != "TITLE":
+        timing = DocTiming()
+        with stats.track("export"):
+            url = client.export_document(doc, FORMAT_TO_EXPORT_TYPE[fmt], timing=timing)
+    return _finish_doc(client, exporter, repo, tree, stats, blobs, archive, renames, on_done, doc, fmt, url, timing)
+
+
+def _finish_doc(
+    client: Any,
+    exporter: Any,
+    repo: Any,
+    tree: CatalogTree,
+    stats: StageStats,
+    blobs: Optional[BlobStore],
+    archive: Optional[ArchiveWriter],
+    renames: Dict[str, str],
+    on_done: Optional[Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]],
+    doc: Any,
+    fmt: str,
+    url: Optional[str],
+    timing: Optional[DocTiming] = None,
+) -> Dict[str, Any]:
+    item = _save_doc(client, exporter, repo, tree, stats, blobs, archive, renames, doc, fmt, url, timing)
+    if on_done is not None:
+        # on_done returns the value kept in the result list
+        item = on_done(doc, fmt, item)
+    return item
+
+
+def _save_doc(
+    client: Any,
+    exporter: Any,
+    repo: Any,
+    tree: CatalogTree,
+    stats: StageStats,
+    blobs: Optional[BlobStore],
+    archive: Optional[ArchiveWriter],
+    renames: Dict[str, str],
+    doc: Any,
+    fmt: str,
+    url: Optional[str],
+    timing: Optional[DocTiming] = None,
+) -> Dict[str, Any]:
+    rel_dir = tree.dir_path(doc.uuid)
+    extension = _extension(fmt)
+    if archive is not None:
+        return _archive_doc(client, exporter, repo, stats, archive, doc, fmt, url, timing, rel_dir, extension)
+
+    if doc.type == "TITLE":
+        save_path = exporter.get_save_path(doc, repo.name, extension=extension, relative_path=rel_dir)
+        return {"doc": doc.to_dict(), "format": fmt, "status": "directory", "path": str(save_path.parent)}
+
+    timing = timing or DocTiming()
+    with timing.track("write_seconds"):
+        save_path = exporter.get_save_path(doc, repo.name, extension=extension, relative_path=rel_dir)
+        save_path = save_path.with_name(renames.get(_job_key(doc, fmt), save_path.name))
+
+    if url == "EMPTY_DOC":
+        with timing.track("write_seconds"):
+            save_path.touch(exist_ok=True)
+            if fmt == "markdown":
+                exporter.add_metadata(save_path, doc)
+        return {
+            "doc": doc.to_dict(), "format": fmt, "status": "empty", "path": str(save_path), "timing": timing.to_dict(),
+        }
+
+    if not url:
+        return {
+            "doc": doc.to_dict(), "format": fmt, "status": "failed", "path": str(save_path), "timing": timing.to_dict(),
+        }
+
+    header_writer = exporter.front_matter_writer(doc) if fmt == "markdown" else None
+    with stats.track("download"):
+        ok = client.download_file(
+            url, str(save_path), header_writer=header_writer, timing=timing, blob_store=blobs,
+        )
+    return {
+        "doc": doc.to_dict(),
+        "format": fmt,
+        "status": "ok" if ok else "failed",
+        "path": str(save_path),
+        "timing": timing.to_dict(),
+    }
+
 
+def _archive_doc(
+    client: Any,
+    exporter: Any,
+    repo: Any,
+    stats: StageStats,
+    archive: ArchiveWriter,
+    doc: Any,
+    fmt: str,
+    url: Optional[str],
+    timing: Optional[DocTiming],
+    rel_dir: str,
+    extension: str,
+) -> Dict[str, Any]:
+    arcname = exporter.relative_save_path(doc, repo.name, extension=extension, relative_path=rel_dir).as_posix()
+    if doc.type == "TITLE":
+        folder = posixpath.dirname(arcname)
+        archive.add(folder)
+        return {"doc": doc.to_dict(), "format": fmt, "status": "directory", "path": folder}
 
-def _build_path_map(nodes: List[Any]) -> Dict[str, str]:
-    node_map = {node.uuid: node for node in nodes}
-    result: Dict[str, str] = {}
-    for node in nodes:
-        parts = []
-        current = node
-        visited: Set[str] = set()
-        while current:
-            if current.uuid in visited:
-                raise ValueError(f"cycle detected in catalog nodes at uuid={current.uuid}")
-            visited.add(current.uuid)
-            parts.insert(0, current.title)
-            current = node_map.get(current.parent_uuid)
-        result[node.uuid] = "/".join(parts)
-    return result
-
-
-def _collect_descendants(start: Any, children_map: Dict[str, List[Any]], acc: Set[str]) -> None:
-    stack: List[Any] = [start]
-    while stack:
-        node = stack.pop()
-        if node.uuid in acc:
+    timing = timing or DocTiming()
+    item = {"doc": doc.to_dict(), "format": fmt, "status": "failed", "path": arcname, "timing": timing.to_dict()}
+    if not url:
+        return item
+
+    header_writer = exporter.front_matter_writer(doc) if fmt == "markdown" else None
+    # the body is spooled so the single writer thread copies one whole entry at a time
+    spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+    if url == "EMPTY_DOC":
+        if header_writer is not None:
+            spool.write(header_writer(b""))
+        status = "empty"
+    else:
+        try:
+            with stats.track("download"):
+                ok = client.download_to(url, spool, header_writer=header_writer, timing=timing)
+        except BaseException:
+            spool.close()
+            raise
+        status = "ok" if ok else "failed"
+    if status == "failed":
+        spool.close()
+    else:
+        # add() owns the spool from here on and closes it even when it raises;
+        # documents with the same sanitized path get the slug appended instead of being dropped
+        with timing.track("write_seconds"), stats.track("archive"):
+            arcname = archive.add(arcname, spool, tag=doc.slug or str(doc.id))
+    return {**item, "status": status, "path": arcname, "timing": timing.to_dict()}
+
+
+def _export_polled(
+    client: Any,
+    exporter: Any,
+    repo: Any,
+    tree: CatalogTree,
+    stats: StageStats,
+    blobs: Optional[BlobStore],
+    archive: Optional[ArchiveWriter],
+    renames: Dict[str, str],
+    jobs: List[Tuple[Any, str]],
+    concurrency: int,
+    poller: ExportPoller,
+    on_done: Optional[Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]] = None,
+    on_started: Optional[Callable[[Any, str], None]] = None,
+) -> List[Dict[str, Any]]:
+    results: List[Any] = [None] * len(jobs)
+    # per-job timings live only while the job is in flight
+    timings: Dict[str, DocTiming] = {}
+
+    def prepare(job: Tuple[Any, str]) -> Optional[Tuple[Any, ExportType, StageStats, DocTiming]]:
+        doc, fmt = job
+        if on_started is not None:
+            on_started(doc, fmt)
+        if doc.type == "TITLE":
+            return None
+        timing = timings[_job_key(doc, fmt)] = DocTiming()
+        return doc, FORMAT_TO_EXPORT_TYPE[fmt], stats, timing
+
+    def finish(job: Tuple[Any, str], url: Optional[str]) -> Dict[str, Any]:
+        doc, fmt = job
+        timing = timings.pop(_job_key(doc, fmt), None)
+        return _finish_doc(
+            client, exporter, repo, tree, stats, blobs, archive, renames, on_done, doc, fmt, url, timing,
+        )
+
+    for index, item in iter_polled(
+        jobs,
+        prepare=prepare,
+        finish=finish,
+        poller=poller,
+        download_concurrency=concurrency,
+    ):
+        results[index] = item
+    return results
+
+
+def _plan_incremental(
+    manifest: Optional[ExportManifest],
+    jobs: List[Tuple[Any, str]],
+) -> Tuple[List[Tuple[Any, str]], Dict[str, Dict[str, Any]], Optional[Dict[str, int]]]:
+    if manifest is None:
+        return list(jobs), {}, None
+
+    counts = {"skipped": 0, "changed": 0, "new": 0}
+    pending: List[Tuple[Any, str]] = []
+    skipped: Dict[str, Dict[str, Any]] = {}
+    for doc, fmt in jobs:
+        if doc.type == "TITLE":
+            pending.append((doc, fmt))
             continue
-        acc.add(node.uuid)
-        stack.extend(children_map.get(node.uuid, []))
+        state = manifest.classify(doc, fmt)
+        if state == "unchanged":
+            entry = manifest.get(doc, fmt) or {}
+            path = manifest.root / entry.get("path", "")
+            skipped[_job_key(doc, fmt)] = {"doc": doc.to_dict(), "format": fmt, "status": "skipped", "path": str(path)}
+            counts["skipped"] += 1
+        else:
+            pending.append((doc, fmt))
+            counts[state] += 1
+    return pending, skipped, counts
+
 
+def _compact_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    # streamed runs keep only what the summary counts
+    return {"status": item["status"]}
 
-def _select_nodes(nodes: List[Any], all_docs: bool, node_uuids: Set[str]) -> List[Any]:
-    if all_docs:
-        return list(nodes)
-    if not node_uuids:
-        return []
 
-    node_map = {node.uuid: node for node in nodes}
-    children_map: Dict[str, List[Any]] = {}
-    for node in nodes:
-        children_map.setdefault(node.parent_uuid, []).append(node)
+def _merge_items(
+    jobs: List[Tuple[Any, str]],
+    skipped: Dict[str, Dict[str, Any]],
+    exported: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    if not skipped:
+        return exported
+    remaining = iter(exported)
+    return [skipped.get(_job_key(doc, fmt)) or next(remaining) for doc, fmt in jobs]
 
-    final_uuids: Set[str] = set()
-    for uuid in node_uuids:
-        node = node_map.get(uuid)
-        if node:
-            _collect_descendants(node, children_map, final_uuids)
 
-    return [node for node in nodes if node.uuid in final_uuids]
+def _group_items(jobs: List[Tuple[Any, str]], items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fold per-format items of a multi-format run into one item per document."""
+    groups: List[Dict[str, Any]] = []
+    last_uuid = None
+    for (doc, fmt), item in zip(jobs, items):
+        if doc.uuid != last_uuid:
+            groups.append({"doc": item["doc"]} if "doc" in item else {})
+            groups[-1]["formats"] = {}
+            last_uuid = doc.uuid
+        groups[-1]["formats"][fmt] = {k: v for k, v in item.items() if k not in ("doc", "format")}
+    for group in groups:
+        statuses = [entry["status"] for entry in group["formats"].values()]
+        failed = [status for status in statuses if status not in SUCCESS_STATUSES]
+        if failed:
+            group["status"] = failed[0]
+        else:
+            group["status"] = "ok" if "ok" in statuses else statuses[0]
+    return groups
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .project import profile_root
+
+
+DONE_STATUSES = {"ok", "empty", "directory", "skipped"}
+
+
+def runs_dir(profile: str) -> Path:
+    return profile_root(profile) / "runs"
+
+
+def new_run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+
+
+class RunJournal:
+    """Append-only JSONL journal of one export run; each line is flushed and fsynced."""
+
+    def __init__(self, profile: str, run_id: str):
+        self.profile = profile
+        self.run_id = run_id
+        self.path = runs_dir(profile) / f"{run_id}.jsonl"
+        self.params: Dict[str, Any] = {}
+        self.finished = False
+        self._done: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, profile: str, params: Dict[str, Any]) -> "RunJournal":
+        journal = cls(profile, new_run_id())
+        journal.path.parent.mkdir(parents=True, exist_ok=True)
+        journal.params = dict(params)
+        journal._append({"event": "start", "run_id": journal.run_id, "params": journal.params})
+        return journal
+
+    @classmethod
+    def open(cls, profile: str, run_id: str) -> "RunJournal":
+        journal = cls(profile, run_id)
+        if not journal.path.exists():
+            raise FileNotFoundError(f"run journal file not found: {journal.path}")
+        for record in _read_records(journal.path):
+            event = record.get("event")
+            if event == "start":
+                journal.params = record.get("params", {})
+            elif event == "doc":
+                item = record.get("item", {})
+                # journals written before multi-format runs carry no per-item format
+                fmt = item.get("format") or _first_format(journal.params)
+                key = _doc_key(record.get("repo_id"), item.get("doc", {}).get("uuid"), fmt)
+                if record["item"].get("status") in DONE_STATUSES:
+                    journal._done[key] = record["item"]
+                else:
+                    journal._done.pop(key, None)
+            elif event == "end":
+                journal.finished = True
+        if not journal.params:
+            raise ValueError(f"run journal has no start record: {journal.path}")
+        journal._append({"event": "resume"})
+        return journal
+
+    def completed(self, repo_id: int) -> Dict[str, Dict[str, Any]]:
+        """Successful items of one repo, keyed by ``<uuid>:<format>``."""
+        prefix = f"{repo_id}:"
+        with self._lock:
+            return {key[len(prefix):]: item for key, item in self._done.items() if key.startswith(prefix)}
+
+    def record(self, repo_id: int, item: Dict[str, Any]) -> None:
+        # items are not kept in memory: completed() serves resumes, which reload the file
+        self._append({"event": "doc", "repo_id": repo_id, "item": item})
+
+    def finish(self, summary: Dict[str, Any]) -> None:
+        self.finished = True
+        self._append({"event": "end", **summary})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(), **record}, ensure_ascii=False)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def list_runs(profile: str) -> List[Dict[str, Any]]:
+    result = []
+    for path in sorted(runs_dir(profile).glob("*.jsonl")):
+        records = _read_records(path)
+        start = next((r for r in records if r.get("event") == "start"), {})
+        result.append({
+            "run_id": path.stem,
+            "started_at": start.get("ts"),
+            "params": start.get("params", {}),
+            "documents": len([r for r in records if r.get("event") == "doc"]),
+            "finished": any(r.get("event") == "end" for r in records),
+        })
+    return result
+
+
+def _read_records(path: Path) -> List[Dict[str, Any]]:
+    records = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a crash can leave a torn last line
+                continue
+    return records
+
+
+def _doc_key(repo_id: Optional[int], uuid_: Optional[str], fmt: Optional[str]) -> str:
+    return f"{repo_id}:{uuid_}:{fmt}"
+
+
+def _first_format(params: Dict[str, Any]) -> Optional[str]:
+    fmt = params.get("format")
+    return fmt[0] if isinstance(fmt, list) else fmt
@@ -44,5 +44,6 @@ def project_paths(profile: str) -> Dict[str, str]:
         "cookies_file": str(state_dir / "cookies.json"),
         "session_file": str(state_dir / "session.json"),
         "audit_file": str(state_dir / "audit.log"),
+        "runs_dir": str(state_dir / "runs"),
         "default_output_dir": str(project_root() / "yuque_export"),
     }
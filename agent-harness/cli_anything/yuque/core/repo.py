@@ -1,54 +1,34 @@
 from __future__ import annotations
 
-from dataclasses import asdict
 from typing import Any, Dict, List
 
 from .auth import ProfileAuth
-from .project import ensure_src_on_path
-
-
-ensure_src_on_path()
-
-from core.auth import YuqueAuth  # type: ignore  # noqa: E402
-from core.client import YuqueClient  # type: ignore  # noqa: E402
-from utils.browser import BrowserManager  # type: ignore  # noqa: E402
+from .cache import CatalogCache
+from .defaults import DEFAULT_CACHE_TTL
 
 
 class RepoService:
-    def __init__(self, profile: str):
+    def __init__(
+        self,
+        profile: str,
+        no_browser: bool = False,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        refresh: bool = False,
+    ):
         self.profile = profile
+        self.no_browser = no_browser
+        self.cache = CatalogCache(profile, ttl=cache_ttl, refresh=refresh)
 
     def list_repos(self) -> List[Dict[str, Any]]:
-        auth = ProfileAuth(self.profile)
-        auth._sync_profile_to_legacy()
-        manager = BrowserManager()
-        page = manager.start(headless=True)
-        try:
-            auth = YuqueAuth()
-            auth.load_cookies(page)
-            client = YuqueClient(page)
-            repos = client.get_repositories()
-            return [asdict(repo) for repo in repos]
-        finally:
-            manager.quit()
+        with ProfileAuth(self.profile).open_client(no_browser=self.no_browser) as client:
+            repos = self.cache.repositories(client)
+            return [repo.to_dict() for repo in repos]
 
     def tree(self, repo_id: int) -> Dict[str, Any]:
-        auth = ProfileAuth(self.profile)
-        auth._sync_profile_to_legacy()
-        manager = BrowserManager()
-        page = manager.start(headless=True)
-        try:
-            auth = YuqueAuth()
-            auth.load_cookies(page)
-            client = YuqueClient(page)
-            repos = client.get_repositories()
-            target = next((r for r in repos if int(r.id) == int(repo_id)), None)
-            if not target:
-                raise ValueError(f"repository not found: {repo_id}")
-            nodes = client.get_catalog_nodes(target)
+        with ProfileAuth(self.profile).open_client(no_browser=self.no_browser) as client:
+            target = self.cache.find_repo(client, repo_id)
+            nodes = self.cache.catalog(client, target)
             return {
-                "repo": asdict(target),
-                "nodes": [asdict(n) for n in nodes],
+                "repo": target.to_dict(),
+                "nodes": [n.to_dict() for n in nodes],
             }
-        finally:
-            manager.quit()
@@ -0,0 +1,276 @@
+"""Local stand-in for the Yuque endpoints the exporter talks to.
+
+Serves the repository list, catalogs, the export trigger/poll endpoint and the
+attachment downloads over real HTTP on 127.0.0.1, so ``YuqueClient`` runs its
+actual retry, throttling, polling and resumable-download code. Latency and
+failures are driven by ``FakeYuqueConfig``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+EXPORT_RE = re.compile(r"^/api/docs/(\d+)/export$")
+ATTACHMENT_RE = re.compile(r"^/attachments/(\d+)\.(\w+)$")
+ASSET_RE = re.compile(r"^/attachments/assets/(\d+)\.png$")
+RANGE_RE = re.compile(r"^bytes=(\d+)-$")
+# value of the session cookie handed out by the API and of the download URL signatures
+SECRET = "s3cr3t"
+
+
+@dataclass
+class FakeYuqueConfig:
+    """Shape of the fake site and how badly it behaves.
+
+    ``*_every`` values fail every Nth request of that kind (0 disables them):
+    ``throttle_every`` with 429 and ``unavailable_every`` with 503, both carrying
+    ``Retry-After``, ``error_every`` with a plain 500;
+    ``download_bps`` caps each download stream (0 means unthrottled);
+    ``distinct_bodies`` makes documents share that many bodies (0 means all differ);
+    ``assets_per_doc`` images, drawn from a pool of ``shared_assets``, are linked
+    from every document body.
+    """
+
+    repos: int = 1
+    docs_per_repo: int = 40
+    doc_bytes: int = 16 * 1024
+    pending_seconds: float = 0.0
+    throttle_every: int = 0
+    retry_after: float = 0.05
+    error_every: int = 0
+    unavailable_every: int = 0
+    download_bps: float = 0.0
+    chunk_size: int = 16 * 1024
+    distinct_bodies: int = 0
+    assets_per_doc: int = 0
+    shared_assets: int = 8
+    asset_bytes: int = 8 * 1024
+
+
+class FakeYuqueServer:
+    """Threaded HTTP server; use as a context manager and point the client at ``url``."""
+
+    def __init__(self, config: Optional[FakeYuqueConfig] = None):
+        self.config = config or FakeYuqueConfig()
+        self._lock = threading.Lock()
+        self._triggered: Dict[int, float] = {}
+        self._seen: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {"api": 0, "export": 0, "download": 0, "assets": 0, "throttled": 0, "unavailable": 0, "errors": 0}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeYuqueServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-yuque", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def doc_ids(self, repo_id: int) -> List[int]:
+        base = repo_id * 100000
+        return [base + i for i in range(1, self.config.docs_per_repo + 1)]
+
+    def asset_url(self, asset_id: int) -> str:
+        return f"{self.url}/attachments/assets/{asset_id}.png"
+
+    def asset_ids(self, doc_id: int) -> List[int]:
+        return [(doc_id + i) % self.config.shared_assets for i in range(self.config.assets_per_doc)]
+
+    def asset_body(self, asset_id: int) -> bytes:
+        return hashlib.sha256(f"asset {asset_id}".encode("utf-8")).digest() * (self.config.asset_bytes // 32)
+
+    def body(self, doc_id: int) -> bytes:
+        if self.config.distinct_bodies:
+            doc_id = doc_id % self.config.distinct_bodies
+        # Yuque image links carry a display-only fragment
+        images = "".join(f"![img {a}]({self.asset_url(a)}#averageHue=%23f0f0f0)\n" for a in self.asset_ids(doc_id))
+        line = f"# doc {doc_id}\n\n".encode("utf-8")
+        if images:
+            line += images.encode("utf-8") + b"\n"
+        filler = hashlib.sha256(str(doc_id).encode("utf-8")).hexdigest().encode("ascii") + b"\n"
+        repeat = self.config.doc_bytes // len(filler) + 1
+        return (line + filler * repeat)[: self.config.doc_bytes]
+
+    def books(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "target": {
+                    "id": repo_id,
+                    "name": f"Bench{repo_id}",
+                    "slug": f"bench{repo_id}",
+                    "user": {"login": "bench"},
+                    "items_count": self.config.docs_per_repo,
+                    "updated_at": "2024-01-01T00:00:00.000Z",
+                    "content_updated_at": "2024-01-01T00:00:00.000Z",
+                }
+            }
+            for repo_id in range(1, self.config.repos + 1)
+        ]
+
+    def catalog(self, repo_id: int) -> List[Dict[str, Any]]:
+        folder = f"folder-{repo_id}"
+        nodes = [{"type": "TITLE", "title": "Folder", "uuid": folder, "parent_uuid": "", "doc_id": 0}]
+        for doc_id in self.doc_ids(repo_id):
+            nodes.append({
+                "type": "DOC",
+                "title": f"Doc {doc_id}",
+                "uuid": f"doc-{doc_id}",
+                "parent_uuid": folder,
+                "doc_id": doc_id,
+                "url": f"d{doc_id}",
+                "updated_at": "2024-01-01T00:00:00.000Z",
+            })
+        return nodes
+
+    def fault(self, kind: str) -> Optional[int]:
+        """Status code to fail this request with (429/503/500), or None to serve it."""
+        with self._lock:
+            self.counts[kind] += 1
+            seen = self._seen[kind] = self._seen.get(kind, 0) + 1
+            if self.config.throttle_every and seen % self.config.throttle_every == 0:
+                self.counts["throttled"] += 1
+                return 429
+            if self.config.unavailable_every and seen % self.config.unavailable_every == 0:
+                self.counts["unavailable"] += 1
+                return 503
+            if self.config.error_every and seen % self.config.error_every == 0:
+                self.counts["errors"] += 1
+                return 500
+        return None
+
+    def export_state(self, doc_id: int, fmt: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            started = self._triggered.setdefault(doc_id, now)
+        if now - started < self.config.pending_seconds:
+            return {"data": {"state": "pending"}}
+        # signed like the real CDN links; the signature must not end up in cassettes
+        return {"data": {"state": "success", "url": f"/attachments/{doc_id}.{fmt}?sign={SECRET}-{doc_id}"}}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+def _handler(server: FakeYuqueServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, like the real site; every response carries Content-Length.
+        # Headers and body go out in separate writes, so Nagle would add ~40ms each.
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *_args: Any) -> None:
+            return None
+
+        def do_GET(self) -> None:
+            parts = urlsplit(self.path)
+            match = ASSET_RE.match(parts.path)
+            if match:
+                self._asset(int(match.group(1)))
+                return
+            match = ATTACHMENT_RE.match(parts.path)
+            if match:
+                self._download(int(match.group(1)))
+                return
+            if self._failed("api"):
+                return
+            if parts.path == "/api/mine":
+                self._json(200, {"data": {"id": 1, "login": "bench"}})
+            elif parts.path == "/api/mine/common_used":
+                self._json(200, {"data": {"books": server.books()}})
+            elif parts.path == "/api/catalog_nodes":
+                book_id = int(parse_qs(parts.query).get("book_id", ["0"])[0])
+                self._json(200, {"data": server.catalog(book_id)})
+            else:
+                self._json(404, {"message": "not found"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            match = EXPORT_RE.match(urlsplit(self.path).path)
+            if not match:
+                self._json(404, {"message": "not found"})
+                return
+            if self._failed("export"):
+                return
+            fmt = "md" if payload.get("type") == "markdown" else payload.get("type", "bin")
+            self._json(200, server.export_state(int(match.group(1)), fmt))
+
+        def _failed(self, kind: str) -> bool:
+            status = server.fault(kind)
+            if status is None:
+                return False
+            headers = {"Retry-After": str(server.config.retry_after)} if status in (429, 503) else {}
+            self._json(status, {"message": "injected"}, headers)
+            return True
+
+        def _json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Set-Cookie", f"yuque_ctoken={SECRET}; Path=/")
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _download(self, doc_id: int) -> None:
+            if self._failed("download"):
+                return
+            body = server.body(doc_id)
+            etag = f'"{doc_id}"'
+            start, status = _range_start(self.headers.get("Range"), self.headers.get("If-Range"), etag)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body) - start))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self._stream(body[start:])
+
+        def _asset(self, asset_id: int) -> None:
+            if self._failed("assets"):
+                return
+            body = server.asset_body(asset_id)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self._stream(body)
+
+        def _stream(self, data: bytes) -> None:
+            chunk = server.config.chunk_size
+            bps = server.config.download_bps
+            started = time.monotonic()
+            for offset in range(0, len(data), chunk):
+                self.wfile.write(data[offset:offset + chunk])
+                if bps:
+                    ahead = (offset + chunk) / bps - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+    return Handler
+
+
+def _range_start(range_header: Optional[str], if_range: Optional[str], etag: str) -> Tuple[int, int]:
+    match = RANGE_RE.match(range_header or "")
+    if match and (if_range is None or if_range == etag):
+        return int(match.group(1)), 206
+    return 0, 200
@@ -0,0 +1,278 @@
+"""Throughput benchmarks for the real client against the local fake Yuque server.
+
+Each scenario exports a whole repository through ``ExportService`` with an
+unpatched ``YuqueClient`` and reports docs/minute and bytes/second. Floors are
+deliberately loose (``CLI_ANYTHING_BENCH_MIN_DOCS_PER_MIN``); set
+``CLI_ANYTHING_BENCH_REPORT`` to append each report as a JSON line for comparison
+between revisions, or run with ``-s`` to see them.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tarfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from cli_anything.yuque.core import cache as cache_mod
+from cli_anything.yuque.core import journal as journal_mod
+from cli_anything.yuque.core.export import ExportService
+from cli_anything.yuque.core.project import ensure_src_on_path
+from cli_anything.yuque.tests.fake_yuque import SECRET, FakeYuqueConfig, FakeYuqueServer
+
+
+ensure_src_on_path()
+
+from core.client import YuqueClient  # type: ignore  # noqa: E402
+from core.polling import PollPolicy  # type: ignore  # noqa: E402
+
+
+MIN_DOCS_PER_MIN = float(os.environ.get("CLI_ANYTHING_BENCH_MIN_DOCS_PER_MIN", "120"))
+REPORT_PATH = os.environ.get("CLI_ANYTHING_BENCH_REPORT")
+REPLAY_DOCS = int(os.environ.get("CLI_ANYTHING_BENCH_REPLAY_DOCS", "2000"))
+
+# server-side pending time is short, so poll it on a short leash
+FAST_POLLS = PollPolicy(first_delay=0.02, initial_interval=0.02, multiplier=1.5, max_interval=0.1, jitter=0.1)
+
+SCENARIOS = {
+    "sequential": (FakeYuqueConfig(pending_seconds=0.05), 1),
+    "concurrent": (FakeYuqueConfig(pending_seconds=0.05), 8),
+    "throttled": (FakeYuqueConfig(pending_seconds=0.05, throttle_every=15, retry_after=0.05), 8),
+    "server_errors": (FakeYuqueConfig(pending_seconds=0.05, error_every=9), 8),
+    "unavailable": (FakeYuqueConfig(pending_seconds=0.05, unavailable_every=11, retry_after=0.05), 8),
+    "slow_downloads": (FakeYuqueConfig(doc_bytes=128 * 1024, download_bps=512 * 1024), 8),
+}
+
+
+class _BenchTab:
+    """Stands in for the browser tab: supplies a cookie snapshot, nothing else."""
+
+    user_agent = "bench/1.0"
+
+    def cookies(self):
+        return [{"name": "_yuque_session", "value": "bench", "domain": "127.0.0.1", "path": "/"}]
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(journal_mod, "profile_root", lambda profile: tmp_path / "state" / profile)
+    monkeypatch.setattr(cache_mod, "profile_root", lambda profile: tmp_path / "state" / profile)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+
+def _serve(monkeypatch, server: FakeYuqueServer) -> List[Any]:
+    """Route ExportService's client to the fake server; returns the clients it opened."""
+    clients: List[Any] = []
+
+    class _ServerAuth:
+        def __init__(self, _profile: str):
+            pass
+
+        @contextmanager
+        def open_client(self, no_browser: bool = False):
+            client = YuqueClient(_BenchTab(), base_url=server.url)
+            clients.append(client)
+            yield client
+
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", _ServerAuth)
+    return clients
+
+
+def _timed_run(
+    output_dir: Path, concurrency: int, fmt: str = "markdown", **kwargs: Any
+) -> Tuple[Dict[str, Any], float]:
+    service = ExportService(
+        profile="bench",
+        output_dir=str(output_dir),
+        poll_policy=FAST_POLLS,
+        max_polls_per_second=500,
+        api_rate=500,
+        download_rate=500,
+        **kwargs,
+    )
+    started = time.perf_counter()
+    result = service.run(repo_id=1, fmt=fmt, all_docs=True, node_uuids=[], concurrency=concurrency)
+    return result, time.perf_counter() - started
+
+
+def _disk_usage(root: Path) -> int:
+    """Bytes under root, counting hardlinked files once."""
+    inodes = {}
+    for path in root.rglob("*"):
+        if path.is_file():
+            st = path.stat()
+            inodes[(st.st_dev, st.st_ino)] = st.st_size
+    return sum(inodes.values())
+
+
+def _report(name: str, concurrency: int, result: Dict[str, Any], seconds: float, **extra: Any) -> Dict[str, Any]:
+    docs = result["doc_metrics"]["count"]
+    report = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "docs": docs,
+        "seconds": round(seconds, 3),
+        "docs_per_minute": round(docs * 60 / seconds, 1),
+        "bytes_per_second": round(result["doc_metrics"]["bytes_total"] / seconds, 1),
+        "pending_p90": result["doc_metrics"]["pending_seconds"]["p90"],
+        "export_requests": result["export_requests"],
+        **extra,
+    }
+    print(json.dumps(report))
+    if REPORT_PATH:
+        with open(REPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+    return report
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_export_throughput_against_fake_server(monkeypatch, tmp_path: Path, name: str) -> None:
+    config, concurrency = SCENARIOS[name]
+    with FakeYuqueServer(config) as server:
+        clients = _serve(monkeypatch, server)
+        result, seconds = _timed_run(tmp_path / "out", concurrency)
+    report = _report(
+        name, concurrency, result, seconds,
+        server=server.stats(),
+        throttle_events=clients[0].rate_limit_stats()["api"]["throttle_events"],
+        download_throttle_events=clients[0].rate_limit_stats()["download"]["throttle_events"],
+    )
+
+    assert result["success"] == result["requested"] == config.docs_per_repo + 1
+    assert report["docs"] == config.docs_per_repo
+    assert report["docs_per_minute"] >= MIN_DOCS_PER_MIN
+    assert result["doc_metrics"]["bytes_total"] >= config.docs_per_repo * config.doc_bytes
+    sample = server.doc_ids(1)[0]
+    written = (tmp_path / "out" / "Bench1" / "Folder" / f"Doc {sample}.md").read_bytes()
+    assert written.endswith(server.body(sample))
+
+    if config.throttle_every:
+        # 429s reach the shared limiter instead of being retried inside urllib3
+        assert report["server"]["throttled"] > 0
+        assert report["throttle_events"] > 0
+    if config.unavailable_every:
+        # 503 + Retry-After is not retried inside urllib3 either, so it throttles the shared limiter
+        assert report["server"]["unavailable"] > 0
+        throttles = report["throttle_events"] + report["download_throttle_events"]
+        assert throttles == report["server"]["unavailable"]
+    if config.error_every:
+        assert report["server"]["errors"] > 0
+    if config.download_bps:
+        # each stream is capped, so aggregate throughput cannot beat the workers' sum
+        assert report["bytes_per_second"] <= config.download_bps * concurrency * 1.5
+
+
+def test_replay_cassette_reproduces_recorded_export(monkeypatch, tmp_path: Path) -> None:
+    config = FakeYuqueConfig(docs_per_repo=REPLAY_DOCS, doc_bytes=2048, pending_seconds=0.02)
+    cassette = tmp_path / "export.jsonl.gz"
+    with FakeYuqueServer(config) as server:
+        _serve(monkeypatch, server)
+        recorded, record_seconds = _timed_run(tmp_path / "recorded", 16, record=str(cassette))
+        server_stats = server.stats()
+    _report("record", 16, recorded, record_seconds, cassette=recorded["cassette"])
+
+    # the server is gone: replay must not touch the network or need a login
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", None)
+    replayed, replay_seconds = _timed_run(tmp_path / "replayed", 16, replay=str(cassette), replay_latency_scale=0)
+    report = _report("replay", 16, replayed, replay_seconds, cassette=replayed["cassette"])
+
+    total_requests = server_stats["api"] + server_stats["export"] + server_stats["download"]
+    assert recorded["cassette"]["exchanges"] == total_requests
+    assert replayed["success"] == recorded["success"] == REPLAY_DOCS + 1
+    assert replayed["cassette"]["served"] == total_requests
+    assert replayed["cassette"]["missing"] == 0
+    assert replayed["export_requests"] == recorded["export_requests"]
+    assert report["docs_per_minute"] >= MIN_DOCS_PER_MIN
+    sample = f"Doc {server.doc_ids(1)[0]}.md"
+    assert (tmp_path / "replayed" / "Bench1" / "Folder" / sample).stat().st_size == (
+        tmp_path / "recorded" / "Bench1" / "Folder" / sample
+    ).stat().st_size
+
+    with gzip.open(cassette, "rt", encoding="utf-8") as f:
+        text = f.read()
+    assert SECRET not in text
+    assert "yuque_ctoken" not in text
+
+
+@pytest.mark.parametrize("fmt", ["pdf", "markdown"])
+def test_dedupe_links_identical_downloads(monkeypatch, tmp_path: Path, fmt: str) -> None:
+    # blobs hold bodies only: markdown front matter differs per document, so those files get no blob
+    config = FakeYuqueConfig(docs_per_repo=60, doc_bytes=64 * 1024, pending_seconds=0.02, distinct_bodies=6)
+    with FakeYuqueServer(config) as server:
+        _serve(monkeypatch, server)
+        _timed_run(tmp_path / "plain", 8, fmt=fmt)
+        result, seconds = _timed_run(tmp_path / "out", 8, fmt=fmt, dedupe=True)
+    dedupe = result["dedupe"]
+    _report(f"dedupe_{fmt}", 8, result, seconds, dedupe=dedupe)
+
+    assert result["success"] == config.docs_per_repo + 1
+    assert dedupe["files"] == config.docs_per_repo
+    assert dedupe["deduplicated"] == config.docs_per_repo - config.distinct_bodies
+    blobs = [p for p in (tmp_path / "out" / ".yuque_blobs").rglob("*") if p.is_file()]
+    # --dedupe never costs disk space
+    assert _disk_usage(tmp_path / "out") <= _disk_usage(tmp_path / "plain")
+    if fmt == "markdown":
+        assert dedupe["prefixed"] == config.docs_per_repo
+        assert blobs == []
+        assert dedupe["bytes_saved"] == 0
+    elif dedupe["links"]["hardlink"]:
+        assert len(blobs) == config.distinct_bodies
+        assert dedupe["bytes_saved"] == dedupe["deduplicated"] * config.doc_bytes
+        assert _disk_usage(tmp_path / "out") < _disk_usage(tmp_path / "plain")
+        assert sorted(blob.read_bytes() for blob in blobs) == sorted({server.body(d) for d in server.doc_ids(1)})
+    folder = tmp_path / "out" / "Bench1" / "Folder"
+    suffix = ".md" if fmt == "markdown" else ".pdf"
+    for doc_id in server.doc_ids(1)[:12]:
+        data = (folder / f"Doc {doc_id}{suffix}").read_bytes()
+        if fmt == "markdown":
+            assert data.startswith(b"---\n") and data.endswith(server.body(doc_id))
+        else:
+            assert data == server.body(doc_id)
+
+
+def test_localize_assets_fetches_shared_images_once(monkeypatch, tmp_path: Path) -> None:
+    config = FakeYuqueConfig(docs_per_repo=80, pending_seconds=0.02, assets_per_doc=3, shared_assets=10)
+    with FakeYuqueServer(config) as server:
+        _serve(monkeypatch, server)
+        result, seconds = _timed_run(tmp_path / "out", 8, localize_assets=True, asset_concurrency=4)
+        server_stats = server.stats()
+    assets = result["assets"]
+    _report("localize_assets", 8, result, seconds, assets=assets, server=server_stats)
+
+    assert result["success"] == config.docs_per_repo + 1
+    assert server_stats["assets"] == assets["downloaded"] == config.shared_assets
+    assert assets["failed"] == 0
+    assert assets["reused"] == config.docs_per_repo * config.assets_per_doc - config.shared_assets
+    sample = server.doc_ids(1)[0]
+    text = (tmp_path / "out" / "Bench1" / "Folder" / f"Doc {sample}.md").read_text(encoding="utf-8")
+    assert server.url not in text
+    links = [line.split("](", 1)[1].rstrip(")") for line in text.splitlines() if line.startswith("![img")]
+    assert len(links) == config.assets_per_doc
+    for link, asset_id in zip(links, server.asset_ids(sample)):
+        assert link.startswith("../../.yuque_assets/")
+        assert (tmp_path / "out" / "Bench1" / "Folder" / link).read_bytes() == server.asset_body(asset_id)
+
+
+def test_archive_streams_every_document_into_one_tarball(monkeypatch, tmp_path: Path) -> None:
+    config = FakeYuqueConfig(docs_per_repo=60, doc_bytes=64 * 1024, pending_seconds=0.02)
+    archive = tmp_path / "bench.tar.gz"
+    with FakeYuqueServer(config) as server:
+        _serve(monkeypatch, server)
+        result, seconds = _timed_run(tmp_path / "out", 8, fmt="pdf", archive=str(archive))
+        bodies = {f"Bench1/Folder/Doc {doc_id}.pdf": server.body(doc_id) for doc_id in server.doc_ids(1)}
+    stats = result["archive"]
+    _report("archive", 8, result, seconds, archive=stats)
+
+    assert result["success"] == config.docs_per_repo + 1
+    assert stats["entries"] == config.docs_per_repo
+    assert stats["bytes"] == config.docs_per_repo * config.doc_bytes
+    assert not (tmp_path / "out").exists() or not any(p.is_file() for p in (tmp_path / "out").rglob("*"))
+    with tarfile.open(archive) as tf:
+        files = {m.name: tf.extractfile(m).read() for m in tf.getmembers() if m.isfile()}
+    assert files == bodies
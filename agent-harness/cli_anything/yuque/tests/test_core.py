@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import io
 import json
+import os
+import shutil
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, field, fields, make_dataclass
 from pathlib import Path
+from types import SimpleNamespace
 
 import click
 import pytest
+import requests
 
 from cli_anything.yuque.core import audit as audit_mod
+from cli_anything.yuque.core import auth as auth_mod
+from cli_anything.yuque.core import cache as cache_mod
+from cli_anything.yuque.core import daemon as daemon_mod
 from cli_anything.yuque.core import session as session_mod
+from cli_anything.yuque.core.project import ensure_src_on_path
 from cli_anything.yuque.utils import output as output_mod
 from cli_anything.yuque.utils import validators
 from cli_anything.yuque.yuque_cli import (
@@ -20,6 +33,25 @@ from cli_anything.yuque.yuque_cli import (
 )
 
 
+ensure_src_on_path()
+
+from core.archive import ArchiveWriter  # type: ignore  # noqa: E402
+from core.assets import AssetLocalizer, find_asset_urls  # type: ignore  # noqa: E402
+from core.auth import LoginStatus, YuqueAuth  # type: ignore  # noqa: E402
+from core.blobstore import BlobStore  # type: ignore  # noqa: E402
+from core.cassette import CassetteRecorder, load_entries, request_key  # type: ignore  # noqa: E402
+from core.catalog import CatalogTree  # type: ignore  # noqa: E402
+from core.client import ExportType, YuqueClient  # type: ignore  # noqa: E402
+from core.exporter import DocumentExporter  # type: ignore  # noqa: E402
+from core.manifest import ExportManifest, file_sha256  # type: ignore  # noqa: E402
+from core.metrics import DocMetrics, DocTiming, LatencyRecorder, StageStats, write_rows  # type: ignore  # noqa: E402
+from core.models import Document, Repository  # type: ignore  # noqa: E402
+from core.pipeline import iter_polled, run_bounded  # type: ignore  # noqa: E402
+from core.poller import ExportPoller  # type: ignore  # noqa: E402
+from core.polling import PollPolicy  # type: ignore  # noqa: E402
+from core.ratelimit import TokenBucket, parse_retry_after  # type: ignore  # noqa: E402
+
+
 def test_session_init_read_update(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(session_mod, "profile_root", lambda profile: tmp_path / profile)
     store = session_mod.SessionStore("default")
@@ -76,6 +108,7 @@ def test_validators() -> None:
         validators.validate_profile("bad profile")
 
     assert validators.validate_format("markdown") == "markdown"
+    assert validators.validate_formats(["markdown,pdf", "pdf", " word"]) == ["markdown", "pdf", "word"]
     with pytest.raises(click.BadParameter):
         validators.validate_format("md")
 
@@ -83,6 +116,13 @@ def test_validators() -> None:
     with pytest.raises(click.BadParameter):
         validators.validate_repo_id(0)
 
+    assert validators.validate_concurrency(8) == 8
+    assert validators.validate_run_id("20240101T000000Z-abc123") == "20240101T000000Z-abc123"
+    with pytest.raises(click.BadParameter):
+        validators.validate_run_id("../escape")
+    with pytest.raises(click.BadParameter):
+        validators.validate_concurrency(0)
+
     assert validators.validate_node_values(["  abcde  ", "", "fghi"]) == ["abcde", "fghi"]
     with pytest.raises(click.BadParameter):
         validators.validate_node_values(["x"])
@@ -108,3 +148,1146 @@ def test_append_audit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     assert len(lines) == 1
     data = json.loads(lines[0])
     assert data["event"] == "export.run"
+
+
+def test_run_bounded_preserves_order_and_bounds_inflight() -> None:
+    lock = threading.Lock()
+    state = {"inflight": 0, "peak": 0}
+
+    def worker(n: int) -> int:
+        with lock:
+            state["inflight"] += 1
+            state["peak"] = max(state["peak"], state["inflight"])
+        time.sleep(0.01 * (n % 3))
+        with lock:
+            state["inflight"] -= 1
+        return n * n
+
+    assert run_bounded(range(20), worker, concurrency=4) == [n * n for n in range(20)]
+    assert 1 < state["peak"] <= 4
+    assert run_bounded([1, 2, 3], worker, concurrency=1) == [1, 4, 9]
+
+
+CATALOG_BUDGET_MS = float(os.environ.get("CLI_ANYTHING_CATALOG_BUDGET_MS", "3000"))
+
+
+def _node(uuid: str, parent: str = "", title: str = "", type_: str = "DOC") -> Document:
+    return Document(id=0, title=title or uuid, slug=uuid, uuid=uuid, parent_uuid=parent, type=type_)
+
+
+def test_catalog_tree_paths_and_selection() -> None:
+    nodes = [
+        _node("g1", title="Group/A", type_="TITLE"),
+        _node("d1", "g1", title="Doc: one"),
+        _node("g2", "g1", title="Sub", type_="TITLE"),
+        _node("d2", "g2"),
+        _node("d3", "missing-parent"),
+    ]
+    tree = CatalogTree(nodes)
+
+    assert tree.path("d2") == "Group_A/Sub/d2"
+    assert tree.dir_path("d1") == "Group_A"
+    assert tree.dir_path("d3") == "" and tree.path("d3") == "d3"
+    assert [(n.uuid, level) for n, level in tree.walk()] == [("g1", 0), ("d1", 1), ("g2", 1), ("d2", 2), ("d3", 0)]
+    assert [n.uuid for n in tree.descendants("g2")] == ["g2", "d2"]
+    assert [n.uuid for n in tree.select(["d2", "g1", "nope"])] == ["g1", "d1", "g2", "d2"]
+
+    with pytest.raises(ValueError, match="cycle"):
+        CatalogTree([_node("a", "b"), _node("b", "a"), _node("c")])
+
+
+def test_catalog_tree_path_caches_ancestors(monkeypatch: pytest.MonkeyPatch) -> None:
+    import core.catalog as catalog_mod  # type: ignore
+
+    calls = []
+    monkeypatch.setattr(catalog_mod, "sanitize_filename", lambda title: calls.append(title) or title)
+    tree = CatalogTree([_node(f"c{i}", f"c{i - 1}" if i else "", title="t") for i in range(2_000)])
+
+    # leaves first: every ancestor is cached by the first walk up
+    paths = [tree.path(f"c{i}") for i in reversed(range(2_000))]
+    assert len(calls) == 2_000
+    assert paths[-1] == "t" and paths[0].count("/") == 1_999
+
+
+def test_catalog_tree_100k_nodes_within_budget() -> None:
+    # wide tree: every node has up to 10 children
+    wide = [_node(f"w{i}", f"w{(i - 1) // 10}" if i else "") for i in range(100_000)]
+    # deep chain: would overflow the recursion limit with a recursive walk
+    deep = [_node(f"c{i}", f"c{i - 1}" if i else "", title="t") for i in range(100_000)]
+
+    started = time.perf_counter()
+    wide_tree = CatalogTree(wide)
+    assert len(wide_tree.path_map()) == 100_000
+    assert len(wide_tree.select(["w1"])) > 10_000
+    deep_tree = CatalogTree(deep)
+    assert sum(1 for _ in deep_tree.walk()) == 100_000
+    assert len(deep_tree.descendants("c50000")) == 50_000
+    assert deep_tree.level("c99999") == 99_999
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    assert deep_tree.dir_path("c3") == "t/t/t"
+    assert elapsed_ms < CATALOG_BUDGET_MS, f"100k-node catalogs took {elapsed_ms:.0f}ms (budget {CATALOG_BUDGET_MS}ms)"
+
+
+def _catalog_peak_bytes(factory) -> int:
+    tracemalloc.start()
+    try:
+        nodes = [
+            factory(id=i, title=f"Doc {i}", slug=f"s{i}", uuid=f"u{i:08d}", parent_uuid=f"u{i // 10:08d}",
+                    doc_id=i, book_id=1, updated_at="2024-01-02T00:00:00.000Z")
+            for i in range(100_000)
+        ]
+        return tracemalloc.get_traced_memory()[1] if nodes else 0
+    finally:
+        tracemalloc.stop()
+
+
+def test_compact_models_memory_and_to_dict() -> None:
+    # the previous layout: per-instance __dict__ plus an always-allocated children list
+    legacy = make_dataclass(
+        "LegacyDocument",
+        [(f.name, f.type, field(default=f.default)) for f in fields(Document)]
+        + [("children", list, field(default_factory=list))],
+    )
+    doc = Document(id=1, title="t", slug="s", uuid="u", parent_uuid="p", updated_at="x")
+    assert not hasattr(doc, "__dict__")
+    expected = asdict(doc)
+    assert doc.to_dict() == expected
+    assert Document.from_dict({**expected, "children": []}) == doc
+    repo = Repository(id=1, name="n", slug="s", user_login="u")
+    assert Repository.from_dict(repo.to_dict()) == repo
+
+    compact, before = _catalog_peak_bytes(Document), _catalog_peak_bytes(legacy)
+    assert compact < before * 0.85, f"100k nodes: {compact / 1e6:.1f}MB compact vs {before / 1e6:.1f}MB legacy"
+
+
+def test_stage_stats_summary() -> None:
+    stats = StageStats()
+    with stats.track("download"):
+        pass
+    stats.record("download", 0.5)
+    summary = stats.summary()
+    assert summary["stages"]["download"]["count"] == 2
+    assert summary["stages"]["download"]["busy_seconds"] >= 0.5
+
+
+class _CountingTab:
+    user_agent = "UA/1.0"
+
+    def __init__(self) -> None:
+        self.cookie_reads = 0
+
+    def cookies(self):
+        self.cookie_reads += 1
+        return [{"name": "sid", "value": f"v{self.cookie_reads}", "domain": ".yuque.com", "path": "/"}]
+
+
+class _FakeResponse:
+    def __init__(
+        self,
+        status_code: int = 200,
+        payload=None,
+        url: str = "https://www.yuque.com/api/x",
+        headers=None,
+    ) -> None:
+        self.status_code = status_code
+        self.payload = payload if payload is not None else {"data": {}}
+        self.url = url
+        self.history = []
+        self.headers = headers or {}
+        self.text = json.dumps(self.payload)
+
+    def json(self):
+        return self.payload
+
+    def close(self) -> None:
+        return None
+
+
+def test_client_reuses_cookie_snapshot(monkeypatch: pytest.MonkeyPatch) -> None:
+    tab = _CountingTab()
+    client = YuqueClient(tab)
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _FakeResponse())
+
+    for _ in range(5):
+        assert client._request_api("GET", "https://www.yuque.com/api/x") == {"data": {}}
+
+    assert tab.cookie_reads == 1
+    assert client.cdp_calls == 2
+    assert client.session.cookies.get("sid") == "v1"
+    assert client.session.headers["User-Agent"] == "UA/1.0"
+
+
+def test_client_resyncs_cookies_on_401(monkeypatch: pytest.MonkeyPatch) -> None:
+    tab = _CountingTab()
+    client = YuqueClient(tab)
+    responses = [_FakeResponse(401, {}), _FakeResponse(200, {"data": {"ok": 1}})]
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: responses.pop(0))
+
+    assert client._request_api("GET", "https://www.yuque.com/api/x") == {"data": {"ok": 1}}
+    assert tab.cookie_reads == 2
+    assert client.session.cookies.get("sid") == "v2"
+
+
+def test_browserless_client_loads_saved_cookies(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cookies_file = tmp_path / "cookies.json"
+    monkeypatch.setattr(YuqueAuth, "CREDENTIALS_DIR", tmp_path)
+    monkeypatch.setattr(YuqueAuth, "COOKIES_FILE", cookies_file)
+
+    assert YuqueAuth().has_valid_cookies() is False
+
+    cookies_file.write_text(
+        json.dumps({"cookies": [{"name": "sid", "value": "saved", "domain": ".yuque.com", "expires": time.time() + 60}]}),
+        encoding="utf-8",
+    )
+    assert YuqueAuth().has_valid_cookies() is True
+
+    client = YuqueClient(None)
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _FakeResponse())
+    assert client.browserless is True
+    assert client._request_api("GET", "https://www.yuque.com/api/x") == {"data": {}}
+    assert client.session.cookies.get("sid") == "saved"
+    assert client.cdp_calls == 0
+
+    cookies_file.write_text(
+        json.dumps({"cookies": [{"name": "sid", "value": "old", "expires": time.time() - 60}]}),
+        encoding="utf-8",
+    )
+    assert YuqueAuth().has_valid_cookies() is False
+
+
+def test_verify_login_caches_api_result(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cookies_file = tmp_path / "cookies.json"
+    monkeypatch.setattr(YuqueAuth, "CREDENTIALS_DIR", tmp_path)
+    monkeypatch.setattr(YuqueAuth, "COOKIES_FILE", cookies_file)
+    cookies_file.write_text(json.dumps({"cookies": [{"name": "sid", "value": "saved"}]}), encoding="utf-8")
+    auth = YuqueAuth(login_cache_file=tmp_path / "login_check.json")
+
+    calls = []
+    client = YuqueClient(None)
+    client.auth = auth
+    monkeypatch.setattr(
+        client.session, "request", lambda _m, url, **_k: calls.append(url) or _FakeResponse(200, {"data": {"id": 7}})
+    )
+    assert client.verify_login() == LoginStatus.LOGGED_IN
+    assert client.login_check_source == "api"
+    assert calls == [YuqueClient.BASE_URL + YuqueClient.API_MINE]
+
+    # a second check within the TTL does not touch the network
+    assert client.verify_login() == LoginStatus.LOGGED_IN
+    assert client.login_check_source == "cache"
+    assert len(calls) == 1
+
+    # new cookies invalidate the cached result
+    cookies_file.write_text(json.dumps({"cookies": [{"name": "sid", "value": "other"}]}), encoding="utf-8")
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _FakeResponse(401, {}))
+    assert client.verify_login() == LoginStatus.EXPIRED
+    assert not auth.login_cache_file.exists()
+
+
+def test_verify_login_falls_back_to_page_when_ambiguous(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(YuqueAuth, "CREDENTIALS_DIR", tmp_path)
+    monkeypatch.setattr(YuqueAuth, "COOKIES_FILE", tmp_path / "cookies.json")
+    (tmp_path / "cookies.json").write_text(json.dumps({"cookies": [{"name": "sid", "value": "s"}]}), encoding="utf-8")
+    auth = YuqueAuth(login_cache_file=tmp_path / "login_check.json")
+    pages = []
+    monkeypatch.setattr(auth, "check_login_status", lambda tab: pages.append(tab) or LoginStatus.LOGGED_IN)
+
+    tab = _CountingTab()
+    client = YuqueClient(tab)
+    client.auth = auth
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _FakeResponse(502, {}))
+    assert client.verify_login() == LoginStatus.LOGGED_IN
+    assert client.login_check_source == "page"
+    assert pages == [tab]
+
+    browserless = YuqueClient(None)
+    browserless.auth = YuqueAuth(login_cache_file=tmp_path / "other.json")
+    monkeypatch.setattr(browserless.session, "request", lambda *_a, **_k: _FakeResponse(502, {}))
+    assert browserless.verify_login() == LoginStatus.EXPIRED
+
+
+def test_cassette_request_key_and_missing_replay(tmp_path: Path) -> None:
+    assert request_key("get", "https://www.yuque.com/api/catalog_nodes?book_id=1") == "GET /api/catalog_nodes?book_id=1"
+    assert request_key("GET", "https://cdn.example/attachments/1.md?sign=abc") == "GET /attachments/1.md"
+    md = request_key("POST", "https://x/api/docs/1/export", b'{"type": "markdown"}')
+    assert md != request_key("POST", "https://x/api/docs/1/export", b'{"type": "pdf"}')
+
+    cassette = tmp_path / "c.jsonl"
+    cassette.write_text(
+        json.dumps({"cassette": 1}) + "\n"
+        + json.dumps({"key": "GET /api/mine/common_used", "status": 200, "headers": {}, "elapsed": 0.5,
+                      "text": json.dumps({"data": {"books": [{"id": 3, "name": "R"}]}})}) + "\n",
+        encoding="utf-8",
+    )
+    client = YuqueClient(_CountingTab())
+    with client.replaying(str(cassette), latency_scale=0) as replayer:
+        assert [r.id for r in client.get_repositories()] == [3]
+        assert client.get_catalog_nodes(Repository(id=3, name="R", slug="r", user_login="u")) == []
+    assert replayer.stats()["served"] == 1
+    assert replayer.stats()["missing"] == 1
+    assert client.session.get_adapter("https://www.yuque.com") is client._adapter
+
+
+def test_export_request_counter_is_thread_safe(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client, "_request_api", lambda *_a, **_k: {"data": {"state": "pending"}})
+    doc = Document(id=1, title="t", slug="t")
+
+    def hammer() -> None:
+        for _ in range(500):
+            client.request_export(doc, ExportType.MARKDOWN)
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.export_requests == 8 * 500
+
+
+class _BodyAdapter(requests.adapters.BaseAdapter):
+    """Serves a fixed unread body, like a streamed download from the network."""
+
+    def __init__(self, body: bytes) -> None:
+        super().__init__()
+        self.body = body
+
+    def send(self, request, stream=False, **_kwargs):
+        from urllib3.response import HTTPResponse
+
+        headers = {"Content-Type": "application/pdf", "Content-Length": str(len(self.body))}
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.raw = HTTPResponse(body=io.BytesIO(self.body), headers=headers, status=200, preload_content=False)
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self) -> None:
+        return None
+
+
+class _CookieAdapter(_BodyAdapter):
+    """Records the Cookie header per URL and redirects yuque.com attachments to OSS."""
+
+    def __init__(self, body: bytes) -> None:
+        super().__init__(body)
+        self.cookies = {}
+
+    def send(self, request, stream=False, **kwargs):
+        self.cookies[request.url] = request.headers.get("Cookie")
+        if "www.yuque.com" not in request.url:
+            return super().send(request, stream=stream, **kwargs)
+        response = requests.Response()
+        response.status_code = 302
+        response.headers = requests.structures.CaseInsensitiveDict({"Location": "https://oss.example.com/b.pdf?sig=1"})
+        response.raw = io.BytesIO(b"")
+        response.request = request
+        response.url = request.url
+        return response
+
+
+def test_download_cookies_reach_other_domains() -> None:
+    client = YuqueClient(_CountingTab())
+    adapter = _CookieAdapter(b"%PDF")
+    client.session.mount("https://", adapter)
+    client.sync_cookies()
+
+    # the export URL may point at OSS/CDN/a custom domain directly, or redirect there
+    for url in ("https://cdn.example.com/a.pdf", "https://www.yuque.com/attachments/b.pdf"):
+        sink = io.BytesIO()
+        assert client.download_to(url, sink) and sink.getvalue() == b"%PDF"
+    assert adapter.cookies == {
+        "https://cdn.example.com/a.pdf": "sid=v1",
+        "https://www.yuque.com/attachments/b.pdf": "sid=v1",
+        "https://oss.example.com/b.pdf?sig=1": "sid=v1",
+    }
+    # API calls keep to the domain the browser scoped the cookie to
+    assert client.session.cookies.list_domains() == [".yuque.com"]
+
+
+def test_cassette_recorder_streams_downloads(tmp_path: Path) -> None:
+    body = b"x" * (3 * 1024 * 1024)
+    cassette = tmp_path / "c.jsonl"
+    recorder = CassetteRecorder(cassette, _BodyAdapter(body))
+
+    def get(url: str) -> requests.Response:
+        return recorder.send(requests.Request("GET", url).prepare(), stream=True)
+
+    response = get("https://cdn/a.pdf?sign=1")
+    # nothing buffered or written until the caller has read the body
+    assert response._content is False
+    assert load_entries(cassette)[1] == []
+    chunks = [len(c) for c in response.iter_content(1024 * 1024)]
+    assert chunks == [1024 * 1024] * 3
+
+    partial = get("https://cdn/b.pdf")
+    next(partial.iter_content(1024))
+    partial.close()
+    pending = get("https://cdn/c.pdf")
+    pending.raw.read(10)
+    recorder.close()
+
+    entries = {e["key"]: e for e in load_entries(cassette)[1]}
+    assert entries["GET /a.pdf"]["size"] == len(body)
+    assert entries["GET /b.pdf"]["size"] == 1024
+    assert entries["GET /c.pdf"]["size"] == 10
+    assert "text" not in entries["GET /a.pdf"] and entries["GET /a.pdf"]["url"] == "https://cdn/a.pdf"
+    assert recorder.stats()["exchanges"] == 3
+
+
+def test_client_fork_shares_session_and_limiters(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab(), api_rate=10)
+    client.sync_cookies()
+    fork, other = client.fork(), client.fork()
+
+    assert fork.session is client.session and fork._cookies_synced
+    fork.poll_policy = PollPolicy(deadline=1)
+    monkeypatch.setattr(fork, "_request_api", lambda *_a, **_k: {"data": {"state": "pending"}})
+    fork.request_export(Document(id=1, title="t", slug="t"), ExportType.MARKDOWN)
+
+    assert client.poll_policy.deadline == 180
+    assert (client.export_requests, fork.export_requests) == (0, 1)
+    assert (client.cdp_calls, fork.cdp_calls) == (2, 0)
+
+    # one account, one budget: both forks draw from the same bucket and share a 429
+    assert fork.limiters["api"] is other.limiters["api"] is client.limiters["api"]
+    fork.limiters["api"].acquire()
+    other.limiters["api"].acquire()
+    assert client.rate_limit_stats()["api"]["requests"] == 2
+    fork.limiters["api"].throttle(retry_after=0)
+    assert other.rate_limit_stats()["api"]["rate"] == 5
+    other.set_rate_limits(api_rate=20)
+    assert fork.limiters["api"] is other.limiters["api"]
+    assert fork.rate_limit_stats()["api"] == {**fork.rate_limit_stats()["api"], "base_rate": 20, "rate": 5}
+
+
+def test_poll_policy_backoff_is_capped() -> None:
+    policy = PollPolicy(first_delay=0.1, initial_interval=0.5, multiplier=2, max_interval=3, jitter=0)
+    delays = policy.delays()
+    assert [next(delays) for _ in range(6)] == [0.1, 0.5, 1.0, 2.0, 3, 3]
+    assert policy.deadline_for("pdf") > policy.deadline_for("markdown")
+    assert policy.deadline_for("markdown") == 180  # the wait before adaptive polling
+    assert PollPolicy(deadline=7, format_deadlines={}).deadline_for("pdf") == 7
+
+
+def test_export_document_records_latency_and_deadline(monkeypatch: pytest.MonkeyPatch) -> None:
+    fast = PollPolicy(first_delay=0, initial_interval=0.001, max_interval=0.002, jitter=0)
+    client = YuqueClient(_CountingTab(), poll_policy=fast)
+    doc = Document(id=1, title="t", slug="t")
+
+    states = [{"data": {"state": "pending"}}, {"data": {"state": "success", "url": "/attachments/1"}}]
+    monkeypatch.setattr(client, "_request_api", lambda *_a, **_k: states.pop(0))
+    timing = DocTiming()
+    assert client.export_document(doc, ExportType.MARKDOWN, timing=timing) == "https://www.yuque.com/attachments/1"
+    assert timing.polls == 2
+    assert timing.pending_seconds > 0
+
+    monkeypatch.setattr(client, "_request_api", lambda *_a, **_k: {"data": {"state": "pending"}})
+    stuck = PollPolicy(first_delay=0, initial_interval=0.001, max_interval=0.002, jitter=0, deadline=0.02, format_deadlines={})
+    assert client.export_document(doc, ExportType.PDF, policy=stuck) is None
+
+    summary = client.export_latency.summary()
+    assert summary["markdown"]["count"] == 1
+    assert summary["pdf"]["timeouts"] == 1
+
+
+class _PollingClient:
+    def __init__(self, pending_rounds: int) -> None:
+        self.poll_policy = PollPolicy(first_delay=0, initial_interval=0.001, max_interval=0.002, jitter=0)
+        self.export_latency = LatencyRecorder()
+        self.pending_rounds = pending_rounds
+        self.calls: dict = {}
+        self.threads: set = set()
+
+    def request_export(self, doc, _export_type):
+        self.threads.add(threading.current_thread().name)
+        seen = self.calls.get(doc.id, 0)
+        self.calls[doc.id] = seen + 1
+        if seen < self.pending_rounds:
+            return "pending", None
+        return "success", f"https://cdn/{doc.id}"
+
+
+def test_export_poller_batches_jobs_on_one_thread() -> None:
+    client = _PollingClient(pending_rounds=2)
+    docs = [Document(id=i, title=f"d{i}", slug=f"d{i}") for i in range(1, 9)]
+
+    with ExportPoller(client, max_polls_per_second=0) as poller:
+        timings = [DocTiming() for _ in docs]
+        futures = [poller.submit(doc, ExportType.MARKDOWN, timing=t) for doc, t in zip(docs, timings)]
+        urls = [f.result(timeout=5) for f in futures]
+
+    assert urls == [f"https://cdn/{doc.id}" for doc in docs]
+    assert all(count == 3 for count in client.calls.values())
+    assert all(t.polls == 3 and t.pending_seconds > 0 for t in timings)
+    assert client.threads == {"yuque-export-poller"}
+    assert client.export_latency.summary()["markdown"]["count"] == 8
+    assert poller.polls == 3 * len(docs)
+
+def test_iter_polled_stops_downloads_after_an_error(caplog: pytest.LogCaptureFixture) -> None:
+    from concurrent.futures import Future
+
+    class _LatePoller:
+        """The first export is ready at once, the rest finish after the caller gave up."""
+
+        def __init__(self) -> None:
+            self.timers = []
+
+        def submit(self, doc, _fmt):
+            future = Future()
+            if doc == 0:
+                future.set_result("https://cdn/0")
+            else:
+                timer = threading.Timer(0.05, future.set_result, args=(f"https://cdn/{doc}",))
+                timer.start()
+                self.timers.append(timer)
+            return future
+
+    def finish(doc, _url):
+        if doc == 0:
+            raise ValueError("disk full")
+        return doc
+
+    poller = _LatePoller()
+    with pytest.raises(ValueError, match="disk full"):
+        list(iter_polled(range(4), lambda d: (d, "pdf"), finish, poller, download_concurrency=2))
+    for timer in poller.timers:
+        timer.join()
+    assert "exception calling callback" not in caplog.text
+
+
+def test_export_poller_rate_limit_and_iter_polled() -> None:
+    client = _PollingClient(pending_rounds=0)
+    docs = [Document(id=i, title=f"d{i}", slug=f"d{i}", type="TITLE" if i == 1 else "DOC") for i in range(1, 6)]
+
+    started = time.monotonic()
+    with ExportPoller(client, max_polls_per_second=50) as poller:
+        results = dict(
+            iter_polled(
+                docs,
+                prepare=lambda d: None if d.type == "TITLE" else (d, ExportType.MARKDOWN),
+                finish=lambda d, url: (d.id, url),
+                poller=poller,
+                download_concurrency=2,
+            )
+        )
+    elapsed = time.monotonic() - started
+
+    assert results[0] == (1, None)
+    assert results[4] == (5, "https://cdn/5")
+    assert sum(client.calls.values()) == 4
+    assert elapsed >= 3 / 50
+
+
+def test_token_bucket_throttle_slows_all_callers() -> None:
+    bucket = TokenBucket(rate=100, burst=1)
+    bucket.acquire()
+    bucket.throttle(retry_after=0.05)
+    assert bucket.stats()["rate"] == 50
+
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.05
+    stats = bucket.stats()
+    assert stats["throttle_events"] == 1
+    assert stats["requests"] == 2
+
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_token_bucket_throttle_discards_idle_credit() -> None:
+    bucket = TokenBucket(rate=10, burst=5)
+    for _ in range(5):
+        bucket.acquire()
+    time.sleep(0.2)  # idle time before the 429 must not be credited afterwards
+    bucket.throttle(retry_after=0.05)
+
+    started = time.monotonic()
+    bucket.acquire()
+    # the pause, then one token at the halved rate (5/s)
+    assert time.monotonic() - started >= 0.05 + 0.18
+
+
+def test_client_backs_off_on_429(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab(), api_rate=1000)
+    responses = [
+        _FakeResponse(429, {}, headers={"Retry-After": "0.01"}),
+        _FakeResponse(200, {"data": {"ok": 1}}),
+    ]
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: responses.pop(0))
+
+    assert client._request_api("GET", "https://www.yuque.com/api/x") == {"data": {"ok": 1}}
+    stats = client.rate_limit_stats()
+    assert stats["api"]["throttle_events"] == 1
+    assert stats["api"]["rate"] == 500
+    assert stats["download"]["throttle_events"] == 0
+
+
+class _StreamResponse:
+    def __init__(self, status_code: int, body: bytes, headers=None, fail_after: int = -1) -> None:
+        self.status_code = status_code
+        self.body = body
+        self.headers = {"content-length": str(len(body)), **(headers or {})}
+        self.url = "https://cdn/file"
+        self.history = []
+        self.fail_after = fail_after
+
+    def iter_content(self, chunk_size: int = 1):
+        for i in range(0, len(self.body), 4):
+            if 0 <= self.fail_after <= i:
+                raise requests.ConnectionError("connection reset")
+            yield self.body[i:i + 4]
+
+    def close(self) -> None:
+        return None
+
+
+def test_same_titled_docs_download_concurrently_to_their_own_files(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from cli_anything.yuque.core import export as export_mod
+
+    docs = [
+        Document(id=i, title="无标题文档", slug=f"s{i}", uuid=f"u{i}", parent_uuid="", type="DOC", doc_id=i)
+        for i in range(1, 9)
+    ]
+    bodies = {f"https://cdn/{doc.id}": f"body {doc.id} ".encode("utf-8") * 64 for doc in docs}
+    # every download is in flight before any of them streams its body
+    barrier = threading.Barrier(len(docs))
+
+    def fake_request(method, url, **_kwargs):
+        barrier.wait(timeout=5)
+        return _StreamResponse(200, bodies[url])
+
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client.session, "request", fake_request)
+    exporter = DocumentExporter(output_dir=tmp_path)
+    repo, tree = SimpleNamespace(name="Repo"), CatalogTree(docs)
+    jobs = [(doc, "pdf") for doc in docs]
+    renames = export_mod._reserve_names(exporter, repo, tree, jobs)
+
+    def save(job):
+        doc, fmt = job
+        return export_mod._save_doc(
+            client, exporter, repo, tree, StageStats(), None, None, renames, doc, fmt, f"https://cdn/{doc.id}",
+        )
+
+    items = run_bounded(jobs, save, concurrency=len(docs))
+    assert [Path(item["path"]).name for item in items[:3]] == ["无标题文档.pdf", "无标题文档-s2.pdf", "无标题文档-s3.pdf"]
+    assert all(item["status"] == "ok" for item in items)
+    for doc, item in zip(docs, items):
+        assert Path(item["path"]).read_bytes() == bodies[f"https://cdn/{doc.id}"]
+    assert sorted(p.name for p in (tmp_path / "Repo").iterdir()) == sorted(Path(item["path"]).name for item in items)
+
+
+def test_download_file_resumes_part_with_range(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    body = b"0123456789abcdef"
+    sent_headers = []
+
+    def fake_request(method, url, headers=None, **_kwargs):
+        sent_headers.append(dict(headers or {}))
+        if len(sent_headers) == 1:
+            return _StreamResponse(200, body, headers={"ETag": '"v1"'}, fail_after=8)
+        start = int(headers["Range"].split("=")[1].rstrip("-"))
+        return _StreamResponse(206, body[start:])
+
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client.session, "request", fake_request)
+    target = tmp_path / "doc.pdf"
+
+    assert client.download_file("https://cdn/file", str(target)) is True
+    assert target.read_bytes() == body
+    assert sent_headers[1]["Range"] == "bytes=8-"
+    assert sent_headers[1]["If-Range"] == '"v1"'
+    assert not (tmp_path / "doc.pdf.part").exists()
+    assert not (tmp_path / "doc.pdf.part.json").exists()
+
+
+def test_download_file_keeps_part_on_failure(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(
+        client.session,
+        "request",
+        lambda *_a, **_k: _StreamResponse(200, b"0123456789", fail_after=4),
+    )
+    target = tmp_path / "doc.pdf"
+
+    assert client.download_file("https://cdn/file", str(target)) is False
+    assert not target.exists()
+    assert (tmp_path / "doc.pdf.part").read_bytes() == b"0123"
+
+
+def test_download_file_records_doc_timing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    body = b"0123456789abcdef"
+    responses = [_StreamResponse(200, body, headers={"ETag": '"v1"'}, fail_after=8), _StreamResponse(206, body[8:])]
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: responses.pop(0))
+    timing = DocTiming()
+
+    assert client.download_file("https://cdn/file", str(tmp_path / "doc.pdf"), timing=timing) is True
+    assert timing.bytes == len(body)
+    assert timing.download_seconds > 0
+    assert 0 < timing.write_seconds <= timing.download_seconds
+    assert timing.to_dict()["download_bps"] > 0
+
+
+def test_download_file_dedupes_identical_bodies(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    body = b"0123456789abcdef"
+    responses = [
+        _StreamResponse(200, body, headers={"ETag": '"v1"'}, fail_after=8),
+        _StreamResponse(206, body[8:]),
+        _StreamResponse(200, body),
+        _StreamResponse(200, b"other"),
+    ]
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: responses.pop(0))
+    store = BlobStore(tmp_path / BlobStore.DIR_NAME)
+    first, second, third = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+
+    # the first download is resumed, so its digest spans two responses
+    assert client.download_file("https://cdn/a", str(first), blob_store=store) is True
+    assert client.download_file("https://cdn/b", str(second), blob_store=store) is True
+    assert client.download_file("https://cdn/c", str(third), blob_store=store) is True
+
+    assert second.read_bytes() == body
+    assert not (tmp_path / "b.pdf.part").exists()
+    stats = store.stats()
+    assert stats["files"] == 3
+    assert stats["deduplicated"] == 1
+    assert stats["bytes_total"] == 2 * len(body) + 5
+    if stats["links"]["hardlink"]:
+        assert first.stat().st_ino == second.stat().st_ino
+        assert stats["bytes_saved"] == len(body)
+    assert stats["links"]["copy"] <= 1
+
+    # rewriting an exported file must not reach the shared blob
+    DocumentExporter(output_dir=tmp_path).add_metadata(first, Document(id=1, title="T", slug="t", doc_id=1))
+    assert first.read_bytes().startswith(b"---")
+    assert second.read_bytes() == body
+
+
+def test_download_file_dedupes_markdown_bodies_behind_front_matter(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    body = b"# same body\n" * 4
+    responses = [
+        _StreamResponse(200, body, headers={"ETag": '"v1"'}, fail_after=8),
+        _StreamResponse(206, body[8:]),
+        _StreamResponse(200, body),
+    ]
+    client = YuqueClient(_CountingTab())
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: responses.pop(0))
+    store = BlobStore(tmp_path / BlobStore.DIR_NAME)
+    exporter = DocumentExporter(output_dir=tmp_path)
+    docs = [Document(id=i, title=f"T{i}", slug=f"t{i}", doc_id=i) for i in (1, 2)]
+    paths = [tmp_path / "a.md", tmp_path / "b.md"]
+
+    # front matter differs per document (title, doc_id, exported_at); only the body is hashed
+    for doc, path in zip(docs, paths):
+        writer = exporter.front_matter_writer(doc)
+        assert client.download_file("https://cdn/x", str(path), header_writer=writer, blob_store=store) is True
+
+    stats = store.stats()
+    assert stats["files"] == 2 and stats["deduplicated"] == 1 and stats["prefixed"] == 2
+    assert stats["bytes_total"] == 2 * len(body)
+    assert stats["bytes_saved"] == 0  # each file keeps its own front matter
+    # a body blob nothing links to would only add to the disk use
+    assert not store.root.exists()
+    for doc, path in zip(docs, paths):
+        text = path.read_bytes()
+        assert text.startswith(b"---\ntitle: " + doc.title.encode()) and text.endswith(b"\n\n" + body)
+
+
+def test_find_asset_urls_skips_code_and_foreign_links() -> None:
+    text = (
+        "![a](https://cdn.nlark.com/yuque/0/a.png#averageHue=%23fff)\n"
+        "[doc](https://www.yuque.com/team/book/page) [pdf](https://www.yuque.com/attachments/yuque/0/b.pdf)\n"
+        '<img src="https://cdn.nlark.com/yuque/0/c.jpeg" width="10">\n'
+        "```\n![x](https://cdn.nlark.com/yuque/0/in-code.png)\n```\n"
+        "![again](https://cdn.nlark.com/yuque/0/a.png#averageHue=%23fff)\n"
+    )
+    assert find_asset_urls(text) == [
+        "https://cdn.nlark.com/yuque/0/a.png#averageHue=%23fff",
+        "https://www.yuque.com/attachments/yuque/0/b.pdf",
+        "https://cdn.nlark.com/yuque/0/c.jpeg",
+    ]
+
+
+class _AssetClient:
+    def __init__(self) -> None:
+        self.calls = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def download_file(self, url: str, save_path: str) -> bool:
+        with self.lock:
+            self.calls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if "missing" in url:
+            return False
+        Path(save_path).write_bytes(url.encode("utf-8"))
+        return True
+
+
+def test_asset_localizer_fetches_each_url_once_and_rewrites(tmp_path: Path) -> None:
+    client = _AssetClient()
+    docs = []
+    for i in range(6):
+        doc = tmp_path / "Repo" / f"dir{i % 2}" / f"doc{i}.md"
+        doc.parent.mkdir(parents=True, exist_ok=True)
+        images = "".join(f"![i](https://cdn.nlark.com/yuque/{(i + k) % 4}.png#x=1)\n" for k in range(3))
+        doc.write_text(images + "[gone](https://cdn.nlark.com/missing.zip)\n", encoding="utf-8")
+        docs.append(doc)
+    shared = tmp_path / "Repo" / "dir0" / "other.md"
+    os.link(docs[0], shared)
+
+    with AssetLocalizer(client, tmp_path / ".yuque_assets", concurrency=2) as localizer:
+        results = run_bounded(docs, localizer.localize, concurrency=6)
+        stats = localizer.stats()
+
+    images = [url for url in client.calls if "missing" not in url]
+    assert sorted(images) == [f"https://cdn.nlark.com/yuque/{k}.png" for k in range(4)]
+    # failures are not cached: documents arriving after one retry the URL
+    missing = len(client.calls) - len(images)
+    assert 1 <= missing <= 6
+    assert client.peak <= 2
+    assert results[0] == {"found": 4, "localized": 3, "failed": 1}
+    assert stats["downloaded"] == 4 and stats["urls"] == 5
+    assert stats["failed"] == missing and stats["retried"] == missing - 1
+    text = docs[0].read_text(encoding="utf-8")
+    assert "cdn.nlark.com/yuque" not in text
+    assert "(https://cdn.nlark.com/missing.zip)" in text
+    local = text.split("](", 1)[1].split(")", 1)[0]
+    assert local.startswith("../../.yuque_assets/")
+    assert (docs[0].parent / local).read_bytes() == b"https://cdn.nlark.com/yuque/0.png"
+    # rewritten through a new file, so a hardlinked copy keeps the original links
+    assert "cdn.nlark.com/yuque" in shared.read_text(encoding="utf-8")
+
+    again = AssetLocalizer(client, tmp_path / ".yuque_assets")
+    (tmp_path / "fresh.md").write_text("![i](https://cdn.nlark.com/yuque/1.png)", encoding="utf-8")
+    assert again.localize(tmp_path / "fresh.md")["localized"] == 1
+    again.close()
+    assert again.stats()["cached"] == 1
+    assert len(client.calls) == 4 + missing
+
+
+def test_asset_localizer_retries_failed_url_and_keeps_crlf(tmp_path: Path) -> None:
+    class FlakyClient(_AssetClient):
+        def download_file(self, url: str, save_path: str) -> bool:
+            first = url not in self.calls
+            ok = super().download_file(url, save_path)
+            return ok and not first
+
+    client = FlakyClient()
+    docs = []
+    for i in range(2):
+        doc = tmp_path / f"doc{i}.md"
+        doc.write_bytes(b"# T\r\n\r\n![i](https://cdn.nlark.com/yuque/0.png)\r\ntail\r\n")
+        docs.append(doc)
+
+    with AssetLocalizer(client, tmp_path / ".yuque_assets") as localizer:
+        assert localizer.localize(docs[0]) == {"found": 1, "localized": 0, "failed": 1}
+        assert localizer.localize(docs[1]) == {"found": 1, "localized": 1, "failed": 0}
+        assert localizer.stats()["retried"] == 1
+
+    assert docs[0].read_bytes().count(b"https://cdn.nlark.com") == 1
+    rewritten = docs[1].read_bytes()
+    assert b"https://" not in rewritten
+    assert rewritten.count(b"\r\n") == 4 and b"\n" not in rewritten.replace(b"\r\n", b"")
+
+
+def test_download_to_resumes_into_sink_with_front_matter(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab())
+    body = b"0123456789abcdef"
+    calls = []
+
+    def fake_request(method, url, headers=None, **_kwargs):
+        calls.append(dict(headers or {}))
+        if len(calls) == 1:
+            return _StreamResponse(200, body, headers={"ETag": '"v1"'}, fail_after=8)
+        start = int(headers["Range"].split("=")[1].rstrip("-"))
+        return _StreamResponse(206, body[start:])
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    sink = io.BytesIO()
+    timing = DocTiming()
+    assert client.download_to("https://cdn/doc", sink, header_writer=lambda _head: b"FM\n", timing=timing) is True
+    assert sink.getvalue() == b"FM\n" + body
+    assert calls[1]["Range"] == "bytes=8-"
+    assert calls[1]["If-Range"] == '"v1"'
+    assert timing.bytes == len(body)
+
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _StreamResponse(404, b""))
+    assert client.download_to("https://cdn/gone", io.BytesIO()) is False
+
+
+@pytest.mark.parametrize("name", ["out.zip", "out.tar.gz"])
+def test_archive_writer_single_thread_entries(tmp_path: Path, name: str) -> None:
+    path = tmp_path / name
+    with ArchiveWriter(path, queue_size=2) as archive:
+        archive.add("Repo/Folder")
+
+        def produce(i: int) -> None:
+            spool = io.BytesIO(f"doc {i}".encode("utf-8") * 100)
+            spool.seek(0, 2)
+            archive.add(f"Repo/Folder/Doc {i}.md", spool)
+
+        run_bounded(range(20), produce, concurrency=4)
+        archive.add("Repo/Folder/")
+        renamed = archive.add("Repo/Folder/Doc 0.md", io.BytesIO(b"duplicate"), tag="slug0")
+        again = archive.add("Repo/Folder/Doc 0.md", io.BytesIO(b"again"), tag="slug0")
+    stats = archive.stats()
+
+    assert (renamed, again) == ("Repo/Folder/Doc 0-slug0.md", "Repo/Folder/Doc 0-slug0-3.md")
+    assert stats["entries"] == 22
+    assert stats["directories"] == 1
+    assert stats["renamed"] == 2
+    if name.endswith(".zip"):
+        import zipfile
+
+        with zipfile.ZipFile(path) as zf:
+            names = zf.namelist()
+            assert zf.read("Repo/Folder/Doc 3.md") == b"doc 3" * 100
+            assert zf.read(renamed) == b"duplicate"
+    else:
+        import tarfile
+
+        with tarfile.open(path) as tf:
+            names = [m.name + ("/" if m.isdir() else "") for m in tf.getmembers()]
+            assert tf.extractfile("Repo/Folder/Doc 3.md").read() == b"doc 3" * 100
+            assert tf.extractfile(renamed).read() == b"duplicate"
+    assert names[0] == "Repo/Folder/"
+    assert len(names) == len(set(names)) == 23
+
+    with pytest.raises(ValueError):
+        ArchiveWriter(tmp_path / "out.rar")
+
+
+def test_archive_spools_closed_when_entry_fails(tmp_path: Path) -> None:
+    from cli_anything.yuque.core import export as export_mod
+
+    archive = ArchiveWriter(tmp_path / "out.zip")
+    doc = SimpleNamespace(id=1, slug="d1", type="DOC", to_dict=lambda: {"id": 1})
+    exporter = SimpleNamespace(relative_save_path=lambda *_a, **_k: Path("Repo/Doc.md"), front_matter_writer=lambda _d: None)
+    spools = []
+
+    def broken_download(_url, fileobj, **_kwargs):
+        spools.append(fileobj)
+        raise requests.ConnectionError("reset")
+
+    client = SimpleNamespace(download_to=broken_download)
+    args = (SimpleNamespace(name="Repo"), StageStats(), archive, doc, "pdf", "https://cdn/1", None, "", ".pdf")
+    with pytest.raises(requests.ConnectionError):
+        export_mod._archive_doc(client, exporter, *args)
+    assert spools[0].closed
+
+    # a writer that already failed rejects the entry but still closes it
+    archive._error = OSError("disk full")
+    client = SimpleNamespace(download_to=lambda _url, fileobj, **_k: spools.append(fileobj) or True)
+    with pytest.raises(RuntimeError, match="disk full"):
+        export_mod._archive_doc(client, exporter, *args)
+    assert spools[1].closed
+    archive._error = None
+    archive.close()
+
+
+def test_doc_metrics_summary_and_rows(tmp_path: Path) -> None:
+    metrics = DocMetrics(keep_rows=True)
+    for i in range(1, 11):
+        timing = DocTiming(trigger_seconds=0.1, pending_seconds=float(i), polls=i, bytes=100, download_seconds=0.5)
+        metrics.add(timing.to_dict(), uuid=f"d{i}", title=f"标题{i}")
+    metrics.add(DocTiming(write_seconds=0.01).to_dict(), uuid="empty", title="空")
+
+    summary = metrics.summary()
+    assert summary["count"] == 11
+    assert summary["bytes_total"] == 1000
+    assert summary["pending_seconds"]["count"] == 10
+    assert summary["pending_seconds"]["max"] == 10.0
+    assert 5.0 <= summary["pending_seconds"]["p50"] <= 6.0
+    assert summary["download_bps"]["mean"] == 200.0
+    assert summary["write_seconds"]["count"] == 11
+
+    rows = metrics.rows()
+    csv_path = write_rows(tmp_path / "stats.csv", rows)
+    lines = csv_path.read_text(encoding="utf-8").splitlines()
+    assert lines[0].startswith("uuid,title,queue_seconds,")
+    assert len(lines) == 12
+    json_path = write_rows(tmp_path / "stats.json", rows)
+    assert json.loads(json_path.read_text(encoding="utf-8"))[-1]["uuid"] == "empty"
+
+
+def test_download_file_streams_front_matter_before_body(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client = YuqueClient(_CountingTab())
+    exporter = DocumentExporter(output_dir=tmp_path)
+    doc = Document(id=7, title="T", slug="t", doc_id=7)
+    body = "# 标题\n正文".encode("utf-8")
+    calls = []
+
+    def fake_request(method, url, headers=None, **_kwargs):
+        calls.append(dict(headers or {}))
+        if len(calls) == 1:
+            return _StreamResponse(200, body, fail_after=4)
+        start = int(headers["Range"].split("=")[1].rstrip("-"))
+        return _StreamResponse(206, body[start:])
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    target = tmp_path / "doc.md"
+    assert client.download_file("https://cdn/doc", str(target), header_writer=exporter.front_matter_writer(doc)) is True
+
+    text = target.read_text(encoding="utf-8")
+    assert text.startswith("---\ntitle: T\n")
+    assert text.endswith("---\n\n# 标题\n正文")
+    assert text.count("doc_id: 7") == 1
+    assert calls[1]["Range"] == "bytes=4-"
+
+    monkeypatch.setattr(client.session, "request", lambda *_a, **_k: _StreamResponse(200, b"---\na: 1\n---\nbody"))
+    existing = tmp_path / "has_meta.md"
+    assert client.download_file("https://cdn/meta", str(existing), header_writer=exporter.front_matter_writer(doc)) is True
+    assert existing.read_bytes() == b"---\na: 1\n---\nbody"
+
+
+def test_export_manifest_classifies_and_persists(tmp_path: Path) -> None:
+    doc = Document(id=5, title="T", slug="t", doc_id=5, updated_at="2024-01-01T00:00:00Z")
+    target = tmp_path / "Repo" / "T.md"
+    target.parent.mkdir()
+    target.write_text("body", encoding="utf-8")
+
+    manifest = ExportManifest(tmp_path)
+    assert manifest.classify(doc, "markdown") == "new"
+    manifest.record(doc, "markdown", target)
+    manifest.save()
+
+    reloaded = ExportManifest(tmp_path)
+    entry = reloaded.get(doc, "markdown")
+    assert entry["path"] == "Repo/T.md"
+    assert entry["sha256"] == file_sha256(target)
+    assert reloaded.classify(doc, "markdown") == "unchanged"
+    assert reloaded.classify(doc, "pdf") == "new"
+
+    doc.updated_at = "2024-02-01T00:00:00Z"
+    assert reloaded.classify(doc, "markdown") == "changed"
+    doc.updated_at = "2024-01-01T00:00:00Z"
+    target.write_text("truncated?", encoding="utf-8")
+    assert reloaded.classify(doc, "markdown") == "changed"
+
+
+def test_catalog_cache_validates_against_repo_marker(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache_mod, "profile_root", lambda profile: tmp_path / profile)
+
+    class _Client:
+        def __init__(self, updated_at: str):
+            self.repo = Repository(id=1, name="R", slug="r", user_login="u", content_updated_at=updated_at)
+            self.catalog_calls = 0
+
+        def get_repositories(self):
+            return [self.repo]
+
+        def get_catalog_nodes(self, _repo):
+            self.catalog_calls += 1
+            return [Document(id=2, title="D", slug="d", uuid="u1", doc_id=2)]
+
+    client = _Client("2024-01-01")
+    cache_mod.CatalogCache("p").catalog(client, cache_mod.CatalogCache("p").find_repo(client, 1))
+
+    warm = cache_mod.CatalogCache("p")
+    nodes = warm.catalog(client, warm.find_repo(client, 1))
+    assert [n.uuid for n in nodes] == ["u1"]
+    assert client.catalog_calls == 1
+    assert warm.stats()["repos"]["hits"] == 1
+
+    changed = _Client("2024-02-01")
+    stale = cache_mod.CatalogCache("p", ttl=0)
+    stale.catalog(changed, stale.find_repo(changed, 1))
+    assert changed.catalog_calls == 1
+    assert stale.stats()["catalogs"] == {"hits": 0, "misses": 1}
+
+    with pytest.raises(ValueError):
+        cache_mod.CatalogCache("p").find_repo(changed, 99)
+
+
+def test_daemon_serves_commands_with_warm_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import tempfile
+
+    from cli_anything.yuque.yuque_cli import invoke
+
+    state = Path(tempfile.mkdtemp(prefix="yq", dir="/tmp"))  # AF_UNIX paths must stay short
+    monkeypatch.setattr(daemon_mod, "profile_root", lambda profile: state / profile)
+    monkeypatch.setattr(auth_mod, "profile_root", lambda profile: state / profile)
+    class _Warm:
+        def fork(self):
+            return SimpleNamespace(parent=self)
+
+    warm = _Warm()
+    opened = []
+
+    class _Auth:
+        COOKIES_FILE = tmp_path / "legacy.json"
+
+        def has_valid_cookies(self):
+            return True
+
+        def read_cookies(self):
+            return [{"name": "c", "value": "v"}]
+
+    def _client(_tab):
+        opened.append(1)
+        return warm
+
+    monkeypatch.setattr(auth_mod, "YuqueAuth", _Auth)
+    monkeypatch.setattr(auth_mod, "YuqueClient", _client)
+
+    server = daemon_mod.HarnessDaemon("p", invoke)
+    ready = threading.Event()
+    thread = threading.Thread(target=server.serve, args=(ready,), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    try:
+        response = daemon_mod.request("p", {"op": "run", "argv": ["--json", "project", "info"]}, timeout=10)
+        assert response["exit_code"] == 0
+        assert json.loads(response["stdout"])["data"]["name"] == "yuque-exporter"
+
+        bad = daemon_mod.request("p", {"op": "run", "argv": ["--json", "export", "run"]}, timeout=10)
+        assert bad["exit_code"] == 2
+        assert json.loads(bad["stdout"])["error"]["code"] == "usage_error"
+
+        with auth_mod.ProfileAuth("p").open_client() as client, auth_mod.ProfileAuth("p").open_client() as other:
+            # each request gets its own fork of the one warm client
+            assert client.parent is warm and other.parent is warm and client is not other
+        assert opened == [1]
+        assert daemon_mod.request("p", {"op": "ping"}, timeout=5)["requests"] == 2
+    finally:
+        daemon_mod.request("p", {"op": "stop"}, timeout=5)
+        thread.join(5)
+    assert not thread.is_alive()
+    assert not daemon_mod.socket_path("p").exists()
+    assert daemon_mod.request("p", {"op": "ping"}) is None
+    shutil.rmtree(state, ignore_errors=True)
+
+
+def test_daemon_forwarding_rules() -> None:
+    assert daemon_mod.should_forward(["--json", "repo", "tree", "--repo-id", "1"])
+    assert daemon_mod.should_forward(["--profile", "x", "export", "run", "--all"])
+    assert daemon_mod.should_forward(["auth", "status"])
+    assert not daemon_mod.should_forward(["auth", "login"])
+    assert not daemon_mod.should_forward(["--json", "project", "info"])
+    assert not daemon_mod.should_forward(["export", "run", "--all", "--stream"])
+    assert not daemon_mod.should_forward(["export", "run", "--all", "--replay=c.jsonl"])
+    assert daemon_mod.profile_from_argv(["--profile", "a", "repo", "list", "--profile=b"]) == "b"
+    assert daemon_mod.absolutize_argv(["export", "run", "--output-dir", "out"], "/w") == [
+        "export", "run", "--output-dir", "/w/out",
+    ]
+    assert daemon_mod.absolutize_argv(["export", "run", "--stats=t.csv", "--output-dir", "/o"], "/w") == [
+        "export", "run", "--stats=/w/t.csv", "--output-dir", "/o",
+    ]
+    assert daemon_mod.absolutize_argv(["export", "run", "--archive", "a.zip", "--output-dir", "/o"], "/w")[3] == "/w/a.zip"
+    assert daemon_mod.absolutize_argv(["repo", "list"], "/w")[:2] == ["--output-dir", "/w/yuque_export"]
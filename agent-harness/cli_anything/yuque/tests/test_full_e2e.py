@@ -1,79 +1,103 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List
 
-from cli_anything.yuque.core.export import ExportService
-
-
-@dataclass
-class FakeDoc:
-    id: int
-    title: str
-    slug: str
-    uuid: str
-    parent_uuid: str
-    type: str = "DOC"
-    level: int = 0
-    doc_id: int = 0
-    book_id: int = 1
-    created_at: str = ""
-    updated_at: str = ""
-    word_count: int = 0
-    children: List["FakeDoc"] = field(default_factory=list)
+import pytest
 
+from cli_anything.yuque.core import cache as cache_mod
+from cli_anything.yuque.core import journal as journal_mod
+from cli_anything.yuque.core.export import ExportService
+from cli_anything.yuque.core.project import ensure_src_on_path
 
-@dataclass
-class FakeRepo:
-    id: int
-    name: str
-    slug: str
-    user_login: str
-    description: str = ""
-    doc_count: int = 0
-    public: int = 0
-    cover: str = ""
 
+ensure_src_on_path()
 
-class FakePage:
-    pass
+from core.metrics import LatencyRecorder  # type: ignore  # noqa: E402
+from core.models import Document, Repository  # type: ignore  # noqa: E402
+from core.polling import PollPolicy  # type: ignore  # noqa: E402
 
 
-class FakeBrowserManager:
-    def __init__(self):
-        self.page = FakePage()
+@pytest.fixture(autouse=True)
+def _isolated_state(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(journal_mod, "profile_root", lambda profile: tmp_path / "state" / profile)
+    monkeypatch.setattr(cache_mod, "profile_root", lambda profile: tmp_path / "state" / profile)
 
-    def start(self, headless: bool = True):
-        return self.page
 
-    def quit(self):
-        return None
+def _repo(repo_id: int, name: str) -> Repository:
+    return Repository(
+        id=repo_id,
+        name=name,
+        slug=name.lower(),
+        user_login="u",
+        updated_at="2024-01-02T00:00:00.000Z",
+        content_updated_at="2024-01-02T00:00:00.000Z",
+    )
 
 
 class FakeYuqueClient:
     def __init__(self, _page):
-        self.repo = FakeRepo(id=1, name="RepoA", slug="repo-a", user_login="u")
+        self.cdp_calls = 0
+        self.export_requests = 0
+        self.export_latency = LatencyRecorder()
+        self.poll_policy = PollPolicy(first_delay=0, initial_interval=0.001, max_interval=0.002, jitter=0)
+        self._pending_polls: Dict[str, int] = {}
+        self.repo = _repo(1, "RepoA")
+        self.repos = [self.repo, _repo(2, "RepoB")]
         self.nodes = [
-            FakeDoc(id=10, title="Group", slug="group", uuid="root", parent_uuid="", type="TITLE", book_id=1),
-            FakeDoc(id=11, title="Doc1", slug="doc1", uuid="doc1", parent_uuid="root", type="DOC", doc_id=11, book_id=1),
-            FakeDoc(id=12, title="Doc2", slug="doc2", uuid="doc2", parent_uuid="root", type="DOC", doc_id=12, book_id=1),
+            Document(id=10, title="Group", slug="group", uuid="root", parent_uuid="", type="TITLE", book_id=1),
+            Document(id=11, title="Doc1", slug="doc1", uuid="doc1", parent_uuid="root", type="DOC", doc_id=11, book_id=1,
+                    updated_at="2024-01-01T00:00:00.000Z"),
+            Document(id=12, title="Doc2", slug="doc2", uuid="doc2", parent_uuid="root", type="DOC", doc_id=12, book_id=1,
+                    updated_at="2024-01-02T00:00:00.000Z"),
         ]
 
+    def set_rate_limits(self, api_rate=None, download_rate=None):
+        self.rate_limits = {"api": api_rate, "download": download_rate}
+
+    def rate_limit_stats(self):
+        return {"api": {"throttle_events": 0}, "download": {"throttle_events": 0}}
+
     def get_repositories(self):
-        return [self.repo]
+        return list(self.repos)
 
     def get_catalog_nodes(self, _repo):
         return self.nodes
 
-    def export_document(self, doc, _export_type):
+    def export_document(self, doc, _export_type, timing=None):
+        if timing is not None:
+            timing.polls = 1
         if doc.uuid == "doc1":
             return "https://download/doc1"
         return "EMPTY_DOC"
 
-    def download_file(self, _url: str, save_path: str):
+    def request_export(self, doc, _export_type):
+        self.export_requests += 1
+        if doc.uuid != "doc1":
+            return "empty", "EMPTY_DOC"
+        polls = self._pending_polls.get(doc.uuid, 0)
+        self._pending_polls[doc.uuid] = polls + 1
+        if polls < 2:
+            return "pending", None
+        return "success", "https://download/doc1"
+
+    def download_file(self, _url: str, save_path: str, header_writer=None, timing=None, blob_store=None):
+        body = b"content"
+        prefix = header_writer(body) if header_writer else b""
         Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        Path(save_path).write_text("content", encoding="utf-8")
+        Path(save_path).write_bytes(prefix + body)
+        if timing is not None:
+            timing.bytes += len(body)
+            timing.download_seconds += 0.001
+        return True
+
+    def download_to(self, _url: str, sink, header_writer=None, timing=None):
+        body = b"content"
+        sink.write((header_writer(body) if header_writer else b"") + body)
+        if timing is not None:
+            timing.bytes += len(body)
+            timing.download_seconds += 0.001
         return True
 
 
@@ -81,13 +105,20 @@ class FakeExporter:
     def __init__(self, output_dir=None):
         self.output_dir = Path(output_dir or Path.cwd() / "out")
 
-    def get_save_path(self, doc, repo_name: str, extension: str = ".md", relative_path: str = ""):
-        base = self.output_dir / repo_name
+    def relative_save_path(self, doc, repo_name: str, extension: str = ".md", relative_path: str = ""):
+        base = Path(repo_name)
         if relative_path:
             base = base / relative_path
-        base.mkdir(parents=True, exist_ok=True)
         return base / f"{doc.title}{extension}"
 
+    def get_save_path(self, doc, repo_name: str, extension: str = ".md", relative_path: str = ""):
+        path = self.output_dir / self.relative_save_path(doc, repo_name, extension, relative_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def front_matter_writer(self, _doc):
+        return lambda head: b"" if head.startswith(b"---") else b"---\nmeta: yes\n---\n"
+
     def add_metadata(self, filepath: Path, _doc):
         if filepath.exists():
             original = filepath.read_text(encoding="utf-8") if filepath.stat().st_size else ""
@@ -98,8 +129,9 @@ class FakeProfileAuth:
     def __init__(self, _profile: str):
         pass
 
-    def _sync_profile_to_legacy(self):
-        return None
+    @contextmanager
+    def open_client(self, no_browser: bool = False):
+        yield FakeYuqueClient(None)
 
 
 def test_export_service_run_all(monkeypatch, tmp_path: Path) -> None:
@@ -111,8 +143,6 @@ def test_export_service_run_all(monkeypatch, tmp_path: Path) -> None:
         return {"profile": profile, **event}
 
     monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
-    monkeypatch.setattr("cli_anything.yuque.core.export.BrowserManager", FakeBrowserManager)
-    monkeypatch.setattr("cli_anything.yuque.core.export.YuqueClient", FakeYuqueClient)
     monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
     monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", fake_append_audit)
 
@@ -121,14 +151,13 @@ def test_export_service_run_all(monkeypatch, tmp_path: Path) -> None:
 
     assert result["requested"] == 3
     assert result["success"] == 3
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.md").read_text(encoding="utf-8") == "---\nmeta: yes\n---\ncontent"
     assert captured["profile"] == "default"
     assert captured["event"]["event"] == "export.run"
 
 
 def test_export_service_run_node_filter(monkeypatch, tmp_path: Path) -> None:
     monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
-    monkeypatch.setattr("cli_anything.yuque.core.export.BrowserManager", FakeBrowserManager)
-    monkeypatch.setattr("cli_anything.yuque.core.export.YuqueClient", FakeYuqueClient)
     monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
     monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
 
@@ -138,3 +167,342 @@ def test_export_service_run_node_filter(monkeypatch, tmp_path: Path) -> None:
     assert result["requested"] == 1
     assert result["success"] == 1
     assert result["items"][0]["doc"]["uuid"] == "doc1"
+
+
+def test_export_service_run_concurrent(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    svc = ExportService(profile="default", output_dir=str(tmp_path))
+    result = svc.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[], concurrency=4)
+
+    assert result["success"] == 3
+    assert [item["doc"]["uuid"] for item in result["items"]] == ["root", "doc1", "doc2"]
+    assert result["throughput"]["stages"]["export"]["count"] == 2
+    assert result["throughput"]["stages"]["download"]["count"] == 1
+    assert result["export_requests"] == 4
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.md").exists()
+
+
+def test_export_service_run_incremental(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    svc = ExportService(profile="default", output_dir=str(tmp_path), incremental=True)
+    first = svc.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[])
+    assert first["incremental"] == {"skipped": 0, "changed": 0, "new": 2}
+    assert (tmp_path / ".yuque_manifest.json").exists()
+
+    second = svc.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[])
+    assert second["incremental"] == {"skipped": 2, "changed": 0, "new": 0}
+    assert second["export_requests"] == 0
+    assert second["success"] == 3
+    assert [item["status"] for item in second["items"]] == ["directory", "skipped", "skipped"]
+
+    (tmp_path / "RepoA" / "Group" / "Doc1.md").unlink()
+    third = svc.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[], concurrency=4)
+    assert third["incremental"] == {"skipped": 1, "changed": 1, "new": 0}
+    assert [item["doc"]["uuid"] for item in third["items"]] == ["root", "doc1", "doc2"]
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.md").exists()
+
+
+def test_export_service_resume_continues_outstanding_docs(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    original_download = FakeYuqueClient.download_file
+
+    def crashing_download(self, url, save_path, header_writer=None, timing=None, blob_store=None):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(FakeYuqueClient, "download_file", crashing_download)
+    out_dir = tmp_path / "out"
+    with pytest.raises(KeyboardInterrupt):
+        ExportService(profile="default", output_dir=str(out_dir)).run(
+            repo_id=1, fmt="markdown", all_docs=True, node_uuids=[],
+        )
+    runs = journal_mod.list_runs("default")
+    assert len(runs) == 1
+    assert runs[0]["finished"] is False
+    assert runs[0]["documents"] == 1  # only the directory node completed before the crash
+
+    monkeypatch.setattr(FakeYuqueClient, "download_file", original_download)
+    result = ExportService(profile="default").resume(runs[0]["run_id"])
+
+    assert result["run_id"] == runs[0]["run_id"]
+    assert result["resumed"] == 1
+    assert result["success"] == 3
+    assert result["throughput"]["stages"]["export"]["count"] == 2
+    assert [item["doc"]["uuid"] for item in result["items"]] == ["root", "doc1", "doc2"]
+    assert (out_dir / "RepoA" / "Group" / "Doc1.md").exists()
+    assert journal_mod.list_runs("default")[0]["finished"] is True
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_export_service_run_multiple_formats(monkeypatch, tmp_path: Path, concurrency: int) -> None:
+    calls: Dict[str, int] = {"catalog": 0}
+
+    class CountingClient(FakeYuqueClient):
+        def get_catalog_nodes(self, repo):
+            calls["catalog"] += 1
+            return super().get_catalog_nodes(repo)
+
+    class CountingAuth(FakeProfileAuth):
+        @contextmanager
+        def open_client(self, no_browser: bool = False):
+            yield CountingClient(None)
+
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", CountingAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    svc = ExportService(profile="default", output_dir=str(tmp_path))
+    result = svc.run(
+        repo_id=1, fmt=["markdown", "pdf", "markdown"], all_docs=True, node_uuids=[], concurrency=concurrency,
+    )
+
+    assert calls["catalog"] == 1
+    assert result["format"] == ["markdown", "pdf"]
+    assert result["success"] == 3
+    assert result["jobs"] == {"requested": 5, "success": 5}
+    assert result["throughput"]["stages"]["export"]["count"] == 4
+    assert [item["doc"]["uuid"] for item in result["items"]] == ["root", "doc1", "doc2"]
+    assert list(result["items"][0]["formats"]) == ["markdown"]
+    doc1 = result["items"][1]
+    assert doc1["status"] == "ok"
+    assert doc1["formats"]["markdown"]["path"].endswith("Doc1.md")
+    assert doc1["formats"]["pdf"]["status"] == "ok"
+    assert result["items"][2]["formats"]["pdf"]["status"] == "empty"
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.md").read_bytes().startswith(b"---")
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.pdf").read_bytes() == b"content"
+
+
+def test_export_service_resume_multiple_formats(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    original_download = FakeYuqueClient.download_file
+
+    def crash_on_pdf(self, url, save_path, header_writer=None, timing=None, blob_store=None):
+        if save_path.endswith(".pdf"):
+            raise KeyboardInterrupt
+        return original_download(self, url, save_path, header_writer, timing, blob_store)
+
+    monkeypatch.setattr(FakeYuqueClient, "download_file", crash_on_pdf)
+    with pytest.raises(KeyboardInterrupt):
+        ExportService(profile="default", output_dir=str(tmp_path)).run(
+            repo_id=1, fmt=["markdown", "pdf"], all_docs=True, node_uuids=[],
+        )
+    run_id = journal_mod.list_runs("default")[0]["run_id"]
+
+    monkeypatch.setattr(FakeYuqueClient, "download_file", original_download)
+    result = ExportService(profile="default").resume(run_id)
+
+    assert result["resumed"] == 2  # the folder and doc1 as markdown
+    assert result["throughput"]["stages"]["export"]["count"] == 3
+    assert result["jobs"] == {"requested": 5, "success": 5}
+    assert [item["status"] for item in result["items"]] == ["directory", "ok", "empty"]
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.pdf").exists()
+
+
+@pytest.mark.parametrize("name", ["out.zip", "out.tar.gz"])
+def test_export_service_run_into_archive(monkeypatch, tmp_path: Path, name: str) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    out_dir = tmp_path / "out"
+    archive_path = tmp_path / name
+    svc = ExportService(profile="default", output_dir=str(out_dir), archive=str(archive_path))
+    result = svc.run(repo_id=1, fmt=["markdown", "pdf"], all_docs=True, node_uuids=[], concurrency=4)
+
+    assert result["jobs"] == {"requested": 5, "success": 5}
+    assert result["archive"]["entries"] == 4
+    assert result["archive"]["directories"] == 1
+    assert result["items"][1]["formats"]["pdf"]["path"] == "RepoA/Group/Doc1.pdf"
+    if name.endswith(".zip"):
+        import zipfile
+
+        with zipfile.ZipFile(archive_path) as zf:
+            names = set(zf.namelist())
+            markdown = zf.read("RepoA/Group/Doc1.md")
+            pdf = zf.read("RepoA/Group/Doc1.pdf")
+    else:
+        import tarfile
+
+        with tarfile.open(archive_path) as tf:
+            names = {m.name + ("/" if m.isdir() else "") for m in tf.getmembers()}
+            markdown = tf.extractfile("RepoA/Group/Doc1.md").read()
+            pdf = tf.extractfile("RepoA/Group/Doc1.pdf").read()
+    assert names == {
+        "RepoA/", "RepoA/Group/Doc1.md", "RepoA/Group/Doc1.pdf", "RepoA/Group/Doc2.md", "RepoA/Group/Doc2.pdf",
+    }
+    assert markdown == b"---\nmeta: yes\n---\ncontent"
+    assert pdf == b"content"
+    assert not out_dir.exists() or not any(p.is_file() for p in out_dir.rglob("*"))
+
+    with pytest.raises(ValueError, match="cannot resume an archive export"):
+        ExportService(profile="default").resume(result["run_id"])
+
+
+def test_export_service_archive_keeps_same_titled_docs(monkeypatch, tmp_path: Path) -> None:
+    class TwinClient(FakeYuqueClient):
+        def __init__(self, page):
+            super().__init__(page)
+            self.nodes.append(
+                Document(id=13, title="Doc1", slug="twin", uuid="twin", parent_uuid="root", type="DOC", doc_id=13, book_id=1)
+            )
+
+    class TwinAuth(FakeProfileAuth):
+        @contextmanager
+        def open_client(self, no_browser: bool = False):
+            yield TwinClient(None)
+
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", TwinAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    archive_path = tmp_path / "out.zip"
+    result = ExportService(profile="default", output_dir=str(tmp_path / "out"), archive=str(archive_path)).run(
+        repo_id=1, fmt="markdown", all_docs=True, node_uuids=[],
+    )
+
+    paths = {item["doc"]["uuid"]: item["path"] for item in result["items"]}
+    assert paths["doc1"] == "RepoA/Group/Doc1.md"
+    assert paths["twin"] == "RepoA/Group/Doc1-twin.md"
+    assert result["archive"]["renamed"] == 1
+    import zipfile
+
+    with zipfile.ZipFile(archive_path) as zf:
+        assert {paths["doc1"], paths["twin"]} <= set(zf.namelist())
+
+
+def test_export_service_reuses_cached_catalog(monkeypatch, tmp_path: Path) -> None:
+    calls: Dict[str, int] = {"repos": 0, "catalog": 0}
+
+    class CountingClient(FakeYuqueClient):
+        def get_repositories(self):
+            calls["repos"] += 1
+            return super().get_repositories()
+
+        def get_catalog_nodes(self, repo):
+            calls["catalog"] += 1
+            return super().get_catalog_nodes(repo)
+
+    class CountingAuth(FakeProfileAuth):
+        @contextmanager
+        def open_client(self, no_browser: bool = False):
+            yield CountingClient(None)
+
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", CountingAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    first = ExportService(profile="default", output_dir=str(tmp_path))
+    first.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[])
+    assert first.cache.stats()["catalogs"] == {"hits": 0, "misses": 1}
+
+    second = ExportService(profile="default", output_dir=str(tmp_path))
+    result = second.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[])
+    assert result["success"] == 3
+    assert second.cache.stats()["repos"] == {"hits": 1, "misses": 0}
+    assert second.cache.stats()["catalogs"] == {"hits": 1, "misses": 0}
+    assert calls == {"repos": 1, "catalog": 1}
+
+    ExportService(profile="default", output_dir=str(tmp_path), refresh=True).run(
+        repo_id=1, fmt="markdown", all_docs=True, node_uuids=[],
+    )
+    assert calls == {"repos": 2, "catalog": 2}
+
+
+def test_export_service_batch_shares_one_client(monkeypatch, tmp_path: Path) -> None:
+    opened: List[FakeYuqueClient] = []
+    repo_calls: List[int] = []
+
+    class SharedAuth(FakeProfileAuth):
+        @contextmanager
+        def open_client(self, no_browser: bool = False):
+            client = FakeYuqueClient(None)
+            original = client.get_repositories
+
+            def get_repositories():
+                repo_calls.append(1)
+                return original()
+
+            client.get_repositories = get_repositories
+            opened.append(client)
+            yield client
+
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", SharedAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    svc = ExportService(profile="default", output_dir=str(tmp_path), refresh=True)
+    result = svc.batch(
+        repo_ids=[1, 2], fmt="markdown", all_docs=True, node_uuids=[], concurrency=2, repo_concurrency=2,
+    )
+
+    assert len(opened) == 1
+    assert len(repo_calls) == 1
+    assert result["count"] == 2
+    assert [r["repo"]["id"] for r in result["results"]] == [1, 2]
+    assert all(r["success"] == 3 for r in result["results"])
+    assert all(r["throughput"]["stages"]["export"]["count"] == 2 for r in result["results"])
+    assert result["client"]["export_requests"] == opened[0].export_requests
+    assert (tmp_path / "RepoA" / "Group" / "Doc1.md").exists()
+    assert (tmp_path / "RepoB" / "Group" / "Doc1.md").exists()
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_export_service_writes_stats_report(monkeypatch, tmp_path: Path, concurrency: int) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    stats_path = tmp_path / "report" / "stats.csv"
+    svc = ExportService(profile="default", output_dir=str(tmp_path / "out"), stats_file=str(stats_path))
+    result = svc.batch(
+        repo_ids=[1, 2], fmt="markdown", all_docs=True, node_uuids=[], concurrency=concurrency, repo_concurrency=2,
+    )
+
+    assert result["stats_file"] == str(stats_path)
+    lines = stats_path.read_text(encoding="utf-8").splitlines()
+    assert lines[0].startswith("repo_id,uuid,doc_id,title,format,status,path,")
+    # two DOC nodes per repository; TITLE nodes have no timing
+    assert len(lines) == 5
+    metrics = result["results"][0]["doc_metrics"]
+    assert metrics["count"] == 2
+    assert metrics["bytes_total"] == len(b"content")
+    assert metrics["polls"]["count"] == 2
+    item = next(i for i in result["results"][0]["items"] if i["doc"]["uuid"] == "doc1")
+    assert item["timing"]["download_bps"] > 0
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_export_service_streams_events(monkeypatch, tmp_path: Path, concurrency: int) -> None:
+    monkeypatch.setattr("cli_anything.yuque.core.export.ProfileAuth", FakeProfileAuth)
+    monkeypatch.setattr("cli_anything.yuque.core.export.DocumentExporter", FakeExporter)
+    monkeypatch.setattr("cli_anything.yuque.core.export.append_audit", lambda *_a, **_k: {})
+
+    events: List[Dict[str, object]] = []
+    svc = ExportService(profile="default", output_dir=str(tmp_path), events=events.append)
+    result = svc.run(repo_id=1, fmt="markdown", all_docs=True, node_uuids=[], concurrency=concurrency)
+
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "plan" and kinds[-2:] == ["repo_finished", "summary"]
+    assert events[0]["requested"] == 3 and events[0]["pending"] == 3
+    assert kinds.count("doc_started") == 3
+    finished = [e["item"] for e in events if e["event"] == "doc_finished"]
+    assert sorted(item["doc"]["uuid"] for item in finished) == ["doc1", "doc2", "root"]
+    started_at = {e["uuid"]: i for i, e in enumerate(events) if e["event"] == "doc_started"}
+    finished_at = {e["item"]["doc"]["uuid"]: i for i, e in enumerate(events) if e["event"] == "doc_finished"}
+    assert all(started_at[uuid] < finished_at[uuid] for uuid in finished_at)
+    # items are only delivered through events
+    assert "items" not in result
+    assert result["success"] == 3
+    assert events[-1]["data"] is result
+
@@ -45,3 +45,47 @@ def test_param_error_json_and_exit_code() -> None:
     payload = json.loads(proc.stdout)
     assert payload["ok"] is False
     assert payload["error"]["code"] in {"bad_parameter", "usage_error"}
+
+
+def test_stream_error_is_an_ndjson_event() -> None:
+    proc = _run(["export", "run", "--all", "--stream"])  # missing --repo-id
+    assert proc.returncode == 2
+    lines = proc.stdout.splitlines()
+    assert len(lines) == 1
+    event = json.loads(lines[0])
+    assert event["event"] == "error"
+    assert event["ok"] is False
+    assert event["error"]["code"] == "usage_error"
+
+
+HEAVY_MODULES = ("DrissionPage", "requests", "rich", "questionary", "core.client", "utils.browser")
+IMPORT_BUDGET_MS = float(os.environ.get("CLI_ANYTHING_IMPORT_BUDGET_MS", "150"))
+
+
+def test_project_info_import_budget() -> None:
+    env = os.environ.copy()
+    project_root = Path(__file__).resolve().parents[4]
+    env["PYTHONPATH"] = str(project_root / "agent-harness")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "cli_anything.yuque.yuque_cli", "--json", "project", "info"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert proc.returncode == 0
+    assert json.loads(proc.stdout)["ok"] is True
+
+    # importtime lines: "import time: <self us> | <cumulative us> | <indented module>"
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(cumulative)))
+    modules = {name.strip() for name, _ in rows}
+    assert not [m for m in modules if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES]
+
+    # top-level imports done after interpreter startup (everything following "site")
+    site_index = max(i for i, (name, _) in enumerate(rows) if name.strip() == "site")
+    total_ms = sum(us for name, us in rows[site_index + 1:] if not name.startswith("  ")) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"project info imports took {total_ms:.1f}ms (budget {IMPORT_BUDGET_MS}ms)"
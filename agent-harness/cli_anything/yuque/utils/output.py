@@ -1,10 +1,73 @@
 from __future__ import annotations
 
+import contextlib
+import io
 import json
 import sys
+import threading
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import IO, Any, Dict, Iterator, Optional
+
+
+_streams = threading.local()
+
+
+@contextlib.contextmanager
+def captured_streams(stdout: IO[str], stderr: IO[str]) -> Iterator[None]:
+    """Route this thread's harness output to the given streams (used by the daemon)."""
+    previous = getattr(_streams, "pair", None)
+    _streams.pair = (stdout, stderr)
+    try:
+        yield
+    finally:
+        _streams.pair = previous
+
+
+def out_stream() -> IO[str]:
+    pair = getattr(_streams, "pair", None)
+    return pair[0] if pair else sys.stdout
+
+
+def err_stream() -> IO[str]:
+    pair = getattr(_streams, "pair", None)
+    return pair[1] if pair else sys.stderr
+
+
+@contextlib.contextmanager
+def logs_to_stderr() -> Iterator[None]:
+    """Send stray prints to stderr so stdout carries only the JSON envelope."""
+    pair = getattr(_streams, "pair", None)
+    if pair is None:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+        return
+    _streams.pair = (pair[1], pair[1])
+    try:
+        yield
+    finally:
+        _streams.pair = pair
+
+
+class ThreadRoutedStream(io.TextIOBase):
+    """Process-wide sys.stdout/sys.stderr replacement that follows captured_streams per thread."""
+
+    def __init__(self, index: int, fallback: IO[str]):
+        self._index = index
+        self._fallback = fallback
+
+    def _target(self) -> IO[str]:
+        pair = getattr(_streams, "pair", None)
+        return pair[self._index] if pair else self._fallback
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def writable(self) -> bool:
+        return True
 
 
 def make_meta(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -38,12 +101,31 @@ def failure(code: str, message: str, details: Optional[Any] = None, meta: Option
 
 def emit(payload: Dict[str, Any], as_json: bool) -> None:
     if as_json:
-        sys.stdout.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        out_stream().write(json.dumps(payload, ensure_ascii=False) + "\n")
         return
 
     if payload.get("ok"):
-        sys.stdout.write(json.dumps(payload.get("data"), ensure_ascii=False, indent=2) + "\n")
+        out_stream().write(json.dumps(payload.get("data"), ensure_ascii=False, indent=2) + "\n")
         return
 
     err = payload.get("error") or {}
-    sys.stderr.write(f"[{err.get('code', 'error')}] {err.get('message', 'unknown error')}\n")
+    err_stream().write(f"[{err.get('code', 'error')}] {err.get('message', 'unknown error')}\n")
+
+
+class NdjsonWriter:
+    """Write one JSON object per line and flush it at once (thread-safe)."""
+
+    def __init__(self, stream: IO[str]):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
+
+
+def emit_verbose(meta: Dict[str, Any]) -> None:
+    for key, value in meta.items():
+        err_stream().write(f"[{key}] {json.dumps(value, ensure_ascii=False)}\n")
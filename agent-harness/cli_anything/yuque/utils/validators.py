@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 import click
 
 
 FORMAT_CHOICES = ("markdown", "pdf", "word", "lake")
+MAX_CONCURRENCY = 32
 PROFILE_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+RUN_ID_RE = re.compile(r"^[A-Za-z0-9-]{1,64}$")
 
 
 def validate_profile(profile: str) -> str:
@@ -23,12 +25,51 @@ def validate_format(fmt: str) -> str:
     return fmt
 
 
+def validate_formats(values: Iterable[str]) -> List[str]:
+    """Repeated and/or comma-separated --format values, de-duplicated in order."""
+    fmts: List[str] = []
+    for value in values:
+        for fmt in value.split(","):
+            fmt = validate_format(fmt.strip())
+            if fmt not in fmts:
+                fmts.append(fmt)
+    if not fmts:
+        raise click.BadParameter("at least one format is required")
+    return fmts
+
+
 def validate_repo_id(repo_id: int) -> int:
     if repo_id <= 0:
         raise click.BadParameter("repo-id must be positive")
     return repo_id
 
 
+def validate_run_id(run_id: str) -> str:
+    if not RUN_ID_RE.match(run_id):
+        raise click.BadParameter("run id must match ^[A-Za-z0-9-]{1,64}$")
+    return run_id
+
+
+def validate_concurrency(concurrency: int) -> int:
+    if concurrency < 1 or concurrency > MAX_CONCURRENCY:
+        raise click.BadParameter(f"concurrency must be between 1 and {MAX_CONCURRENCY}")
+    return concurrency
+
+
+def validate_positive(value: Optional[float], name: str) -> Optional[float]:
+    if value is None:
+        return None
+    if value <= 0:
+        raise click.BadParameter(f"{name} must be positive")
+    return value
+
+
+def validate_non_negative(value: float, name: str) -> float:
+    if value < 0:
+        raise click.BadParameter(f"{name} must not be negative")
+    return value
+
+
 def validate_node_values(values: Iterable[str]) -> List[str]:
     result = [v.strip() for v in values if v and v.strip()]
     bad = [v for v in result if len(v) < 4]
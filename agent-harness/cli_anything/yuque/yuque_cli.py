@@ -3,22 +3,33 @@ from __future__ import annotations
 import contextlib
 import sys
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import click
 
-from .core.auth import ProfileAuth
-from .core.export import ExportService
+from .core.defaults import DEFAULT_CACHE_TTL, DEFAULT_MAX_POLLS_PER_SECOND
 from .core.project import ensure_src_on_path, project_info, project_paths
-from .core.repo import RepoService
 from .core.session import SessionStore
-from .utils.output import emit, failure, success
+from .utils.output import (
+    NdjsonWriter,
+    emit,
+    emit_verbose,
+    err_stream,
+    failure,
+    logs_to_stderr,
+    out_stream,
+    success,
+)
 from .utils.validators import (
     normalize_output_dir,
-    validate_format,
+    validate_concurrency,
+    validate_formats,
     validate_node_values,
+    validate_non_negative,
+    validate_positive,
     validate_profile,
     validate_repo_id,
+    validate_run_id,
 )
 
 
@@ -84,6 +95,34 @@ def _profile(ctx: click.Context) -> str:
     return validate_profile(str(_ctx_value(ctx, "profile")))
 
 
+def _no_browser(ctx: click.Context, no_browser: bool) -> bool:
+    return bool(no_browser) or bool(_ctx_value(ctx, "no_browser"))
+
+
+def _validate_archive(archive: Optional[str], incremental: bool, dedupe: bool, localize_assets: bool) -> None:
+    if not archive:
+        return
+    if incremental or dedupe or localize_assets:
+        raise click.BadParameter("--archive cannot be combined with --incremental, --dedupe or --localize-assets")
+    from .core.export import archive_kind
+
+    try:
+        archive_kind(archive)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc)) from exc
+
+
+def _verbose_meta(ctx: click.Context, key: str, source) -> None:
+    """Register a callable whose result is added to the envelope meta under --verbose."""
+    ctx.obj.setdefault("meta_sources", {})[key] = source
+
+
+def _collect_meta(ctx: click.Context) -> Dict[str, Any]:
+    if not _ctx_value(ctx, "verbose"):
+        return {}
+    return {key: source() for key, source in (_ctx_value(ctx, "meta_sources") or {}).items()}
+
+
 @contextlib.contextmanager
 def _safe_streams():
     with contextlib.ExitStack() as stack:
@@ -116,11 +155,14 @@ def _run(ctx: click.Context, fn, *args, **kwargs) -> None:
     try:
         with _safe_streams():
             if as_json:
-                with contextlib.redirect_stdout(sys.stderr):
+                with logs_to_stderr():
                     data = fn(*args, **kwargs)
             else:
                 data = fn(*args, **kwargs)
-            emit(success(data), as_json=as_json)
+            meta = _collect_meta(ctx)
+            emit(success(data, meta=meta), as_json=as_json)
+            if meta and not as_json:
+                emit_verbose(meta)
         raise SystemExit(EXIT_OK)
     except HarnessError as he:
         with _safe_streams():
@@ -133,6 +175,30 @@ def _run(ctx: click.Context, fn, *args, **kwargs) -> None:
         raise SystemExit(mapped.exit_code)
 
 
+def _run_stream(ctx: click.Context, fn) -> None:
+    """NDJSON mode: fn(events) writes each event to stdout as it happens.
+
+    The service ends a successful stream with a ``summary`` event; a failure
+    ends it with an ``error`` event carrying the usual failure envelope.
+    """
+    try:
+        with _safe_streams():
+            events = NdjsonWriter(out_stream())
+            with logs_to_stderr():
+                fn(events)
+            meta = _collect_meta(ctx)
+            if meta:
+                emit_verbose(meta)
+        raise SystemExit(EXIT_OK)
+    except Exception as exc:  # noqa: BLE001
+        mapped = exc if isinstance(exc, HarnessError) else map_exception(exc)
+        with _safe_streams():
+            NdjsonWriter(out_stream())(
+                {"event": "error", **failure(mapped.code, mapped.message, details=mapped.details)}
+            )
+        raise SystemExit(mapped.exit_code)
+
+
 def common_cmd_options(func):
     func = click.option("--verbose", is_flag=True, default=False)(func)
     func = click.option("--output-dir", default=None)(func)
@@ -141,19 +207,96 @@ def common_cmd_options(func):
     return func
 
 
+def cache_cmd_options(func):
+    func = click.option("--refresh", is_flag=True, default=False, help="Bypass the repository/catalog cache")(func)
+    func = click.option(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds a cached repository list stays valid (catalogs revalidate against repo updates)",
+    )(func)
+    return func
+
+
+def stream_cmd_options(func):
+    func = click.option(
+        "--stream",
+        is_flag=True,
+        default=False,
+        help="Write progress events as NDJSON lines while the export runs (implies JSON output)",
+    )(func)
+    return func
+
+
+def stats_cmd_options(func):
+    func = click.option(
+        "--stats",
+        "stats_file",
+        default=None,
+        help="Write per-document stage timings to PATH (CSV for a .csv suffix, JSON otherwise)",
+    )(func)
+    return func
+
+
+def assets_cmd_options(func):
+    func = click.option(
+        "--asset-concurrency",
+        type=int,
+        default=4,
+        help="Asset downloads in flight at once across all documents (with --localize-assets)",
+    )(func)
+    func = click.option(
+        "--localize-assets",
+        is_flag=True,
+        help="Download images/attachments referenced by markdown into <output>/.yuque_assets and rewrite links",
+    )(func)
+    return func
+
+
+def cassette_cmd_options(func):
+    func = click.option(
+        "--replay-latency-scale",
+        type=float,
+        default=1.0,
+        help="Scale recorded latencies during --replay (1 = original, 0 = no waiting)",
+    )(func)
+    func = click.option("--replay", default=None, help="Serve HTTP from a recorded cassette instead of the network")(func)
+    func = click.option("--record", default=None, help="Record every HTTP exchange of the run into a cassette file")(func)
+    return func
+
+
+def browser_cmd_options(func):
+    func = click.option(
+        "--no-browser",
+        is_flag=True,
+        default=False,
+        help="Never start Chromium; use saved cookies with plain HTTP requests",
+    )(func)
+    return func
+
+
 @click.group()
 @click.option("--json", "as_json", is_flag=True, help="Emit machine-readable JSON envelope")
 @click.option("--profile", default="default", help="Profile name")
 @click.option("--output-dir", default=None, help="Override export output directory")
 @click.option("--verbose", is_flag=True, help="Enable verbose logs")
+@click.option("--no-browser", is_flag=True, help="Never start Chromium; use saved cookies only")
 @click.pass_context
-def cli(ctx: click.Context, as_json: bool, profile: str, output_dir: Optional[str], verbose: bool) -> None:
+def cli(
+    ctx: click.Context,
+    as_json: bool,
+    profile: str,
+    output_dir: Optional[str],
+    verbose: bool,
+    no_browser: bool,
+) -> None:
     ensure_src_on_path()
     ctx.obj = {
         "json": as_json,
         "profile": validate_profile(profile),
         "output_dir": normalize_output_dir(output_dir),
         "verbose": verbose,
+        "no_browser": no_browser,
     }
 
 
@@ -167,15 +310,27 @@ def auth() -> None:
 @click.pass_context
 def auth_login(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+    from .core.auth import ProfileAuth
+
     _run(ctx, lambda: ProfileAuth(_profile(ctx)).login())
 
 
 @auth.command("status")
+@browser_cmd_options
 @common_cmd_options
 @click.pass_context
-def auth_status(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
+def auth_status(
+    ctx: click.Context,
+    no_browser: bool,
+    as_json: bool,
+    profile: Optional[str],
+    output_dir: Optional[str],
+    verbose: bool,
+) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
-    _run(ctx, lambda: ProfileAuth(_profile(ctx)).status())
+    from .core.auth import ProfileAuth
+
+    _run(ctx, lambda: ProfileAuth(_profile(ctx)).status(no_browser=_no_browser(ctx, no_browser)))
 
 
 @auth.command("logout")
@@ -183,6 +338,8 @@ def auth_status(ctx: click.Context, as_json: bool, profile: Optional[str], outpu
 @click.pass_context
 def auth_logout(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+    from .core.auth import ProfileAuth
+
     _run(ctx, lambda: ProfileAuth(_profile(ctx)).logout())
 
 
@@ -192,30 +349,61 @@ def repo() -> None:
 
 
 @repo.command("list")
+@cache_cmd_options
+@browser_cmd_options
 @common_cmd_options
 @click.pass_context
-def repo_list(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
+def repo_list(
+    ctx: click.Context,
+    cache_ttl: float,
+    refresh: bool,
+    no_browser: bool,
+    as_json: bool,
+    profile: Optional[str],
+    output_dir: Optional[str],
+    verbose: bool,
+) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
-    _run(ctx, lambda: RepoService(_profile(ctx)).list_repos())
+    from .core.repo import RepoService
+
+    service = RepoService(
+        _profile(ctx),
+        no_browser=_no_browser(ctx, no_browser),
+        cache_ttl=validate_non_negative(cache_ttl, "cache-ttl"),
+        refresh=refresh,
+    )
+    _verbose_meta(ctx, "cache", service.cache.stats)
+    _run(ctx, service.list_repos)
 
 
 @repo.command("tree")
 @click.option("--repo-id", type=int, required=True)
+@cache_cmd_options
+@browser_cmd_options
 @common_cmd_options
 @click.pass_context
 def repo_tree(
     ctx: click.Context,
     repo_id: int,
+    cache_ttl: float,
+    refresh: bool,
+    no_browser: bool,
     as_json: bool,
     profile: Optional[str],
     output_dir: Optional[str],
     verbose: bool,
 ) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
-    _run(
-        ctx,
-        lambda: RepoService(_profile(ctx)).tree(validate_repo_id(repo_id)),
+    from .core.repo import RepoService
+
+    service = RepoService(
+        _profile(ctx),
+        no_browser=_no_browser(ctx, no_browser),
+        cache_ttl=validate_non_negative(cache_ttl, "cache-ttl"),
+        refresh=refresh,
     )
+    _verbose_meta(ctx, "cache", service.cache.stats)
+    _run(ctx, lambda: service.tree(validate_repo_id(repo_id)))
 
 
 @cli.group()
@@ -224,18 +412,69 @@ def export() -> None:
 
 
 @export.command("run")
-@click.option("--repo-id", type=int, required=True)
-@click.option("--format", "fmt", default="markdown")
+@click.option("--repo-id", type=int, default=None)
+@click.option(
+    "--format",
+    "fmts",
+    multiple=True,
+    default=("markdown",),
+    help="Export format; repeat or comma-separate to export several formats in one pass",
+)
 @click.option("--all", "all_docs", is_flag=True)
 @click.option("--node", "nodes", multiple=True)
+@click.option("--concurrency", type=int, default=1, help="Documents kept in flight at once")
+@click.option("--poll-deadline", type=float, default=None, help="Per-document export deadline in seconds for all formats (default: 180, pdf/lake 300)")
+@click.option("--poll-max-interval", type=float, default=None, help="Upper bound for the poll backoff interval in seconds")
+@click.option(
+    "--max-polls-per-second",
+    type=float,
+    default=DEFAULT_MAX_POLLS_PER_SECOND,
+    help="Cap on export trigger/poll requests per second (with --concurrency > 1)",
+)
+@click.option("--api-rate", type=float, default=None, help="Shared API request budget per second")
+@click.option("--download-rate", type=float, default=None, help="Shared download request budget per second")
+@click.option("--incremental", is_flag=True, help="Skip documents unchanged since the last export into this output dir")
+@click.option("--dedupe", is_flag=True, help="Store each downloaded file once under <output>/.yuque_blobs and hardlink duplicates")
+@click.option(
+    "--archive",
+    default=None,
+    help="Write documents into one .zip/.tar[.gz|.bz2|.xz|.zst] archive instead of files under the output dir",
+)
+@cache_cmd_options
+@click.option("--resume", "resume_id", default=None, help="Continue the outstanding documents of an interrupted run")
+@stream_cmd_options
+@stats_cmd_options
+@assets_cmd_options
+@cassette_cmd_options
+@browser_cmd_options
 @common_cmd_options
 @click.pass_context
 def export_run(
     ctx: click.Context,
-    repo_id: int,
-    fmt: str,
+    repo_id: Optional[int],
+    fmts: Iterable[str],
     all_docs: bool,
     nodes: Iterable[str],
+    concurrency: int,
+    poll_deadline: Optional[float],
+    poll_max_interval: Optional[float],
+    max_polls_per_second: float,
+    api_rate: Optional[float],
+    download_rate: Optional[float],
+    incremental: bool,
+    dedupe: bool,
+    archive: Optional[str],
+    cache_ttl: float,
+    refresh: bool,
+    resume_id: Optional[str],
+    stream: bool,
+    stats_file: Optional[str],
+    localize_assets: bool,
+    asset_concurrency: int,
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency_scale: float,
+    no_browser: bool,
     as_json: bool,
     profile: Optional[str],
     output_dir: Optional[str],
@@ -243,33 +482,123 @@ def export_run(
 ) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
 
-    def execute() -> Dict[str, Any]:
+    def execute(events=None) -> Dict[str, Any]:
+        from .core.export import ExportService, build_poll_policy
+
         validated_nodes = validate_node_values(nodes)
-        if not all_docs and not validated_nodes:
-            raise click.BadParameter("use --all or at least one --node")
-        return ExportService(_profile(ctx), _ctx_value(ctx, "output_dir")).run(
+        if record and replay:
+            raise click.BadParameter("use either --record or --replay")
+        _validate_archive(archive, incremental, dedupe, localize_assets)
+        if resume_id is None:
+            if repo_id is None:
+                raise click.UsageError("Missing option '--repo-id' (or use --resume RUN_ID)")
+            if not all_docs and not validated_nodes:
+                raise click.BadParameter("use --all or at least one --node")
+        service = ExportService(
+            _profile(ctx),
+            _ctx_value(ctx, "output_dir"),
+            no_browser=_no_browser(ctx, no_browser),
+            poll_policy=build_poll_policy(
+                deadline=validate_positive(poll_deadline, "poll-deadline"),
+                max_interval=validate_positive(poll_max_interval, "poll-max-interval"),
+            ),
+            max_polls_per_second=validate_positive(max_polls_per_second, "max-polls-per-second"),
+            api_rate=validate_positive(api_rate, "api-rate"),
+            download_rate=validate_positive(download_rate, "download-rate"),
+            incremental=incremental,
+            dedupe=dedupe,
+            localize_assets=localize_assets,
+            asset_concurrency=int(validate_positive(asset_concurrency, "asset-concurrency")),
+            cache_ttl=validate_non_negative(cache_ttl, "cache-ttl"),
+            refresh=refresh,
+            events=events,
+            stats_file=stats_file,
+            record=record,
+            replay=replay,
+            replay_latency_scale=validate_non_negative(replay_latency_scale, "replay-latency-scale"),
+            archive=archive,
+        )
+        _verbose_meta(ctx, "cache", service.cache.stats)
+        if resume_id is not None:
+            return service.resume(validate_run_id(resume_id))
+        return service.run(
             repo_id=validate_repo_id(repo_id),
-            fmt=validate_format(fmt),
+            fmt=validate_formats(fmts),
             all_docs=all_docs,
             node_uuids=validated_nodes,
+            concurrency=validate_concurrency(concurrency),
         )
 
-    _run(ctx, execute)
+    if stream:
+        _run_stream(ctx, execute)
+    else:
+        _run(ctx, execute)
 
 
 @export.command("batch")
 @click.option("--repo-id", "repo_ids", multiple=True, type=int, required=True)
-@click.option("--format", "fmt", default="markdown")
+@click.option("--repo-concurrency", type=int, default=1, help="Repositories exported in parallel over one shared client")
+@click.option(
+    "--format",
+    "fmts",
+    multiple=True,
+    default=("markdown",),
+    help="Export format; repeat or comma-separate to export several formats in one pass",
+)
 @click.option("--all", "all_docs", is_flag=True)
 @click.option("--node", "nodes", multiple=True)
+@click.option("--concurrency", type=int, default=1, help="Documents kept in flight at once")
+@click.option("--poll-deadline", type=float, default=None, help="Per-document export deadline in seconds for all formats (default: 180, pdf/lake 300)")
+@click.option("--poll-max-interval", type=float, default=None, help="Upper bound for the poll backoff interval in seconds")
+@click.option(
+    "--max-polls-per-second",
+    type=float,
+    default=DEFAULT_MAX_POLLS_PER_SECOND,
+    help="Cap on export trigger/poll requests per second (with --concurrency > 1)",
+)
+@click.option("--api-rate", type=float, default=None, help="Shared API request budget per second")
+@click.option("--download-rate", type=float, default=None, help="Shared download request budget per second")
+@click.option("--incremental", is_flag=True, help="Skip documents unchanged since the last export into this output dir")
+@click.option("--dedupe", is_flag=True, help="Store each downloaded file once under <output>/.yuque_blobs and hardlink duplicates")
+@click.option(
+    "--archive",
+    default=None,
+    help="Write documents into one .zip/.tar[.gz|.bz2|.xz|.zst] archive instead of files under the output dir",
+)
+@cache_cmd_options
+@stream_cmd_options
+@stats_cmd_options
+@assets_cmd_options
+@cassette_cmd_options
+@browser_cmd_options
 @common_cmd_options
 @click.pass_context
 def export_batch(
     ctx: click.Context,
     repo_ids: Iterable[int],
-    fmt: str,
+    repo_concurrency: int,
+    fmts: Iterable[str],
     all_docs: bool,
     nodes: Iterable[str],
+    concurrency: int,
+    poll_deadline: Optional[float],
+    poll_max_interval: Optional[float],
+    max_polls_per_second: float,
+    api_rate: Optional[float],
+    download_rate: Optional[float],
+    incremental: bool,
+    dedupe: bool,
+    archive: Optional[str],
+    cache_ttl: float,
+    refresh: bool,
+    stream: bool,
+    stats_file: Optional[str],
+    localize_assets: bool,
+    asset_concurrency: int,
+    record: Optional[str],
+    replay: Optional[str],
+    replay_latency_scale: float,
+    no_browser: bool,
     as_json: bool,
     profile: Optional[str],
     output_dir: Optional[str],
@@ -277,18 +606,63 @@ def export_batch(
 ) -> None:
     _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
 
-    def execute() -> Dict[str, Any]:
+    def execute(events=None) -> Dict[str, Any]:
+        from .core.export import ExportService, build_poll_policy
+
         validated_nodes = validate_node_values(nodes)
+        if record and replay:
+            raise click.BadParameter("use either --record or --replay")
+        _validate_archive(archive, incremental, dedupe, localize_assets)
         if not all_docs and not validated_nodes:
             raise click.BadParameter("use --all or at least one --node")
-        return ExportService(_profile(ctx), _ctx_value(ctx, "output_dir")).batch(
+        service = ExportService(
+            _profile(ctx),
+            _ctx_value(ctx, "output_dir"),
+            no_browser=_no_browser(ctx, no_browser),
+            poll_policy=build_poll_policy(
+                deadline=validate_positive(poll_deadline, "poll-deadline"),
+                max_interval=validate_positive(poll_max_interval, "poll-max-interval"),
+            ),
+            max_polls_per_second=validate_positive(max_polls_per_second, "max-polls-per-second"),
+            api_rate=validate_positive(api_rate, "api-rate"),
+            download_rate=validate_positive(download_rate, "download-rate"),
+            incremental=incremental,
+            dedupe=dedupe,
+            localize_assets=localize_assets,
+            asset_concurrency=int(validate_positive(asset_concurrency, "asset-concurrency")),
+            cache_ttl=validate_non_negative(cache_ttl, "cache-ttl"),
+            refresh=refresh,
+            events=events,
+            stats_file=stats_file,
+            record=record,
+            replay=replay,
+            replay_latency_scale=validate_non_negative(replay_latency_scale, "replay-latency-scale"),
+            archive=archive,
+        )
+        _verbose_meta(ctx, "cache", service.cache.stats)
+        return service.batch(
             repo_ids=[validate_repo_id(v) for v in repo_ids],
-            fmt=validate_format(fmt),
+            fmt=validate_formats(fmts),
             all_docs=all_docs,
             node_uuids=validated_nodes,
+            concurrency=validate_concurrency(concurrency),
+            repo_concurrency=validate_concurrency(repo_concurrency),
         )
 
-    _run(ctx, execute)
+    if stream:
+        _run_stream(ctx, execute)
+    else:
+        _run(ctx, execute)
+
+
+@export.command("runs")
+@common_cmd_options
+@click.pass_context
+def export_runs(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
+    _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+    from .core.journal import list_runs
+
+    _run(ctx, lambda: list_runs(_profile(ctx)))
 
 
 @cli.group()
@@ -333,6 +707,67 @@ def session_doctor(ctx: click.Context, as_json: bool, profile: Optional[str], ou
     _run(ctx, execute)
 
 
+@cli.group()
+def daemon() -> None:
+    """Long-lived daemon serving commands over a local socket."""
+
+
+@daemon.command("start")
+@browser_cmd_options
+@common_cmd_options
+@click.pass_context
+def daemon_start(
+    ctx: click.Context,
+    no_browser: bool,
+    as_json: bool,
+    profile: Optional[str],
+    output_dir: Optional[str],
+    verbose: bool,
+) -> None:
+    """Run the daemon in the foreground until `daemon stop`."""
+    _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+
+    def execute() -> Dict[str, Any]:
+        from .core.daemon import HarnessDaemon
+
+        server = HarnessDaemon(_profile(ctx), invoke, no_browser=_no_browser(ctx, no_browser))
+        server.serve()
+        return {**server.status(), "status": "stopped"}
+
+    _run(ctx, execute)
+
+
+@daemon.command("status")
+@common_cmd_options
+@click.pass_context
+def daemon_status(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
+    _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+
+    def execute() -> Dict[str, Any]:
+        from .core.daemon import request as daemon_request
+        from .core.daemon import socket_path
+
+        status = daemon_request(_profile(ctx), {"op": "ping"}, timeout=5)
+        return {"running": status is not None, **(status or {"socket": str(socket_path(_profile(ctx)))})}
+
+    _run(ctx, execute)
+
+
+@daemon.command("stop")
+@common_cmd_options
+@click.pass_context
+def daemon_stop(ctx: click.Context, as_json: bool, profile: Optional[str], output_dir: Optional[str], verbose: bool) -> None:
+    _apply_common_overrides(ctx, as_json, profile, output_dir, verbose)
+
+    def execute() -> Dict[str, Any]:
+        from .core.daemon import request as daemon_request
+
+        status = daemon_request(_profile(ctx), {"op": "stop"}, timeout=5)
+        return {"running": False, "stopped": status is not None}
+
+    _run(ctx, execute)
+
+
 @cli.group()
 def project() -> None:
     """Project-level information."""
@@ -354,26 +789,36 @@ def project_paths_cmd(ctx: click.Context, as_json: bool, profile: Optional[str],
     _run(ctx, lambda: project_paths(_profile(ctx)))
 
 
-def main() -> None:
-    as_json = "--json" in sys.argv
+def invoke(argv: List[str]) -> int:
+    as_json = "--json" in argv
     try:
-        cli.main(standalone_mode=False)
+        result = cli.main(args=argv, prog_name="cli-anything-yuque", standalone_mode=False)
+    except SystemExit as exc:
+        return int(exc.code or 0)
     except click.ClickException as exc:
         if as_json:
             with _safe_streams():
                 emit(failure("usage_error", exc.format_message()), as_json=True)
         else:
-            exc.show()
-        raise SystemExit(EXIT_PARAM)
+            exc.show(file=err_stream())
+        return EXIT_PARAM
     except Exception as exc:  # noqa: BLE001
         mapped = map_exception(exc)
-        if as_json:
-            with _safe_streams():
-                emit(failure(mapped.code, mapped.message, details=mapped.details), as_json=True)
-        else:
-            with _safe_streams():
-                emit(failure(mapped.code, mapped.message, details=mapped.details), as_json=False)
-        raise SystemExit(mapped.exit_code)
+        with _safe_streams():
+            emit(failure(mapped.code, mapped.message, details=mapped.details), as_json=as_json)
+        return mapped.exit_code
+    return result if isinstance(result, int) else EXIT_OK
+
+
+def main() -> None:
+    from .core.daemon import forward, should_forward
+
+    argv = sys.argv[1:]
+    if should_forward(argv):
+        forwarded = forward(argv)
+        if forwarded is not None:
+            raise SystemExit(forwarded)
+    raise SystemExit(invoke(argv))
 
 
 if __name__ == "__main__":
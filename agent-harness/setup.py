@@ -11,6 +11,9 @@ setup(
         "requests",
         "DrissionPage>=4.0",
     ],
+    extras_require={
+        "zstd": ["zstandard"],
+    },
     entry_points={
         "console_scripts": [
             "cli-anything-yuque=cli_anything.yuque.yuque_cli:main",
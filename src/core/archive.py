@@ -0,0 +1,226 @@
+"""
+归档输出
+========
+将导出的文档直接写入 zip / tar 归档 (可选 gzip、bz2、xz、zstd 压缩)，
+不在磁盘上创建目录树与逐篇文件；归档由单个写入线程顺序写出
+"""
+
+import posixpath
+import queue
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Optional
+
+# 后缀 -> (归档类型, 压缩方式)
+ARCHIVE_SUFFIXES = {
+    ".zip": ("zip", ""),
+    ".tar": ("tar", ""),
+    ".tar.gz": ("tar", "gz"),
+    ".tgz": ("tar", "gz"),
+    ".tar.bz2": ("tar", "bz2"),
+    ".tar.xz": ("tar", "xz"),
+    ".tar.zst": ("tar", "zst"),
+    ".tzst": ("tar", "zst"),
+}
+
+# 本身已压缩的格式在 zip 中直接存储
+_STORED_SUFFIXES = {".pdf", ".docx", ".word", ".lake", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip"}
+
+_CLOSE = object()
+
+
+def archive_kind(path: Path) -> tuple:
+    """
+    按文件名后缀确定归档类型
+
+    Returns:
+        tuple: (归档类型 zip/tar, 压缩方式 ""/gz/bz2/xz/zst)
+
+    Raises:
+        ValueError: 不支持的后缀，或 zstd 压缩缺少 zstandard 包
+    """
+    name = Path(path).name.lower()
+    for suffix, kind in sorted(ARCHIVE_SUFFIXES.items(), key=lambda x: -len(x[0])):
+        if name.endswith(suffix):
+            if kind[1] == "zst":
+                try:
+                    import zstandard  # noqa: F401
+                except ImportError:
+                    raise ValueError("writing .tar.zst archives requires the zstandard package") from None
+            return kind
+    raise ValueError(f"unsupported archive suffix: {Path(path).name} (use one of {', '.join(ARCHIVE_SUFFIXES)})")
+
+
+class ArchiveWriter:
+    """
+    单线程归档写入器 (线程安全)
+
+    下载线程把完整的文档内容 (通常为 SpooledTemporaryFile) 交给 add()，写入线程按提交
+    顺序逐个写入归档并关闭该文件对象。队列有界: 写入跟不上时 add() 阻塞，
+    在途内容占用的内存因此有上限。写入线程出错后，后续 add() / close() 抛出该异常。
+    条目名在 add() 中同步分配: 文件重名时改名 (见 add)，重复的目录条目只写一次。
+    """
+
+    def __init__(self, path: Path, queue_size: int = 16):
+        self.path = Path(path)
+        self.kind, self.compression = archive_kind(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        self._error: Optional[BaseException] = None
+        self._names = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "entries": 0, "directories": 0, "renamed": 0, "bytes": 0, "write_seconds": 0.0, "blocked_seconds": 0.0,
+        }
+        self._zstd: Optional[IO[bytes]] = None
+        self._archive = self._open()
+        self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> Any:
+        if self.kind == "zip":
+            return zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        if self.compression == "zst":
+            import zstandard
+            # 流式 tar 写入 zstd 帧；关闭 tar 后还需关闭压缩流以写出帧尾
+            self._zstd = zstandard.ZstdCompressor().stream_writer(open(self.path, "wb"))
+            return tarfile.open(fileobj=self._zstd, mode="w|")
+        return tarfile.open(self.path, mode=f"w:{self.compression}" if self.compression else "w")
+
+    def add(self, arcname: str, fileobj: Optional[IO[bytes]] = None, tag: str = "") -> str:
+        """
+        提交一个条目。fileobj 交给写入器后由其负责关闭: 写入后关闭，未能提交 (抛出异常) 时也会关闭
+
+        Args:
+            arcname: 归档内的相对路径 (以 / 分隔)
+            fileobj: 内容 (从头写入整个文件对象)；None 表示目录条目
+            tag: 文件重名时附加在文件名后的标识 (如文档 slug)，仍重名时再追加序号
+
+        Returns:
+            str: 实际使用的条目名
+        """
+        name = arcname.rstrip("/")
+        try:
+            self._raise_error()
+            with self._lock:
+                if fileobj is None:
+                    if name + "/" in self._names:
+                        return name
+                    self._names.add(name + "/")
+                else:
+                    name = self._unique_name(name, tag)
+                    self._names.add(name)
+            started = time.perf_counter()
+            self._queue.put((name, fileobj))
+        except BaseException:
+            # 未入队的内容不会再被写入线程关闭
+            if fileobj is not None:
+                fileobj.close()
+            raise
+        with self._lock:
+            self._stats["blocked_seconds"] += time.perf_counter() - started
+        return name
+
+    def _unique_name(self, name: str, tag: str) -> str:
+        # 调用方需持有 _lock
+        if name not in self._names:
+            return name
+        self._stats["renamed"] += 1
+        stem, ext = posixpath.splitext(name)
+        candidate = f"{stem}-{tag}{ext}" if tag else f"{stem}-2{ext}"
+        index = 2
+        while candidate in self._names:
+            index += 1
+            candidate = f"{stem}-{tag}-{index}{ext}" if tag else f"{stem}-{index}{ext}"
+        return candidate
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is _CLOSE:
+                return
+            arcname, fileobj = task
+            try:
+                if self._error is None:
+                    started = time.perf_counter()
+                    size = self._write(arcname, fileobj)
+                    with self._lock:
+                        self._stats["write_seconds"] += time.perf_counter() - started
+                        if fileobj is None:
+                            self._stats["directories"] += 1
+                        else:
+                            self._stats["entries"] += 1
+                            self._stats["bytes"] += size
+            except BaseException as e:
+                self._error = e
+            finally:
+                if fileobj is not None:
+                    fileobj.close()
+
+    def _write(self, arcname: str, fileobj: Optional[IO[bytes]]) -> int:
+        """写入一个条目，返回写入的字节数"""
+        is_dir = fileobj is None
+        name = arcname + ("/" if is_dir else "")
+        size = 0
+        if fileobj is not None:
+            size = fileobj.seek(0, 2)
+            fileobj.seek(0)
+        now = time.time()
+        if self.kind == "zip":
+            info = zipfile.ZipInfo(name, date_time=datetime.fromtimestamp(now).timetuple()[:6])
+            if is_dir:
+                info.external_attr = 0o40755 << 16
+                self._archive.writestr(info, b"")
+                return 0
+            info.external_attr = 0o644 << 16
+            stored = Path(name).suffix.lower() in _STORED_SUFFIXES
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with self._archive.open(info, "w", force_zip64=size > 0x7FFFFFFF) as dst:
+                shutil.copyfileobj(fileobj, dst, 1024 * 1024)
+            return size
+
+        info = tarfile.TarInfo(name.rstrip("/"))
+        info.mtime = int(now)
+        if is_dir:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            self._archive.addfile(info)
+            return 0
+        info.mode = 0o644
+        info.size = size
+        self._archive.addfile(info, fileobj)
+        return size
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"archive write failed: {self._error}") from self._error
+
+    def close(self) -> None:
+        """等待已提交的条目写完并关闭归档"""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        try:
+            self._archive.close()
+        finally:
+            if self._zstd is not None:
+                self._zstd.close()
+        self._raise_error()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["write_seconds"] = round(stats["write_seconds"], 3)
+        stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+        return {"path": str(self.path), "format": self.kind, "compression": self.compression or None, **stats}
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
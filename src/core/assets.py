@@ -0,0 +1,237 @@
+"""
+Markdown 资源本地化
+===================
+解析导出的 Markdown 中引用的语雀图片与附件，经有界并发下载到输出目录下的共享
+资源缓存 (按 URL 摘要命名，同一资源在整个导出中只下载一次)，并将链接改写为
+相对本地路径
+"""
+
+import hashlib
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional, Pattern
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+
+# 语雀图片 CDN 与附件地址；其他外链 (包括指向语雀文档页面的链接) 保持不变
+DEFAULT_ASSET_PATTERNS = (
+    r"^https?://cdn\.nlark\.com/",
+    r"^https?://cdn\.yuque\.com/",
+    r"^https?://gw\.alipayobjects\.com/",
+    r"^https?://([\w-]+\.)*yuque\.com/attachments/",
+)
+
+# ![alt](url "title") / [text](url)
+_MD_LINK = re.compile(r"(\]\(\s*<?)(https?://[^\s)>]+)")
+# [id]: url
+_MD_REF = re.compile(r"^( {0,3}\[[^\]]+\]:\s*<?)(https?://[^\s>]+)", re.MULTILINE)
+# <img src="url"> / <a href="url">
+_HTML_ATTR = re.compile(r"""(\b(?:src|href)\s*=\s*["'])(https?://[^"'\s]+)""", re.IGNORECASE)
+# 围栏代码块中的地址不改写
+_FENCE = re.compile(r"^ {0,3}(```|~~~).*?(?:^ {0,3}\1[^\n]*$|\Z)", re.MULTILINE | re.DOTALL)
+_SUFFIX = re.compile(r"^\.[a-z0-9]{1,5}$")
+
+
+def _strip_fragment(url: str) -> str:
+    """去掉 #averageHue=... 等仅供前端使用的片段"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, ""))
+
+
+def _split_fences(text: str) -> List[tuple]:
+    """将文本切分为 (是否代码块, 片段) 列表"""
+    segments = []
+    pos = 0
+    for match in _FENCE.finditer(text):
+        if match.start() > pos:
+            segments.append((False, text[pos:match.start()]))
+        segments.append((True, match.group(0)))
+        pos = match.end()
+    if pos < len(text):
+        segments.append((False, text[pos:]))
+    return segments
+
+
+def find_asset_urls(text: str, patterns: Iterable[Pattern] = ()) -> List[str]:
+    """按出现顺序返回 Markdown 中引用的资源地址 (去重，不含代码块)"""
+    patterns = list(patterns) or [re.compile(p) for p in DEFAULT_ASSET_PATTERNS]
+    seen: Dict[str, None] = {}
+    for in_code, segment in _split_fences(text):
+        if in_code:
+            continue
+        for regex in (_MD_LINK, _MD_REF, _HTML_ATTR):
+            for match in regex.finditer(segment):
+                url = match.group(2)
+                if any(p.match(url) for p in patterns):
+                    seen.setdefault(url, None)
+    return list(seen)
+
+
+def rewrite_links(text: str, mapping: Dict[str, str]) -> str:
+    """将 mapping 中的地址替换为本地路径 (不含代码块)"""
+    if not mapping:
+        return text
+
+    def replace(match: "re.Match") -> str:
+        url = match.group(2)
+        return match.group(1) + mapping.get(url, url)
+
+    parts = []
+    for in_code, segment in _split_fences(text):
+        if not in_code:
+            for regex in (_MD_LINK, _MD_REF, _HTML_ATTR):
+                segment = regex.sub(replace, segment)
+        parts.append(segment)
+    return "".join(parts)
+
+
+class AssetCache:
+    """
+    按 URL 摘要寻址的资源目录 (线程安全)
+
+    资源保存为 <root>/<摘要前 2 位>/<摘要前 16 位><扩展名>；同一地址在一次导出中
+    只下载一次，并发请求同一地址时等待同一个下载任务，已在磁盘上的资源直接复用。
+    下载失败的任务不保留，之后再引用该地址时重新下载 (失败可能是暂时的)
+    """
+
+    DIR_NAME = ".yuque_assets"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._failed: set = set()
+        self._stats = {"urls": 0, "downloaded": 0, "cached": 0, "reused": 0, "failed": 0, "retried": 0, "bytes": 0}
+
+    def path_for(self, url: str) -> Path:
+        url = _strip_fragment(url)
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        suffix = PurePosixPath(unquote(urlsplit(url).path)).suffix.lower()
+        if not _SUFFIX.match(suffix):
+            suffix = ".bin"
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get(self, url: str, submit: Callable[[Callable[[], Optional[Path]]], Future],
+            fetch: Callable[[str, Path], bool]) -> Future:
+        """
+        返回该地址的下载任务，结果为本地路径 (失败为 None)
+
+        Args:
+            submit: 提交任务的方法 (如线程池的 submit)
+            fetch: fetch(url, path) 下载到 path，成功返回 True
+        """
+        path = self.path_for(url)
+        with self._lock:
+            future = self._futures.get(path.name)
+            if future is not None:
+                self._stats["reused"] += 1
+                return future
+            if path.name in self._failed:
+                self._stats["retried"] += 1
+            else:
+                self._stats["urls"] += 1
+            if path.exists():
+                self._stats["cached"] += 1
+                future = Future()
+                future.set_result(path)
+                self._futures[path.name] = future
+                return future
+            future = self._futures[path.name] = submit(lambda: self._fetch(url, path, fetch))
+            return future
+
+    def _fetch(self, url: str, path: Path, fetch: Callable[[str, Path], bool]) -> Optional[Path]:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            ok = fetch(_strip_fragment(url), path)
+        except Exception as e:
+            print(f"⚠️ 资源下载失败: {url} ({e})")
+            ok = False
+        with self._lock:
+            if ok and path.exists():
+                self._stats["downloaded"] += 1
+                self._stats["bytes"] += path.stat().st_size
+                return path
+            self._stats["failed"] += 1
+            # 正在等待本任务的文档仍得到失败结果，后续引用重新下载
+            self._futures.pop(path.name, None)
+            self._failed.add(path.name)
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"root": str(self.root), **self._stats}
+
+
+class AssetLocalizer:
+    """
+    Markdown 资源本地化
+
+    所有文档共享一个有界线程池下载资源，整个导出中同时进行的资源下载不超过
+    concurrency 个；下载经 YuqueClient.download_file (限速、重试、断点续传、原子重命名)。
+    改写后的文档写入新文件再替换，不会改动与 blob 存储共享数据的旧文件。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        root: Path,
+        concurrency: int = 4,
+        patterns: Iterable[str] = DEFAULT_ASSET_PATTERNS
+    ):
+        self.client = client
+        self.cache = AssetCache(root)
+        self.patterns = [re.compile(p) for p in patterns]
+        base_url = getattr(client, "base_url", None)
+        if base_url:
+            # 站点自身的附件地址 (base_url 非默认时，如本地模拟服务)
+            self.patterns.append(re.compile(re.escape(base_url) + "/attachments/"))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="asset")
+
+    def _download(self, url: str, path: Path) -> bool:
+        return self.client.download_file(url, str(path))
+
+    def localize(self, md_path: Path) -> Dict[str, int]:
+        """
+        下载 md_path 引用的资源并改写为相对路径
+
+        Returns:
+            dict: found (引用的资源数)、localized (已改写)、failed (下载失败，保留原链接)
+        """
+        md_path = Path(md_path)
+        # newline="" 保留原有换行符 (CRLF 不被改为 LF)
+        with md_path.open("r", encoding="utf-8", newline="") as f:
+            text = f.read()
+        urls = find_asset_urls(text, self.patterns)
+        if not urls:
+            return {"found": 0, "localized": 0, "failed": 0}
+
+        futures = {url: self.cache.get(url, self._pool.submit, self._download) for url in urls}
+        mapping = {}
+        for url, future in futures.items():
+            local = future.result()
+            if local is not None:
+                mapping[url] = Path(os.path.relpath(local, md_path.parent)).as_posix()
+
+        rewritten = rewrite_links(text, mapping)
+        if rewritten != text:
+            tmp_path = md_path.with_name(f".{md_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with tmp_path.open("w", encoding="utf-8", newline="") as f:
+                f.write(rewritten)
+            os.replace(tmp_path, md_path)
+        return {"found": len(urls), "localized": len(mapping), "failed": len(urls) - len(mapping)}
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "AssetLocalizer":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
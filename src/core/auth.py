@@ -4,9 +4,11 @@
 负责保存和恢复浏览器 cookies，实现免重复登录
 """
 
+import hashlib
 import json
+import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum, auto
 
@@ -25,12 +27,22 @@ class YuqueAuth:
     CREDENTIALS_DIR = Path.home() / ".yuque"
     COOKIES_FILE = CREDENTIALS_DIR / "cookies.json"
     
+    LOGIN_CACHE_FILE = CREDENTIALS_DIR / "login_check.json"
+    # 登录校验成功后的缓存时长 (秒)
+    LOGIN_CACHE_TTL = 300.0
+    
     # 语雀关键 URL
     DASHBOARD_URL = "https://www.yuque.com/dashboard"
     
-    def __init__(self):
-        """初始化，确保存储目录存在"""
+    def __init__(self, login_cache_file: Optional[Path] = None):
+        """
+        初始化，确保存储目录存在
+        
+        Args:
+            login_cache_file: 登录校验结果缓存文件，默认与 cookies 同目录
+        """
         self.CREDENTIALS_DIR.mkdir(parents=True, exist_ok=True)
+        self.login_cache_file = login_cache_file or self.LOGIN_CACHE_FILE
     
     def save_cookies(self, tab) -> bool:
         """从浏览器保存 cookies 到本地文件"""
@@ -49,6 +61,79 @@ class YuqueAuth:
             print(f"❌ 保存 Cookies 失败: {e}")
             return False
     
+    def read_cookies(self) -> List[Dict[str, Any]]:
+        """读取本地保存的 cookies (文件不存在或损坏时返回空列表)"""
+        if not self.COOKIES_FILE.exists():
+            return []
+        try:
+            with open(self.COOKIES_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            cookies = data.get("cookies", [])
+            return cookies if isinstance(cookies, list) else []
+        except Exception as e:
+            print(f"❌ 读取 Cookies 失败: {e}")
+            return []
+    
+    def has_valid_cookies(self) -> bool:
+        """
+        本地 cookies 是否可用 (仅做本地判断，不发起网络请求)
+        
+        存在 cookies 且至少有一个未过期 (会话 cookie 视为未过期)
+        """
+        cookies = self.read_cookies()
+        if not cookies:
+            return False
+        now = time.time()
+        for c in cookies:
+            expires = c.get("expires") or c.get("expiry")
+            try:
+                expires = float(expires) if expires is not None else -1
+            except (TypeError, ValueError):
+                expires = -1
+            if expires <= 0 or expires > now:
+                return True
+        return False
+    
+    def cookies_fingerprint(self) -> str:
+        """本地 cookies 文件的摘要 (重新登录后随之变化)"""
+        try:
+            return hashlib.sha256(self.COOKIES_FILE.read_bytes()).hexdigest()
+        except OSError:
+            return ""
+    
+    def is_login_cached(self) -> bool:
+        """最近一次校验成功且 cookies 未变化、未超过 LOGIN_CACHE_TTL"""
+        try:
+            with open(self.login_cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            checked_at = float(data.get("checked_at", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return False
+        fingerprint = self.cookies_fingerprint()
+        return (
+            bool(fingerprint)
+            and data.get("fingerprint") == fingerprint
+            and 0 <= time.time() - checked_at < self.LOGIN_CACHE_TTL
+        )
+    
+    def remember_login(self) -> None:
+        """缓存一次成功的登录校验"""
+        try:
+            self.login_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.login_cache_file, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": self.cookies_fingerprint(), "checked_at": time.time()}, f)
+        except OSError as e:
+            print(f"⚠️ 写入登录缓存失败: {e}")
+    
+    def forget_login(self) -> None:
+        """清除登录校验缓存"""
+        try:
+            self.login_cache_file.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ 清除登录缓存失败: {e}")
+    
     def load_cookies(self, tab) -> bool:
         """从本地文件恢复 cookies 到浏览器"""
         if not self.COOKIES_FILE.exists():
@@ -113,6 +198,7 @@ class YuqueAuth:
         try:
             if self.COOKIES_FILE.exists():
                 self.COOKIES_FILE.unlink()
+            self.forget_login()
             return True
         except Exception as e:
             print(f"❌ 清除凭证失败: {e}")
@@ -0,0 +1,184 @@
+"""
+内容寻址存储
+============
+下载完成的文件按正文的 sha256 存入输出目录下的 blob 目录，内容相同的文件在导出目录中
+以硬链接 (不支持时依次尝试 reflink、复制) 共享同一份数据
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux ioctl FICLONE: 在支持的文件系统 (btrfs/xfs 等) 上共享数据块
+_FICLONE = 0x40049409
+
+
+class StreamDigest:
+    """
+    边写边计算的 sha256
+
+    length 为已计入摘要的字节数 (只含正文，不含 Front Matter 等前缀)；续传时若与
+    .part 中的正文大小不一致 (如进程重启后)，用 rehash 从文件重新计算
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._hash = hashlib.sha256()
+        self.length = 0
+
+    def update(self, data: bytes) -> None:
+        self._hash.update(data)
+        self.length += len(data)
+
+    def rehash(self, path: Path, skip: int = 0) -> None:
+        """从文件重新计算，跳过开头 skip 字节 (前缀)"""
+        self.reset()
+        with open(path, "rb") as f:
+            f.seek(skip)
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                self.update(block)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def clone_file(src: Path, dst: Path, allow_copy: bool = True) -> Optional[str]:
+    """
+    在 dst 创建 src 的副本，优先共享数据: 硬链接 -> reflink -> 复制
+
+    Returns:
+        str: 使用的方式 hardlink / reflink / copy；不允许复制且无法共享时返回 None
+    """
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return "reflink"
+        except OSError:
+            Path(dst).unlink(missing_ok=True)
+    if not allow_copy:
+        return None
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class BlobStore:
+    """
+    内容寻址的文件存储 (线程安全)
+
+    blob 以 <root>/<摘要前 2 位>/<摘要> 保存，不可修改: 导出文件与 blob 共享数据时，
+    就地编辑导出文件会同时改变 blob，因此需要改写导出文件时应写入新文件后替换。
+
+    blob 只保存正文。带前缀 (每篇文档不同的 Front Matter) 的文件与 blob 内容不同，
+    无法共享数据，因此不写 blob (否则反而多占一份空间): 文件原样保存 (prefixed)，
+    重复的正文只按摘要识别并计数。
+    """
+
+    DIR_NAME = ".yuque_blobs"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "files": 0,
+            "deduplicated": 0,
+            "bytes_total": 0,
+            "bytes_saved": 0,
+            "prefixed": 0,
+            "links": {"hardlink": 0, "reflink": 0, "copy": 0},
+        }
+        # 带前缀文件的正文摘要 (只用于统计重复)
+        self._prefixed_digests = set()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def adopt(self, src: Path, dest: Path, digest: str, prefix_len: int = 0) -> bool:
+        """
+        将已下载完成的 src 放到 dest，并与 blob 存储去重
+
+        已有相同内容的 blob 时，dest 为该 blob 的链接，src 被删除；否则 src 移动到
+        dest 并登记为新 blob。两种情况下 dest 的替换都是原子的。
+
+        Args:
+            digest: 正文 (src 中 prefix_len 之后的内容) 的 sha256
+            prefix_len: src 开头的前缀字节数；非 0 时 src 直接移动到 dest，不写 blob
+
+        Returns:
+            bool: 是否复用了已有 blob (带前缀时: 正文是否与之前的文件重复)
+        """
+        src, dest = Path(src), Path(dest)
+        size = src.stat().st_size - prefix_len
+
+        if prefix_len:
+            return self._adopt_prefixed(src, dest, digest, size)
+
+        blob = self.blob_path(digest)
+
+        if blob.exists() and blob.stat().st_size == size:
+            mode = self._materialize(blob, dest)
+            src.unlink()
+            self._record(size, deduplicated=True, mode=mode)
+            return True
+
+        os.replace(src, dest)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # 登记新 blob 只共享数据，不复制 (否则反而多占一份空间)
+        mode = self._materialize(dest, blob, allow_copy=False)
+        self._record(size, deduplicated=False, mode=mode)
+        return False
+
+    def _adopt_prefixed(self, src: Path, dest: Path, digest: str, size: int) -> bool:
+        """带前缀的文件: 整个文件即 dest 的内容，重复的正文只计数"""
+        os.replace(src, dest)
+        with self._lock:
+            known = digest in self._prefixed_digests
+            self._prefixed_digests.add(digest)
+            self._stats["prefixed"] += 1
+        # 重复时按完整副本计 (没有节省磁盘空间)
+        self._record(size, deduplicated=known, mode="copy" if known else None)
+        return known
+
+    @staticmethod
+    def _materialize(src: Path, dest: Path, allow_copy: bool = True) -> Optional[str]:
+        """经临时文件原子地在 dest 放置 src 的副本"""
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            mode = clone_file(src, tmp, allow_copy=allow_copy)
+            if mode is not None:
+                os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return mode
+
+    def _record(self, size: int, deduplicated: bool, mode: Optional[str]) -> None:
+        with self._lock:
+            self._stats["files"] += 1
+            self._stats["bytes_total"] += size
+            if mode is not None:
+                self._stats["links"][mode] += 1
+            if deduplicated:
+                self._stats["deduplicated"] += 1
+                # 复制时没有节省磁盘空间
+                if mode != "copy":
+                    self._stats["bytes_saved"] += size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"root": str(self.root), **self._stats, "links": dict(self._stats["links"])}
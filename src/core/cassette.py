@@ -0,0 +1,312 @@
+"""
+HTTP 录制与回放
+===============
+以 requests 传输适配器的形式录制 YuqueClient 的全部 HTTP 往返 (含耗时)，
+并在无网络的情况下按原始或缩放后的延迟回放，用于离线复现与性能回归测试
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+
+CASSETTE_VERSION = 1
+
+# 仅保留回放所需的响应头；Cookie / Set-Cookie 等一律不写入文件
+KEPT_HEADERS = ("content-type", "content-length", "content-range", "etag", "retry-after", "location")
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """
+    请求的匹配键: 方法 + 路径 (不含主机)
+
+    API 路径保留查询参数 (如 book_id)；其他地址 (下载链接) 的查询参数多为签名，
+    录制时丢弃。带请求体时附加其摘要，以区分同一地址的不同导出格式。
+    """
+    parts = urlsplit(url)
+    query = parts.query if parts.path.startswith("/api/") else ""
+    key = f"{method.upper()} {parts.path}" + (f"?{query}" if query else "")
+    if body:
+        key += "#" + hashlib.sha1(body).hexdigest()[:12]
+    return key
+
+
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.path.startswith("/api/"):
+        return url
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def _redact_json(value: Any) -> Any:
+    """去掉 JSON 正文中 url 字段 (如导出结果的下载链接) 的签名参数"""
+    if isinstance(value, dict):
+        return {
+            k: (_redact_url(v) if k == "url" and isinstance(v, str) else _redact_json(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact_json(v) for v in value]
+    return value
+
+
+def _open_text(path: Path, mode: str) -> IO[str]:
+    """.gz 后缀的 cassette 以 gzip 压缩"""
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _request_body(request: requests.PreparedRequest) -> Optional[bytes]:
+    body = request.body
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return body if isinstance(body, bytes) else None
+
+
+class _CountingRaw:
+    """
+    流式响应体的计数包装 (代理 urllib3 响应的其余属性)
+
+    调用方读取时只累计字节数，不缓存内容；读完或关闭时回调 on_done(字节数)，只回调一次
+    """
+
+    def __init__(self, raw: Any, on_done: Any):
+        self._raw = raw
+        self._on_done = on_done
+        self._size = 0
+        self._done = False
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+    def read(self, amt: Optional[int] = None, *args, **kwargs) -> bytes:
+        data = self._raw.read(amt, *args, **kwargs)
+        self._size += len(data)
+        if not data or amt is None:
+            self.finish()
+        return data
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None):
+        # 不委托给 urllib3 的 stream()，否则读取绕过 read() 的计数
+        while True:
+            data = self.read(amt, decode_content=decode_content)
+            if not data:
+                return
+            yield data
+
+    def close(self) -> None:
+        self.finish()
+        self._raw.close()
+
+    def release_conn(self) -> None:
+        self.finish()
+        self._raw.release_conn()
+
+    def finish(self) -> None:
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+        self._on_done(self._size)
+
+
+class CassetteRecorder(BaseAdapter):
+    """
+    录制适配器: 经内层适配器 (保留其重试配置) 发出请求，逐条追加写入 cassette
+
+    每行一个 JSON 对象: 首行为文件头，其后每行一次往返，包括匹配键、状态码、
+    精简后的响应头、发出时刻与耗时 (读完响应体为止)。JSON 响应保留正文；
+    下载等二进制流式响应不读入内存: 调用方照常流式读取 (断点续传、进度回调不受影响)，
+    读完或关闭响应时只记录字节数，回放时以等长内容代替，以保持文件紧凑。
+    """
+
+    def __init__(self, path: Path, inner: BaseAdapter):
+        super().__init__()
+        self.path = Path(path)
+        self.inner = inner
+        self.exchanges = 0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        # 尚未读完的流式响应；close() 时按已读字节数写出
+        self._streams: Dict[int, _CountingRaw] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = _open_text(self.path, "w")
+        self._write({"cassette": CASSETTE_VERSION, "recorded_at": datetime.now().isoformat()})
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs) -> requests.Response:
+        sent = time.monotonic()
+        response = self.inner.send(request, stream=stream, **kwargs)
+        entry: Dict[str, Any] = {
+            "key": request_key(request.method, request.url, _request_body(request)),
+            "url": _redact_url(request.url),
+            "status": response.status_code,
+            "headers": {
+                k: (_redact_url(v) if k.lower() == "location" else v)
+                for k, v in response.headers.items()
+                if k.lower() in KEPT_HEADERS
+            },
+            "at": round(sent - self._started, 4),
+        }
+        is_json = "json" in response.headers.get("Content-Type", "")
+        if stream and not is_json:
+            self._record_stream(response, entry, sent)
+            return response
+
+        content = response.content
+        entry["elapsed"] = round(time.monotonic() - sent, 4)
+        if is_json:
+            try:
+                entry["text"] = json.dumps(_redact_json(json.loads(content)), ensure_ascii=False)
+            except ValueError:
+                entry["text"] = content.decode("utf-8", errors="replace")
+        else:
+            entry["text"] = content.decode("utf-8", errors="replace")
+        self._write(entry)
+        return response
+
+    def _record_stream(self, response: requests.Response, entry: Dict[str, Any], sent: float) -> None:
+        """包装响应体，调用方读完或关闭响应时写出记录"""
+        def on_done(size: int) -> None:
+            with self._lock:
+                self._streams.pop(id(raw), None)
+            self._write({**entry, "elapsed": round(time.monotonic() - sent, 4), "size": size})
+
+        raw = _CountingRaw(response.raw, on_done)
+        with self._lock:
+            self._streams[id(raw)] = raw
+        response.raw = raw
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                # 录制结束后才关闭的响应 (已在 close() 中按已读字节数写出)
+                return
+            if entry.get("key"):
+                self.exchanges += 1
+            self._file.write(line)
+            self._file.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "record", "path": str(self.path), "exchanges": self.exchanges}
+
+    def close(self) -> None:
+        with self._lock:
+            pending = list(self._streams.values())
+        for raw in pending:
+            raw.finish()
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class CassetteReplayer(BaseAdapter):
+    """
+    回放适配器: 按匹配键依次返回录制的响应，不访问网络 (线程安全)
+
+    同一键的多次请求 (如导出状态轮询) 按录制顺序返回，用尽后重复最后一次。
+    latency_scale 缩放录制的耗时: 1 为原速，0 为不等待。
+    未录制的请求抛出 requests.ConnectionError。
+    """
+
+    def __init__(self, path: Path, latency_scale: float = 1.0):
+        super().__init__()
+        self.path = Path(path)
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self.served = 0
+        self.missing: List[str] = []
+        self.recorded = 0
+        self._load()
+
+    def _load(self) -> None:
+        with _open_text(self.path, "r") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"unsupported cassette file: {self.path}")
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._queues.setdefault(entry["key"], deque()).append(entry)
+                self.recorded += 1
+
+    def _next(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                entry = self._last[key] = queue.popleft()
+            else:
+                entry = self._last.get(key)
+            if entry is None:
+                self.missing.append(key)
+            else:
+                self.served += 1
+            return entry
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs) -> requests.Response:
+        key = request_key(request.method, request.url, _request_body(request))
+        entry = self._next(key)
+        if entry is None:
+            raise requests.ConnectionError(f"cassette has no recorded response for {key}", request=request)
+        if self.latency_scale > 0:
+            time.sleep(entry["elapsed"] * self.latency_scale)
+        return self._build_response(request, entry)
+
+    @staticmethod
+    def _build_response(request: requests.PreparedRequest, entry: Dict[str, Any]) -> requests.Response:
+        if "text" in entry:
+            body = entry["text"].encode("utf-8")
+        else:
+            body = b"x" * entry.get("size", 0)
+        headers = {k: v for k, v in entry["headers"].items() if k.lower() != "content-length"}
+        headers["Content-Length"] = str(len(body))
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = HTTPResponse(
+            body=io.BytesIO(body), headers=headers, status=entry["status"], preload_content=False
+        )
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": "replay",
+                "path": str(self.path),
+                "exchanges": self.recorded,
+                "served": self.served,
+                "missing": len(self.missing),
+            }
+
+    def close(self) -> None:
+        return None
+
+
+def load_entries(path: Path) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """读取 cassette 文件，返回 (文件头, 往返记录列表)"""
+    path = Path(path)
+    with _open_text(path, "r") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return (lines[0] if lines else {}), lines[1:]
@@ -0,0 +1,157 @@
+"""
+目录树索引
+==========
+一次构建知识库目录的父子关系，提供路径计算与子树查询 (全部为迭代实现)
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .exporter import sanitize_filename
+from .models import Document
+
+
+class CatalogTree:
+    """
+    知识库目录树 (按目录 API 返回的顺序)
+
+    父节点不在目录中的节点视为根节点；无法从根节点到达的节点说明存在循环引用，
+    构建时抛出 ValueError。路径按需计算并缓存: 各级标题经 sanitize_filename 清理
+    (标题中的 "/" 不会产生额外的目录层级)，父路径已缓存时子路径只需一次拼接。
+    """
+
+    def __init__(self, nodes: Iterable[Document]):
+        self.nodes: List[Document] = list(nodes)
+        self.by_uuid: Dict[str, Document] = {n.uuid: n for n in self.nodes}
+        self.children: Dict[str, List[Document]] = {}
+        self.roots: List[Document] = []
+
+        for node in self.nodes:
+            if node.parent_uuid and node.parent_uuid in self.by_uuid:
+                self.children.setdefault(node.parent_uuid, []).append(node)
+            else:
+                self.roots.append(node)
+
+        self._paths: Dict[str, str] = {}
+        self._levels: Dict[str, int] = {}
+        self._index_levels()
+
+    def _index_levels(self) -> None:
+        """自根向下广度优先计算深度，同时检查循环引用"""
+        queue = deque()
+        for root in self.roots:
+            self._levels[root.uuid] = 0
+            queue.append(root)
+
+        while queue:
+            node = queue.popleft()
+            level = self._levels[node.uuid] + 1
+            for child in self.children.get(node.uuid, ()):
+                if child.uuid not in self._levels:
+                    self._levels[child.uuid] = level
+                    queue.append(child)
+
+        if len(self._levels) < len(self.by_uuid):
+            stray = next(n for n in self.nodes if n.uuid not in self._levels)
+            raise ValueError(f"cycle detected in catalog nodes at uuid={stray.uuid}")
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def parent(self, uuid: str) -> Optional[Document]:
+        node = self.by_uuid.get(uuid)
+        if node is None or not node.parent_uuid:
+            return None
+        return self.by_uuid.get(node.parent_uuid)
+
+    def path(self, uuid: str) -> str:
+        """节点的完整相对路径 (包含自身标题)，未知节点返回空字符串"""
+        cached = self._paths.get(uuid)
+        if cached is not None:
+            return cached
+        # 向上收集尚未缓存的祖先链，再自上而下逐级拼接并缓存，
+        # 从叶子向上逐个查询深链时每个节点也只拼接一次
+        chain = []
+        base = ""
+        node = self.by_uuid.get(uuid)
+        while node is not None:
+            known = self._paths.get(node.uuid)
+            if known is not None:
+                base = known
+                break
+            chain.append(node)
+            node = self.parent(node.uuid)
+        for node in reversed(chain):
+            name = sanitize_filename(node.title)
+            base = f"{base}/{name}" if base else name
+            self._paths[node.uuid] = base
+        return base
+
+    def dir_path(self, uuid: str) -> str:
+        """节点所在目录的相对路径 (即父节点路径)，根节点返回空字符串"""
+        parent = self.parent(uuid)
+        return self.path(parent.uuid) if parent is not None else ""
+
+    def level(self, uuid: str) -> int:
+        """节点深度 (根节点为 0)"""
+        return self._levels.get(uuid, 0)
+
+    def path_map(self) -> Dict[str, str]:
+        """uuid -> 完整相对路径 (自根向下计算，每个节点只拼接一次)"""
+        result: Dict[str, str] = {}
+        stack = [(root, "") for root in self.roots]
+        while stack:
+            node, base = stack.pop()
+            path = self._paths.get(node.uuid)
+            if path is None:
+                name = sanitize_filename(node.title)
+                path = f"{base}/{name}" if base else name
+                self._paths[node.uuid] = path
+            result[node.uuid] = path
+            children = self.children.get(node.uuid)
+            if children:
+                stack.extend((child, path) for child in children)
+        return result
+
+    def walk(self) -> Iterator[Tuple[Document, int]]:
+        """按目录顺序先序遍历，产出 (节点, 深度)"""
+        stack = [(root, 0) for root in reversed(self.roots)]
+        while stack:
+            node, level = stack.pop()
+            yield node, level
+            children = self.children.get(node.uuid)
+            if children:
+                stack.extend((child, level + 1) for child in reversed(children))
+
+    def descendants(self, uuid: str) -> List[Document]:
+        """节点自身及其全部子孙 (先序)"""
+        node = self.by_uuid.get(uuid)
+        if node is None:
+            return []
+        result = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(reversed(self.children.get(current.uuid, ())))
+        return result
+
+    def subtree_uuids(self, uuids: Iterable[str]) -> Set[str]:
+        """多个节点子树的并集 (已包含在其他选中子树中的节点不重复遍历)"""
+        found: Set[str] = set()
+        for uuid in uuids:
+            if uuid not in self.by_uuid or uuid in found:
+                continue
+            stack = [uuid]
+            while stack:
+                current = stack.pop()
+                if current in found:
+                    continue
+                found.add(current)
+                stack.extend(child.uuid for child in self.children.get(current, ()))
+        return found
+
+    def select(self, uuids: Iterable[str]) -> List[Document]:
+        """选中节点及其子孙，保持目录原始顺序"""
+        found = self.subtree_uuids(uuids)
+        return [n for n in self.nodes if n.uuid in found]
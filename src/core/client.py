@@ -4,13 +4,24 @@
 封装与语雀的所有交互逻辑
 """
 
+import copy
 import json
+import os
+import threading
 import time
 import requests
+from contextlib import contextmanager
 from enum import Enum
-from typing import List, Optional, Any, Dict
+from pathlib import Path
+from typing import List, Optional, Any, BinaryIO, Callable, Dict, Iterator, Tuple
+from urllib.parse import urlsplit
 from .auth import YuqueAuth, LoginStatus
+from .blobstore import BlobStore, StreamDigest
+from .cassette import CassetteRecorder, CassetteReplayer
 from .models import Repository, Document
+from .metrics import DocTiming, LatencyRecorder
+from .polling import PollPolicy
+from .ratelimit import TokenBucket, parse_retry_after
 
 class ExportType(Enum):
     """文档导出格式"""
@@ -22,40 +33,339 @@ class ExportType(Enum):
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+
+class _Retry(Retry):
+    """带 Retry-After 的 503 不在 urllib3 内重试，交给 _send 经共享限流器统一降速"""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 503 and has_retry_after:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class _Session(requests.Session):
+    """重定向到其他域名 (如下载地址转到 OSS/CDN) 且 jar 中没有匹配的 cookies 时，沿用上一跳的 cookies"""
+
+    def rebuild_auth(self, prepared_request: requests.PreparedRequest, response: requests.Response) -> None:
+        super().rebuild_auth(prepared_request, response)
+        previous = response.request.headers.get("Cookie")
+        if previous and "Cookie" not in prepared_request.headers:
+            prepared_request.headers["Cookie"] = previous
+
+
 class YuqueClient:
     """
     语雀客户端 - 基于 DrissionPage
     """
     
     BASE_URL = "https://www.yuque.com"
-    API_COMMON_USED = "https://www.yuque.com/api/mine/common_used"
-    API_DOC_EXPORT = "https://www.yuque.com/api/docs/{doc_id}/export"
+    DEFAULT_USER_AGENT = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    )
+    # 以下接口路径拼接在 base_url 之后
+    API_COMMON_USED = "/api/mine/common_used"
+    # 当前用户信息，响应体很小，用于校验登录
+    API_MINE = "/api/mine"
+    API_CATALOG_NODES = "/api/catalog_nodes"
+    API_DOC_EXPORT = "/api/docs/{doc_id}/export"
+    
+    # 默认限流: API 调用与 CDN 下载分开计算
+    DEFAULT_API_RATE = 10.0
+    DEFAULT_DOWNLOAD_RATE = 20.0
+    # 单个请求因 429 被限流后的最大重试次数
+    MAX_THROTTLE_RETRIES = 5
+    # 下载中断后的最大尝试次数 (含首次)，以及下载分块大小
+    MAX_DOWNLOAD_ATTEMPTS = 3
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
     
-    def __init__(self, tab):
+    def __init__(
+        self,
+        tab=None,
+        poll_policy: Optional[PollPolicy] = None,
+        api_rate: float = DEFAULT_API_RATE,
+        download_rate: float = DEFAULT_DOWNLOAD_RATE,
+        base_url: str = BASE_URL
+    ):
         """
         Args:
-            tab: DrissionPage 对象 (ChromiumPage or SessionPage)
+            tab: DrissionPage 对象 (ChromiumPage or SessionPage)；
+                 为 None 时使用无浏览器模式，直接加载 YuqueAuth 保存的 cookies
+            poll_policy: 导出状态轮询策略，默认 PollPolicy()
+            api_rate: API 请求速率上限 (请求/秒)，所有线程共享
+            download_rate: 下载请求速率上限 (请求/秒)，所有线程共享
+            base_url: 站点根地址，默认 BASE_URL (测试与基准中指向本地模拟服务)
         """
         self.tab = tab
+        self.base_url = base_url.rstrip("/")
+        self.poll_policy = poll_policy or PollPolicy()
+        # 导出触发到成功的耗时分布 (按格式) 与导出接口请求次数
+        self.export_latency = LatencyRecorder()
+        self.export_requests = 0
+        # 计数器由多个工作线程更新
+        self._counter_lock = threading.Lock()
         
         # 初始化 Session 并配置重试策略
-        self.session = requests.Session()
-        retries = Retry(
+        # 429 与带 Retry-After 的 503 不在此重试，而是交给共享限流器统一降速 (见 _send)；
+        # urllib3 默认会自行按 Retry-After 重试 429，需关闭，否则限流器无从感知
+        self.session = _Session()
+        retries = _Retry(
             total=5,
             backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504, 429],
-            allowed_methods=["GET", "POST"]
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            respect_retry_after_header=False
         )
-        adapter = HTTPAdapter(max_retries=retries)
+        self._adapter = HTTPAdapter(max_retries=retries, pool_maxsize=32)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers["Referer"] = f"{self.base_url}/"
+        self.limiters = {
+            "api": TokenBucket(api_rate),
+            "download": TokenBucket(download_rate),
+        }
+        
+        self.auth = YuqueAuth()
+        
+        # Cookie/UA 快照: 仅在首次请求、登录后、会话失效时从浏览器 (或本地 cookies 文件) 同步
+        # 其余情况由 Session 的 cookie jar 自动处理 (包括响应中的 Set-Cookie)
+        self.cdp_calls = 0
+        self._cookie_lock = threading.Lock()
+        self._cookies_synced = False
+        # 下载地址可能在 OSS/CDN/自定义域名上，按域名限定的 jar 不会带上 cookies:
+        # 对这些地址另外显式传入一份不限域名的快照 (原地更新，fork 之间共享)
+        self._download_cookies = requests.cookies.RequestsCookieJar()
+        self._cookie_domains: List[str] = []
+        # 最近一次 verify_login 的校验方式
+        self.login_check_source: Optional[str] = None
+
+    @property
+    def browserless(self) -> bool:
+        """是否为无浏览器模式"""
+        return self.tab is None
+
+    def sync_cookies(self) -> None:
+        """
+        刷新 cookies 和 User-Agent 到 requests.Session
+        
+        有浏览器时读取 tab (会产生 CDP 调用)；无浏览器模式读取本地 cookies 文件
+        """
+        with self._cookie_lock:
+            if self.browserless:
+                browser_cookies = self.auth.read_cookies()
+                user_agent = self.DEFAULT_USER_AGENT
+            else:
+                browser_cookies = self.tab.cookies()
+                user_agent = self.tab.user_agent
+                with self._counter_lock:
+                    self.cdp_calls += 2
+            
+            self._apply_cookies(browser_cookies, user_agent)
+
+    def _apply_cookies(self, cookies: List[Dict[str, Any]], user_agent: str) -> None:
+        # 调用方需持有 _cookie_lock
+        self.session.cookies.clear()
+        self._download_cookies.clear()
+        domains = set()
+        for c in cookies:
+            if 'name' not in c or 'value' not in c:
+                continue
+            domain = c.get('domain') or ".yuque.com"
+            self.session.cookies.set(
+                c['name'],
+                c['value'],
+                domain=domain,
+                path=c.get('path') or "/"
+            )
+            self._download_cookies.set(c['name'], c['value'])
+            domains.add(domain.lstrip("."))
+        # 整体替换 (下载线程可能正在读取)
+        self._cookie_domains[:] = sorted(domains)
+        self.session.headers["User-Agent"] = user_agent
+        self._cookies_synced = True
+
+    def _cookie_domain_matches(self, url: str) -> bool:
+        """jar 中的 cookies 是否会发往 url 所在的域名"""
+        host = urlsplit(url).hostname or ""
+        return any(host == d or host.endswith("." + d) for d in self._cookie_domains)
+
+    def _ensure_cookies(self) -> None:
+        """热路径: 已有快照时不访问浏览器"""
+        if not self._cookies_synced:
+            self.sync_cookies()
+
+    @staticmethod
+    def _is_auth_failure(response: requests.Response) -> bool:
+        """判断响应是否表示会话失效 (401 或被重定向到登录页)"""
+        if response.status_code == 401:
+            return True
+        return bool(response.history) and "login" in response.url.lower()
+
+    @contextmanager
+    def _transport(self, adapter) -> Iterator[Any]:
+        """临时替换 Session 的传输适配器，退出时恢复并关闭替换的适配器"""
+        previous = dict(self.session.adapters)
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
+        try:
+            yield adapter
+        finally:
+            for prefix, original in previous.items():
+                self.session.mount(prefix, original)
+            adapter.close()
+
+    def recording(self, path: str):
+        """
+        录制期间的全部 HTTP 往返写入 cassette 文件 (上下文管理器)
+
+        请求仍经原适配器 (含重试) 发出；cookies 与 Set-Cookie 不会写入文件
+        """
+        return self._transport(CassetteRecorder(Path(path), self._adapter))
+
+    def replaying(self, path: str, latency_scale: float = 1.0):
+        """
+        从 cassette 文件回放响应，不访问网络 (上下文管理器)
+
+        Args:
+            latency_scale: 录制耗时的缩放比例，1 为原速，0 为不等待
+        """
+        return self._transport(CassetteReplayer(Path(path), latency_scale=latency_scale))
+
+    def fork(self) -> "YuqueClient":
+        """
+        共享连接与登录状态的新客户端
+
+        复用 Session (连接池、cookie jar)、浏览器 tab、cookie 锁与限流器 (同一账号的
+        所有请求共享速率预算，任一请求遇到 429 时全部降速)；轮询策略与各项计数器
+        各自独立。常驻进程为每个请求派生一个，统计只包含本命令的请求
+        """
+        clone = copy.copy(self)
+        clone.export_latency = LatencyRecorder()
+        clone.export_requests = 0
+        clone._counter_lock = threading.Lock()
+        clone.cdp_calls = 0
+        clone.login_check_source = None
+        return clone
+
+    def set_rate_limits(self, api_rate: Optional[float] = None, download_rate: Optional[float] = None) -> None:
+        """调整限流速率 (在原令牌桶上调整，派生的客户端共享同一组令牌桶与限流状态)"""
+        for name, rate in (("api", api_rate), ("download", download_rate)):
+            if rate and self.limiters[name].base_rate != rate:
+                self.limiters[name].set_base_rate(rate)
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        """各限流桶的当前速率与限流事件统计"""
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+    def _send(self, bucket: str, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        经共享限流器发送请求
         
-        self.auth = YuqueAuth()
+        收到 429 (或带 Retry-After 的 503) 时让该桶的所有调用方一起降速，
+        等待后重试，最多 MAX_THROTTLE_RETRIES 次
+        """
+        limiter = self.limiters[bucket]
+        if bucket == "download" and not self._cookie_domain_matches(url):
+            kwargs.setdefault("cookies", self._download_cookies)
+        for attempt in range(self.MAX_THROTTLE_RETRIES + 1):
+            limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            throttled = response.status_code == 429 or (response.status_code == 503 and retry_after is not None)
+            if not throttled or attempt == self.MAX_THROTTLE_RETRIES:
+                return response
+            limiter.throttle(retry_after)
+            response.close()
+        return response
+
+    def check_session(self) -> LoginStatus:
+        """通过 API 校验当前 cookies 是否有效 (不加载页面)"""
+        try:
+            self._ensure_cookies()
+            if not self.session.cookies:
+                return LoginStatus.NONE
+            status = self._probe_session()
+            return status if status is not None else LoginStatus.EXPIRED
+            
+        except Exception as e:
+            print(f"❌ 校验会话失败: {e}")
+            return LoginStatus.NONE
+
+    def verify_login(self) -> LoginStatus:
+        """
+        校验本地保存的登录态
+        
+        1. 缓存中有未过期的成功结果 (cookies 未变) 时直接返回
+        2. 用本地 cookies 请求轻量 JSON 接口 (API_MINE)
+        3. 接口结果不明确 (5xx / 网络错误 / 非预期响应) 且有浏览器时，回退到页面校验
+        
+        校验方式记录在 login_check_source ("cache" / "api" / "page")
+        """
+        cookies = self.auth.read_cookies()
+        if not cookies:
+            self.login_check_source = "local"
+            return LoginStatus.NONE
+        if self.auth.is_login_cached():
+            self.login_check_source = "cache"
+            self._use_saved_cookies(cookies)
+            return LoginStatus.LOGGED_IN
+        
+        self._use_saved_cookies(cookies)
+        try:
+            status = self._probe_session()
+        except requests.RequestException as e:
+            print(f"⚠️ 登录校验接口请求失败: {e}")
+            status = None
+        self.login_check_source = "api"
+        
+        if status is None and not self.browserless:
+            # 接口结果不明确：回退到页面校验 (会把 cookies 注入浏览器)
+            self.login_check_source = "page"
+            status = self.auth.check_login_status(self.tab)
+            with self._cookie_lock:
+                self._cookies_synced = False
+        
+        if status == LoginStatus.LOGGED_IN:
+            self.auth.remember_login()
+        else:
+            self.auth.forget_login()
+        return status if status is not None else LoginStatus.EXPIRED
+
+    def _use_saved_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        """将本地 cookies 作为当前快照 (浏览器模式下也不读取 tab)"""
+        with self._cookie_lock:
+            self._apply_cookies(cookies, self.session.headers.get("User-Agent") or self.DEFAULT_USER_AGENT)
+
+    def _probe_session(self) -> Optional[LoginStatus]:
+        """请求 API_MINE；返回 None 表示结果不明确"""
+        response = self._send(
+            "api",
+            "GET",
+            self.base_url + self.API_MINE,
+            headers={"Accept": "application/json", "X-Requested-With": "XMLHttpRequest"},
+            timeout=15
+        )
+        try:
+            if self._is_auth_failure(response) or response.status_code == 403:
+                return LoginStatus.EXPIRED
+            if response.status_code != 200:
+                return None
+            try:
+                data = response.json().get("data")
+            except (ValueError, AttributeError):
+                return None
+            return LoginStatus.LOGGED_IN if isinstance(data, dict) and data.get("id") else LoginStatus.EXPIRED
+        finally:
+            response.close()
 
     def login(self) -> bool:
         """
         执行登录流程 (需在有头模式下调用)
         """
+        if self.browserless:
+            print("❌ 无浏览器模式无法登录，请使用浏览器模式")
+            return False
+        
         print("请在浏览器中完成登录...")
         
         # 确保环境纯净：清除 Cookies 和 缓存
@@ -82,6 +392,7 @@ class YuqueClient:
                     # 额外等待一下确保 cookie 写入
                     time.sleep(2)
                     if self.auth.save_cookies(self.tab):
+                         self.sync_cookies()
                          return True
             except:
                 pass
@@ -96,7 +407,7 @@ class YuqueClient:
             # 使用 requests 发送请求，因为 DrissionPage 直接 get 可能返回 HTML 渲染后的内容，
             # 而我们想要纯 JSON。虽然 DP 也可以获取源码，但他会自动处理 JSON 吗？
             # 沿用 requests 方案更稳健
-            data = self._request_api("GET", self.API_COMMON_USED)
+            data = self._request_api("GET", self.base_url + self.API_COMMON_USED)
             if not data:
                 return []
             
@@ -109,7 +420,7 @@ class YuqueClient:
 
     def get_catalog_nodes(self, repo: Repository) -> List[Document]:
         """获取知识库目录结构"""
-        url = "https://www.yuque.com/api/catalog_nodes"
+        url = self.base_url + self.API_CATALOG_NODES
         params = {"book_id": repo.id, "format": "list"}
         
         try:
@@ -132,130 +443,456 @@ class YuqueClient:
         self, 
         doc: Document, 
         export_type: ExportType = ExportType.MARKDOWN,
-        max_retries: int = 120
+        policy: Optional[PollPolicy] = None,
+        timing: Optional[DocTiming] = None
     ) -> Optional[str]:
-        """导出文档，返回下载链接"""
-        url = self.API_DOC_EXPORT.format(doc_id=doc.id)
+        """
+        导出文档，返回下载链接
         
-        options_str = ""
-        if export_type == ExportType.MARKDOWN:
-            options_str = json.dumps({"latexType": 1, "useMdai": 1})
-        elif export_type == ExportType.PDF:
-            options_str = json.dumps({"enableToc": 1})
-
-        payload = {
-            "type": export_type.value,
-            "force": 0,
-            "options": options_str
-        }
+        Args:
+            policy: 轮询策略，默认使用 self.poll_policy
+            timing: 可选，记录触发耗时、等待时间与请求次数
+        """
+        policy = policy or self.poll_policy
         
         try:
             # 1. 发起导出请求
-            response = self._request_api("POST", url, json=payload)
+            started = time.monotonic()
+            deadline = started + policy.deadline_for(export_type.value)
+            state, download_url = self.request_export(doc, export_type)
+            triggered = time.monotonic()
+            if timing is not None:
+                timing.trigger_seconds = triggered - started
+                timing.polls = 1
             
-            # 特殊处理：未发布文档
-            if response and response.get('status') == 400:
-                msg = response.get('message', '')
-                if "请发布后再导出" in msg:
-                    print(f"⚠️ 文档未发布: {doc.title}，将创建空文件")
-                    return "EMPTY_DOC"
-            
-            if not response:
+            # 未发布文档 / 请求失败
+            if state == "empty":
+                return download_url
+            if state == "error":
                 return None
             
-            data = response.get('data', {})
-            state = data.get('state', '')
-            
-            # 2. 轮询状态
-            retry_count = 0
-            while state == 'pending' and retry_count < max_retries:
-                time.sleep(1.5)
-                response = self._request_api("POST", url, json=payload)
-                if response:
-                    data = response.get('data', {})
-                    state = data.get('state', '')
-                retry_count += 1
+            # 2. 轮询状态 (快速首探 + 指数退避，受单文档截止时间约束)
+            # 轮询过程中的单次请求失败视为仍在处理中，继续重试
+            delays = policy.delays()
+            while state in ("pending", "error"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(next(delays), remaining))
+                state, download_url = self.request_export(doc, export_type)
+                if timing is not None:
+                    timing.polls += 1
             
+            if timing is not None:
+                timing.pending_seconds = time.monotonic() - triggered
             if state != 'success':
+                if state in ("pending", "error"):
+                    self.export_latency.add_timeout(export_type.value)
                 print(f"❌ 导出超时或失败: state={state}")
                 return None
-                
-            download_url = data.get('url', '')
-            if download_url.startswith('/'):
-                download_url = f"{self.BASE_URL}{download_url}"
-                
+            
+            self.export_latency.add(export_type.value, time.monotonic() - started)
             return download_url
             
         except Exception as e:
             print(f"❌ 导出文档异常: {e}")
             return None
 
+    def request_export(self, doc: Document, export_type: ExportType) -> Tuple[str, Optional[str]]:
+        """
+        发起或查询一次导出 (单次 POST，不等待)
+        
+        Returns:
+            (state, url): state 为 success/pending/empty/error 或服务端返回的其他状态；
+                          success 时 url 为下载链接，empty (未发布文档) 时 url 为 "EMPTY_DOC"
+        """
+        url = self.base_url + self.API_DOC_EXPORT.format(doc_id=doc.id)
+        with self._counter_lock:
+            self.export_requests += 1
+        response = self._request_api("POST", url, json=self._export_payload(export_type))
+        
+        # 特殊处理：未发布文档
+        if response and response.get('status') == 400:
+            msg = response.get('message', '')
+            if "请发布后再导出" in msg:
+                print(f"⚠️ 文档未发布: {doc.title}，将创建空文件")
+                return "empty", "EMPTY_DOC"
+        
+        if not response:
+            return "error", None
+        
+        data = response.get('data') or {}
+        state = data.get('state', '')
+        if state != 'success':
+            return state or "failed", None
+        
+        download_url = data.get('url', '')
+        if download_url.startswith('/'):
+            download_url = f"{self.base_url}{download_url}"
+        return "success", download_url
+
+    @staticmethod
+    def _export_payload(export_type: ExportType) -> Dict[str, Any]:
+        options_str = ""
+        if export_type == ExportType.MARKDOWN:
+            options_str = json.dumps({"latexType": 1, "useMdai": 1})
+        elif export_type == ExportType.PDF:
+            options_str = json.dumps({"enableToc": 1})
+
+        return {
+            "type": export_type.value,
+            "force": 0,
+            "options": options_str
+        }
+
     def download_file(
         self, 
         url: str, 
         save_path: str, 
-        progress_callback: Optional[Any] = None
+        progress_callback: Optional[Any] = None,
+        header_writer: Optional[Callable[[bytes], bytes]] = None,
+        timing: Optional[DocTiming] = None,
+        blob_store: Optional[BlobStore] = None
     ) -> bool:
         """
-        下载文件
+        下载文件 (支持断点续传)
+        
+        先写入 <save_path>.part，连接中断时用 Range 请求从已下载位置续传；
+        按 content-length 校验完整性后原子重命名为目标文件。
+        失败时保留 .part (及 .part.json 续传信息)，下次下载同一链接可继续。
         
         Args:
             url: 下载链接
             save_path: 保存路径
             progress_callback: 进度回调 (chunk_size, total_size)
+            header_writer: 写入钩子，参数为正文开头 (至少 3 字节，正文更短时为全部)，
+                           返回需写在正文之前的内容 (如 Front Matter)，与正文一次写入
+            timing: 可选，记录下载字节数、总耗时与写盘耗时
+            blob_store: 可选，下载时计算正文 (不含 header_writer 的前缀) 的 sha256，
+                        完成后经内容寻址存储去重落盘
         """
+        path_obj = Path(save_path)
+        part_path = path_obj.with_name(path_obj.name + ".part")
+        meta_path = path_obj.with_name(path_obj.name + ".part.json")
+        started = time.perf_counter()
+        
+        try:
+            return self._download(
+                url, path_obj, part_path, meta_path, progress_callback, header_writer, timing, blob_store
+            )
+        finally:
+            if timing is not None:
+                timing.download_seconds += time.perf_counter() - started
+
+    def _download(
+        self,
+        url: str,
+        path_obj: Path,
+        part_path: Path,
+        meta_path: Path,
+        progress_callback: Optional[Any],
+        header_writer: Optional[Callable[[bytes], bytes]],
+        timing: Optional[DocTiming],
+        blob_store: Optional[BlobStore] = None
+    ) -> bool:
+        """download_file 的实现 (重试、校验与原子重命名)"""
         try:
             # 方案二：使用 requests 下载 (更稳定，易于控制进度和验证完整性)
-            browser_cookies = self.tab.cookies()
-            cookies = {c['name']: c['value'] for c in browser_cookies if 'name' in c and 'value' in c}
+            # cookies/UA 来自 Session 快照，不再每次访问浏览器
+            self._ensure_cookies()
+            digest = StreamDigest() if blob_store is not None else None
             
-            headers = {
-                "User-Agent": self.tab.user_agent,
-                "Referer": "https://www.yuque.com/"
-            }
+            for attempt in range(1, self.MAX_DOWNLOAD_ATTEMPTS + 1):
+                try:
+                    if not self._download_part(
+                        url, part_path, meta_path, progress_callback, header_writer, timing, digest
+                    ):
+                        return False
+                    break
+                except (requests.RequestException, IOError) as e:
+                    # 网络中断或长度不符：保留 .part，下一轮续传
+                    print(f"⚠️ 下载中断 ({attempt}/{self.MAX_DOWNLOAD_ATTEMPTS}): {e}")
+            else:
+                print("❌ 下载失败: 重试次数已用完")
+                return False
             
-            response = self.session.get(url, cookies=cookies, headers=headers, stream=True, timeout=60)
-            if response.status_code != 200:
-                print(f"❌ 下载请求失败: {response.status_code}")
+            # 验证大小 (不含写入钩子添加的前缀)
+            prefix_len = int(self._read_part_meta(meta_path).get("prefix", 0))
+            if part_path.stat().st_size - prefix_len <= 0:
+                print("❌ 下载文件为空")
+                part_path.unlink() # 删除空文件
+                meta_path.unlink(missing_ok=True)
                 return False
             
-            total_size = int(response.headers.get('content-length', 0))
-            if progress_callback and total_size > 0:
-                progress_callback(0, total_size)
+            replace_start = time.perf_counter()
+            if digest is not None:
+                if digest.length != part_path.stat().st_size - prefix_len:
+                    # .part 在本次调用之前已完整 (416)，摘要需从文件计算
+                    digest.rehash(part_path, skip=prefix_len)
+                blob_store.adopt(part_path, path_obj, digest.hexdigest(), prefix_len=prefix_len)
+            else:
+                os.replace(part_path, path_obj)
+            if timing is not None:
+                timing.write_seconds += time.perf_counter() - replace_start
+            meta_path.unlink(missing_ok=True)
+            return True
             
-            from pathlib import Path
-            path_obj = Path(save_path)
+        except Exception as e:
+            print(f"❌ 下载异常: {e}")
+            return False
+
+    def _download_part(
+        self,
+        url: str,
+        part_path: Path,
+        meta_path: Path,
+        progress_callback: Optional[Any] = None,
+        header_writer: Optional[Callable[[bytes], bytes]] = None,
+        timing: Optional[DocTiming] = None,
+        digest: Optional[StreamDigest] = None
+    ) -> bool:
+        """
+        下载 (或续传) 到 .part 文件
+        
+        .part 开头可能包含 header_writer 写入的前缀，其长度记录在 .part.json 中，
+        续传时 Range 只按正文字节计算
+        
+        Returns:
+            bool: 完整下载返回 True；服务端拒绝 (非 200/206) 返回 False
+        
+        Raises:
+            requests.RequestException / IOError: 连接中断或长度不符，可续传
+        """
+        written = part_path.stat().st_size if part_path.exists() else 0
+        meta = self._read_part_meta(meta_path) if written else {}
+        prefix_len = int(meta.get("prefix", 0))
+        offset = written - prefix_len
+        
+        # 压缩传输会导致 content-length 与写入字节数不一致，且无法按字节续传
+        headers = {"Accept-Encoding": "identity"}
+        if offset > 0 and meta.get("url") == url:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("validator"):
+                headers["If-Range"] = meta["validator"]
+        else:
+            offset = 0
+        
+        response = self._send("download", "GET", url, headers=headers, stream=True, timeout=60)
+        if self._is_auth_failure(response):
+            response.close()
+            self.sync_cookies()
+            response = self._send("download", "GET", url, headers=headers, stream=True, timeout=60)
+        
+        if response.status_code == 416 and offset:
+            response.close()
+            if offset == meta.get("total"):
+                # .part 已完整
+                return True
+            # 续传位置无效：丢弃 .part 后从头重试
+            part_path.unlink()
+            raise IOError("续传位置无效，重新下载")
+        if response.status_code == 206 and offset:
+            mode = "ab"
+        elif response.status_code == 200:
+            # 服务端不支持 Range (或资源已变化)，从头下载
+            offset, mode = 0, "wb"
+        else:
+            print(f"❌ 下载请求失败: {response.status_code}")
+            response.close()
+            return False
+        
+        length = int(response.headers.get('content-length', 0))
+        total_size = offset + length if length else 0
+        validator = self._range_validator(response)
+        
+        if progress_callback and total_size > 0:
+            progress_callback(0, total_size)
+            if offset:
+                progress_callback(offset, None)
+        
+        if mode == "wb":
+            prefix_len = 0
+        if digest is not None:
+            if mode == "wb":
+                digest.reset()
+            elif digest.length != written - prefix_len:
+                # 续传的 .part 来自之前的进程，先补算已有正文
+                digest.rehash(part_path, skip=prefix_len)
+        # 写入钩子只在从头下载时调用
+        hook = header_writer if mode == "wb" else None
+        
+        def write_meta():
+            meta_path.write_text(
+                json.dumps({"url": url, "validator": validator, "total": total_size, "prefix": prefix_len}),
+                encoding="utf-8"
+            )
+        
+        def on_prefix(length: int):
+            nonlocal prefix_len
+            prefix_len = length
+            write_meta()
+        
+        with open(part_path, mode) as raw:
+            if hook is None:
+                write_meta()
+            self._copy_body(response, _PartWriter(raw, timing, digest), hook, progress_callback, on_prefix)
+        
+        body_written = part_path.stat().st_size - prefix_len
+        if total_size and body_written != total_size:
+            raise IOError(f"长度不符: {body_written}/{total_size}")
+        return True
+
+    def download_to(
+        self,
+        url: str,
+        sink: BinaryIO,
+        header_writer: Optional[Callable[[bytes], bytes]] = None,
+        timing: Optional[DocTiming] = None
+    ) -> bool:
+        """
+        下载到可写的文件对象 (如写入归档前的 SpooledTemporaryFile)，不创建目标文件
+        
+        sink 需可 seek/truncate。连接中断时按已写入的正文字节用 Range 续传，
+        续传信息只保存在本次调用内；失败时 sink 中可能残留部分内容。
+        
+        Args:
+            url: 下载链接
+            sink: 写入目标
+            header_writer: 写入钩子，同 download_file
+            timing: 可选，记录下载字节数、总耗时与写入耗时
+        """
+        started = time.perf_counter()
+        try:
+            self._ensure_cookies()
+            prefix_len, validator = 0, ""
             
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        if progress_callback:
-                            progress_callback(len(chunk), None)
+            def on_prefix(length: int):
+                # 中断时也需要已写入的前缀长度，才能算出正文的续传位置
+                nonlocal prefix_len
+                prefix_len = length
             
-            # 验证大小
-            if path_obj.exists() and path_obj.stat().st_size > 0:
-                return True
+            for attempt in range(1, self.MAX_DOWNLOAD_ATTEMPTS + 1):
+                try:
+                    offset = sink.tell() - prefix_len
+                    headers = {"Accept-Encoding": "identity"}
+                    if offset > 0:
+                        headers["Range"] = f"bytes={offset}-"
+                        if validator:
+                            headers["If-Range"] = validator
+                    
+                    response = self._send("download", "GET", url, headers=headers, stream=True, timeout=60)
+                    if self._is_auth_failure(response):
+                        response.close()
+                        self.sync_cookies()
+                        response = self._send("download", "GET", url, headers=headers, stream=True, timeout=60)
+                    
+                    if response.status_code == 200:
+                        # 从头下载 (首次请求，或服务端不支持 Range / 资源已变化)
+                        sink.seek(0)
+                        sink.truncate()
+                        offset, prefix_len = 0, 0
+                    elif response.status_code != 206 or not offset:
+                        print(f"❌ 下载请求失败: {response.status_code}")
+                        response.close()
+                        return False
+                    
+                    length = int(response.headers.get('content-length', 0))
+                    total_size = offset + length if length else 0
+                    validator = self._range_validator(response)
+                    hook = header_writer if offset == 0 else None
+                    self._copy_body(response, _PartWriter(sink, timing, None), hook, on_prefix=on_prefix)
+                    
+                    body_written = sink.tell() - prefix_len
+                    if total_size and body_written != total_size:
+                        raise IOError(f"长度不符: {body_written}/{total_size}")
+                    break
+                except (requests.RequestException, IOError) as e:
+                    print(f"⚠️ 下载中断 ({attempt}/{self.MAX_DOWNLOAD_ATTEMPTS}): {e}")
             else:
+                print("❌ 下载失败: 重试次数已用完")
+                return False
+            
+            if sink.tell() - prefix_len <= 0:
                 print("❌ 下载文件为空")
-                if path_obj.exists():
-                    path_obj.unlink() # 删除空文件
                 return False
+            return True
             
         except Exception as e:
             print(f"❌ 下载异常: {e}")
             return False
+        finally:
+            if timing is not None:
+                timing.download_seconds += time.perf_counter() - started
+
+    def _copy_body(
+        self,
+        response: requests.Response,
+        f: "_PartWriter",
+        header_writer: Optional[Callable[[bytes], bytes]] = None,
+        progress_callback: Optional[Any] = None,
+        on_prefix: Optional[Callable[[int], None]] = None
+    ) -> Optional[int]:
+        """
+        将响应正文写入 f
+        
+        提供 header_writer 时先缓冲正文开头 (至少 3 字节) 交给钩子判断，前缀写在正文之前
+        
+        Returns:
+            int: 写入的前缀字节数；未调用钩子时为 None
+        """
+        head = bytearray() if header_writer else None
+        prefix_len = None
+        for chunk in response.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+            if not chunk:
+                continue
+            if head is not None:
+                head.extend(chunk)
+                if len(head) < 3:
+                    continue
+                prefix_len = self._write_prefix(f, header_writer, bytes(head))
+                if on_prefix:
+                    on_prefix(prefix_len)
+                chunk, head = bytes(head), None
+            f.write(chunk)
+            if progress_callback:
+                progress_callback(len(chunk), None)
+        if head is not None:
+            # 正文不足 3 字节 (或为空)
+            prefix_len = self._write_prefix(f, header_writer, bytes(head))
+            if on_prefix:
+                on_prefix(prefix_len)
+            f.write(bytes(head))
+        return prefix_len
+
+    @staticmethod
+    def _range_validator(response: requests.Response) -> str:
+        """续传用的 If-Range 值: If-Range 只接受强 ETag，否则退回 Last-Modified"""
+        validator = response.headers.get("ETag", "")
+        if not validator or validator.startswith("W/"):
+            validator = response.headers.get("Last-Modified", "")
+        return validator
+
+    @staticmethod
+    def _write_prefix(f: "_PartWriter", header_writer: Callable[[bytes], bytes], head: bytes) -> int:
+        """调用写入钩子并写出前缀，返回前缀字节数"""
+        prefix = header_writer(head) or b""
+        f.write(prefix, body=False)
+        return len(prefix)
+
+    @staticmethod
+    def _read_part_meta(meta_path: Path) -> Dict[str, Any]:
+        """读取续传信息 (不存在或损坏时返回空字典)"""
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
 
     def _request_api(self, method: str, url: str, **kwargs) -> Optional[Dict]:
-        """通用 API 请求封装 (使用 requests + browser cookies)"""
+        """通用 API 请求封装 (使用 requests + 浏览器 cookie 快照)"""
         try:
-            # 从浏览器获取 cookie
-            browser_cookies = self.tab.cookies()
-            cookies = {c['name']: c['value'] for c in browser_cookies if 'name' in c and 'value' in c}
+            self._ensure_cookies()
             
             headers = {
-                "User-Agent": self.tab.user_agent,
-                "Referer": "https://www.yuque.com/",
                 "Accept": "application/json",
                 "X-Requested-With": "XMLHttpRequest" 
             }
@@ -264,15 +901,20 @@ class YuqueClient:
             if 'headers' in kwargs:
                 headers.update(kwargs.pop('headers'))
             
-            response = self.session.request(
+            response = self._send(
+                "api",
                 method, 
                 url, 
-                cookies=cookies, 
                 headers=headers, 
                 timeout=30, # 增加默认超时
                 **kwargs
             )
             
+            if self._is_auth_failure(response):
+                # 会话失效：从浏览器重新同步一次后重试
+                self.sync_cookies()
+                response = self._send("api", method, url, headers=headers, timeout=30, **kwargs)
+            
             if response.status_code == 200:
                 return response.json()
             elif response.status_code == 400:
@@ -290,3 +932,28 @@ class YuqueClient:
         except Exception as e:
             print(f"Request Exception: {e}")
             return None
+
+
+class _PartWriter:
+    """
+    .part 文件 (或 download_to 的写入目标) 的写入包装
+
+    可选地累计正文字节数与写盘耗时 (DocTiming)，并边写边计算正文摘要 (StreamDigest)
+    """
+
+    def __init__(self, f, timing: Optional[DocTiming] = None, digest: Optional[StreamDigest] = None):
+        self._f = f
+        self._timing = timing
+        self._digest = digest
+
+    def write(self, data: bytes, body: bool = True) -> None:
+        if self._timing is None:
+            self._f.write(data)
+        else:
+            start = time.perf_counter()
+            self._f.write(data)
+            self._timing.write_seconds += time.perf_counter() - start
+            if body:
+                self._timing.bytes += len(data)
+        if body and self._digest is not None:
+            self._digest.update(data)
@@ -4,12 +4,32 @@
 负责文件系统操作，保存文档内容
 """
 
+import os
 import re
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 from datetime import datetime
 from .models import Document
 
+# Windows 非法字符 < > : " / \ | ? *
+_ILLEGAL_CHARS = re.compile(r'[<>:"/\\|?*]')
+# 控制字符
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+
+
+def sanitize_filename(name: str) -> str:
+    """文件名去除非法字符"""
+    name = _ILLEGAL_CHARS.sub('_', name)
+    name = _CONTROL_CHARS.sub('', name)
+    # 移除首尾空格和点
+    name = name.strip().strip('.')
+    
+    if not name:
+        name = "Untitled"
+        
+    return name[:100]  # 限制长度
+
+
 class DocumentExporter:
     """文档导出工具类"""
     
@@ -27,26 +47,30 @@ class DocumentExporter:
             extension: 扩展名
             relative_path: 相对目录路径 (用于保持层级结构)
         """
-        # 清理路径名
-        safe_repo = self._sanitize_filename(repo_name)
+        save_path = self.output_dir / self.relative_save_path(doc, repo_name, extension, relative_path)
         
-        # 基础目录
-        save_dir = self.output_dir / safe_repo
+        # 确保目录存在
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        return save_path
+
+    def relative_save_path(
+        self, doc: Document, repo_name: str, extension: str = ".md", relative_path: str = ""
+    ) -> Path:
+        """相对输出目录的保存路径 (不创建目录，归档输出时作为条目名)"""
+        # 清理路径名
+        save_dir = Path(self._sanitize_filename(repo_name))
         
         # 处理相对路径
         if relative_path:
             parts = [self._sanitize_filename(p) for p in relative_path.split("/") if p]
             save_dir = save_dir.joinpath(*parts)
         
-        # 确保目录存在
-        save_dir.mkdir(parents=True, exist_ok=True)
-        
         # 文件名
         filename = self._sanitize_filename(doc.title) + extension
         return save_dir / filename
 
     def add_metadata(self, filepath: Path, doc: Document) -> None:
-        """为 Markdown 文件添加 Front Matter"""
+        """为已存在的 Markdown 文件添加 Front Matter (需重写整个文件，下载时优先使用 front_matter_writer)"""
         if not filepath.exists():
             return
             
@@ -56,7 +80,29 @@ class DocumentExporter:
             if content.startswith('---'):
                 return
                 
-            metadata = f"""---
+            # 写入新文件后替换: 导出文件可能与 blob 存储共享数据，不能就地改写
+            tmp_path = filepath.with_name(filepath.name + ".tmp")
+            tmp_path.write_text(self.front_matter(doc) + content, encoding='utf-8')
+            os.replace(tmp_path, filepath)
+        except Exception as e:
+            print(f"⚠️ 添加元数据失败: {e}")
+
+    def front_matter_writer(self, doc: Document) -> Callable[[bytes], bytes]:
+        """
+        生成供 YuqueClient.download_file 使用的写入钩子
+        
+        下载时在正文之前写入 Front Matter，避免下载后再读写整个文件；
+        正文已以 --- 开头时不添加
+        """
+        def writer(head: bytes) -> bytes:
+            if head.startswith(b'---'):
+                return b""
+            return self.front_matter(doc).encode('utf-8')
+        return writer
+
+    def front_matter(self, doc: Document) -> str:
+        """生成 YAML Front Matter"""
+        return f"""---
 title: {doc.title}
 url: {doc.slug}
 doc_id: {doc.doc_id}
@@ -67,20 +113,7 @@ exported_at: {datetime.now().isoformat()}
 ---
 
 """
-            filepath.write_text(metadata + content, encoding='utf-8')
-        except Exception as e:
-            print(f"⚠️ 添加元数据失败: {e}")
 
     def _sanitize_filename(self, name: str) -> str:
         """文件名去除非法字符"""
-        # 替换 Windows 非法字符 < > : " / \ | ? *
-        name = re.sub(r'[<>:"/\\|?*]', '_', name)
-        # 移除控制字符
-        name = re.sub(r'[\x00-\x1f\x7f]', '', name)
-        # 移除首尾空格和点
-        name = name.strip().strip('.')
-        
-        if not name:
-            name = "Untitled"
-            
-        return name[:100]  # 限制长度
+        return sanitize_filename(name)
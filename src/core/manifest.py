@@ -0,0 +1,112 @@
+"""
+增量导出清单
+============
+记录每个输出目录中已导出文档的版本，跳过未变化的文档
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .models import Document
+
+
+class ExportManifest:
+    """
+    输出目录下的导出清单 (.yuque_manifest.json，线程安全)
+
+    以 "doc_id:格式" 为键记录 updated_at、文件路径、大小与 sha256。
+    文档的 updated_at 未变且文件仍在 (大小一致) 时视为未变化，无需再调用导出接口。
+    """
+
+    FILENAME = ".yuque_manifest.json"
+    VERSION = 1
+
+    def __init__(self, root: Path):
+        """
+        Args:
+            root: 导出根目录 (与 DocumentExporter.output_dir 相同)
+        """
+        self.root = Path(root)
+        self.path = self.root / self.FILENAME
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def key(doc: Document, export_format: str) -> str:
+        return f"{doc.doc_id or doc.id}:{export_format}"
+
+    def classify(self, doc: Document, export_format: str) -> str:
+        """
+        判断文档相对清单的状态
+
+        Returns:
+            "unchanged" / "changed" / "new"
+        """
+        with self._lock:
+            entry = self._entries.get(self.key(doc, export_format))
+        if entry is None:
+            return "new"
+        if not doc.updated_at or entry.get("updated_at") != doc.updated_at:
+            return "changed"
+        try:
+            size = (self.root / entry["path"]).stat().st_size
+        except (OSError, KeyError):
+            return "changed"
+        return "unchanged" if size == entry.get("size") else "changed"
+
+    def get(self, doc: Document, export_format: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(self.key(doc, export_format))
+            return dict(entry) if entry else None
+
+    def record(self, doc: Document, export_format: str, path: Path) -> None:
+        """登记导出成功的文件 (计算 sha256)"""
+        path = Path(path)
+        entry = {
+            "doc_id": doc.doc_id or doc.id,
+            "updated_at": doc.updated_at,
+            "format": export_format,
+            "path": self._relative(path),
+            "size": path.stat().st_size,
+            "sha256": file_sha256(path),
+        }
+        with self._lock:
+            self._entries[self.key(doc, export_format)] = entry
+
+    def save(self) -> None:
+        """原子写入清单文件"""
+        with self._lock:
+            data = {"version": self.VERSION, "entries": dict(self._entries)}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        entries = data.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def _relative(self, path: Path) -> str:
+        try:
+            return path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return str(path.resolve())
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """流式计算文件 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,242 @@
+"""
+导出性能统计
+============
+线程安全的分阶段耗时与吞吐统计
+"""
+
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Iterable, List
+
+
+class StageStats:
+    """
+    按阶段累计耗时与处理次数 (线程安全)
+
+    多个 worker 并发记录时，busy_seconds 为各线程耗时之和，
+    per_second 以整体墙钟时间计算，反映该阶段的实际吞吐。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def track(self, stage: str):
+        """统计 with 块的耗时并计入指定阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += count
+            entry["seconds"] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        """生成可序列化的统计摘要"""
+        wall = time.perf_counter() - self._started
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self._stages.items()}
+
+        result: Dict[str, Any] = {"wall_seconds": round(wall, 3), "stages": {}}
+        for name, entry in stages.items():
+            count = int(entry["count"])
+            result["stages"][name] = {
+                "count": count,
+                "busy_seconds": round(entry["seconds"], 3),
+                "avg_seconds": round(entry["seconds"] / count, 3) if count else 0.0,
+                "per_second": round(count / wall, 3) if wall > 0 else 0.0,
+            }
+        return result
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """线性插值分位数 (sorted_values 需已排序，q 取值 0~100)"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class LatencyRecorder:
+    """
+    按 key (如导出格式) 记录耗时样本与超时次数 (线程安全)
+
+    用于观察导出从触发到成功的耗时分布，据此调整轮询策略默认值。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+        self._timeouts: Dict[str, int] = {}
+
+    def add(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, []).append(seconds)
+
+    def add_timeout(self, key: str) -> None:
+        with self._lock:
+            self._timeouts[key] = self._timeouts.get(key, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        """生成每个 key 的分位数摘要"""
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+            timeouts = dict(self._timeouts)
+
+        result: Dict[str, Any] = {}
+        for key in sorted(set(samples) | set(timeouts)):
+            values = samples.get(key, [])
+            result[key] = {
+                "count": len(values),
+                "timeouts": timeouts.get(key, 0),
+                "mean": round(sum(values) / len(values), 3) if values else 0.0,
+                "p50": round(percentile(values, 50), 3),
+                "p90": round(percentile(values, 90), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(values[-1], 3) if values else 0.0,
+            }
+        return result
+
+
+@dataclass
+class DocTiming:
+    """
+    单篇文档的分阶段耗时与数据量
+
+    由 YuqueClient.export_document / ExportPoller (导出阶段) 与 YuqueClient.download_file
+    (下载阶段) 填写；调用方可用 track() 把导出器的写盘操作计入 write_seconds。
+
+    Attributes:
+        queue_seconds: 在集中式轮询器中等待首次触发的时间 (顺序模式为 0)
+        trigger_seconds: 首次导出请求 (触发) 的耗时
+        pending_seconds: 触发返回后到导出完成的时间 (服务端渲染 + 轮询间隔)
+        polls: 导出请求次数 (含首次触发)
+        bytes: 本次下载写入的正文字节数
+        download_seconds: download_file 总耗时 (含写盘)
+        write_seconds: 写盘耗时
+    """
+    queue_seconds: float = 0.0
+    trigger_seconds: float = 0.0
+    pending_seconds: float = 0.0
+    polls: int = 0
+    bytes: int = 0
+    download_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+    @property
+    def download_bps(self) -> float:
+        """下载吞吐 (字节/秒)"""
+        return self.bytes / self.download_seconds if self.download_seconds > 0 else 0.0
+
+    @contextmanager
+    def track(self, field_name: str):
+        """将 with 块的耗时累加到指定字段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, field_name, getattr(self, field_name) + time.perf_counter() - start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queue_seconds": round(self.queue_seconds, 4),
+            "trigger_seconds": round(self.trigger_seconds, 4),
+            "pending_seconds": round(self.pending_seconds, 4),
+            "polls": self.polls,
+            "bytes": self.bytes,
+            "download_seconds": round(self.download_seconds, 4),
+            "download_bps": round(self.download_bps, 1),
+            "write_seconds": round(self.write_seconds, 4),
+        }
+
+
+class DocMetrics:
+    """
+    汇总每篇文档的 DocTiming (线程安全)
+
+    summary() 给出各指标的分位数；keep_rows=True 时保留逐篇记录，供 write_rows 导出。
+    导出阶段的指标只统计发起过导出请求的文档，下载阶段的指标只统计实际下载过的文档。
+    """
+
+    EXPORT_FIELDS = ("queue_seconds", "trigger_seconds", "pending_seconds", "polls")
+    DOWNLOAD_FIELDS = ("bytes", "download_seconds", "download_bps", "write_seconds")
+
+    def __init__(self, keep_rows: bool = False):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {name: [] for name in self.EXPORT_FIELDS + self.DOWNLOAD_FIELDS}
+        self._rows: List[Dict[str, Any]] = []
+        self._keep_rows = keep_rows
+        self._count = 0
+
+    def add(self, timing: Dict[str, Any], **info: Any) -> None:
+        """
+        Args:
+            timing: DocTiming.to_dict() 的结果
+            info: 随逐篇记录保存的文档信息 (uuid、标题、状态等)
+        """
+        with self._lock:
+            self._count += 1
+            if timing.get("polls"):
+                for name in self.EXPORT_FIELDS:
+                    self._samples[name].append(timing.get(name, 0))
+            if timing.get("download_seconds"):
+                for name in self.DOWNLOAD_FIELDS:
+                    self._samples[name].append(timing.get(name, 0))
+            elif timing.get("write_seconds"):
+                self._samples["write_seconds"].append(timing["write_seconds"])
+            if self._keep_rows:
+                self._rows.append({**info, **timing})
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._rows)
+
+    def summary(self) -> Dict[str, Any]:
+        """文档数、下载总字节数及每个指标的 mean/p50/p90/p99/max"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            count = self._count
+
+        result: Dict[str, Any] = {"count": count, "bytes_total": int(sum(samples["bytes"]))}
+        for name, values in samples.items():
+            result[name] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 4) if values else 0.0,
+                "p50": round(percentile(values, 50), 4),
+                "p90": round(percentile(values, 90), 4),
+                "p99": round(percentile(values, 99), 4),
+                "max": round(values[-1], 4) if values else 0.0,
+            }
+        return result
+
+
+def write_rows(path: Path, rows: Iterable[Dict[str, Any]]) -> Path:
+    """逐篇记录写入文件: 扩展名为 .csv 时写 CSV，否则写 JSON 数组"""
+    path = Path(path)
+    rows = list(rows)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".csv":
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return path
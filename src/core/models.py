@@ -4,12 +4,32 @@
 定义知识库和文档的数据结构
 """
 
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+import sys
+from dataclasses import dataclass, fields
+from typing import Dict, Any, Tuple
 
+# Python 3.10+ 使用 __slots__ (无实例 __dict__)，大目录下显著降低内存占用
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
-class Repository:
+
+class _CompactModel:
+    """模型公共方法: 扁平字段的快速序列化/反序列化 (替代递归深拷贝的 dataclasses.asdict)"""
+
+    __slots__ = ()
+    _FIELD_NAMES: Tuple[str, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为 JSON 可序列化的 dict (字段均为标量，无需深拷贝)"""
+        return {name: getattr(self, name) for name in self._FIELD_NAMES}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """从 to_dict 的结果构建 (忽略未知字段，兼容旧版本缓存)"""
+        return cls(**{name: data[name] for name in cls._FIELD_NAMES if name in data})
+
+
+@dataclass(**_DATACLASS_OPTIONS)
+class Repository(_CompactModel):
     """
     知识库模型
     
@@ -24,6 +44,8 @@ class Repository:
         user_login: 用户 login (用于构建 URL)
         public: 是否公开 (0=私有, 1=公开)
         cover: 封面图 URL
+        updated_at: 知识库更新时间
+        content_updated_at: 知识库内容 (文档/目录) 更新时间
     """
     id: int
     name: str
@@ -33,6 +55,8 @@ class Repository:
     doc_count: int = 0
     public: int = 0
     cover: str = ""
+    updated_at: str = ""
+    content_updated_at: str = ""
     
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'Repository':
@@ -51,8 +75,17 @@ class Repository:
             doc_count=target.get('items_count', 0),
             public=target.get('public', 0),
             cover=target.get('cover', ''),
+            updated_at=target.get('updated_at', '') or '',
+            content_updated_at=target.get('content_updated_at', '') or '',
         )
     
+    @property
+    def version_marker(self) -> str:
+        """知识库版本标记，目录或文档变化时随之改变 (无更新时间时为空)"""
+        if not self.updated_at and not self.content_updated_at:
+            return ""
+        return f"{self.updated_at}|{self.content_updated_at}"
+    
     @property
     def url(self) -> str:
         """知识库 URL"""
@@ -63,8 +96,8 @@ class Repository:
         return f"{visibility} {self.name} ({self.doc_count} 篇)"
 
 
-@dataclass
-class Document:
+@dataclass(**_DATACLASS_OPTIONS)
+class Document(_CompactModel):
     """
     文档模型
     
@@ -89,7 +122,6 @@ class Document:
     created_at: str = ""
     updated_at: str = ""
     word_count: int = 0
-    children: List['Document'] = field(default_factory=list) # 用于构建树结构
     
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'Document':
@@ -116,3 +148,7 @@ class Document:
     
     def __str__(self) -> str:
         return f"📄 {self.title}"
+
+
+Repository._FIELD_NAMES = tuple(f.name for f in fields(Repository))
+Document._FIELD_NAMES = tuple(f.name for f in fields(Document))
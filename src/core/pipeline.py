@@ -0,0 +1,136 @@
+"""
+并发导出调度
+============
+有界线程池，让多篇文档同时处于 触发/轮询/下载 各阶段
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+def iter_bounded(
+    items: Iterable[Any],
+    worker: Callable[[Any], Any],
+    concurrency: int = 1
+) -> Iterator[Tuple[int, Any]]:
+    """
+    以最多 concurrency 个并发执行 worker(item)，按完成顺序产出 (index, result)
+
+    任务按需提交，任意时刻在途的文档不超过 concurrency 篇；
+    concurrency <= 1 时退化为顺序执行，不创建线程。
+    """
+    if concurrency <= 1:
+        for index, item in enumerate(items):
+            yield index, worker(item)
+        return
+
+    source = enumerate(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {}
+
+        def fill():
+            while len(pending) < concurrency:
+                nxt = next(source, None)
+                if nxt is None:
+                    return
+                index, item = nxt
+                pending[pool.submit(worker, item)] = index
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                yield index, future.result()
+            fill()
+
+
+def run_bounded(
+    items: Iterable[Any],
+    worker: Callable[[Any], Any],
+    concurrency: int = 1
+) -> List[Any]:
+    """并发执行并按输入顺序返回结果"""
+    items = list(items)
+    results: List[Any] = [None] * len(items)
+    for index, result in iter_bounded(items, worker, concurrency):
+        results[index] = result
+    return results
+
+
+def iter_polled(
+    items: Iterable[Any],
+    prepare: Callable[[Any], Optional[Tuple[Any, Any]]],
+    finish: Callable[[Any, Optional[str]], Any],
+    poller: Any,
+    download_concurrency: int = 1,
+    max_pending: Optional[int] = None
+) -> Iterator[Tuple[int, Any]]:
+    """
+    借助集中式轮询器 (ExportPoller) 执行导出，按完成顺序产出 (index, result)
+
+    - prepare(item) 返回 poller.submit 的参数 (doc, export_type[, stats]) 表示需要导出，
+      返回 None 表示无需导出
+    - 需要导出的任务交给 poller，完成后在下载线程池中调用 finish(item, url)
+    - 无需导出的任务直接 finish(item, None)
+
+    等待导出的任务不占用线程；排队 + 下载中的任务总数不超过 max_pending
+    (默认 download_concurrency * 4)。
+    """
+    download_concurrency = max(1, download_concurrency)
+    max_pending = max_pending or download_concurrency * 4
+    results: "queue.Queue[Tuple[int, Any, Optional[BaseException]]]" = queue.Queue()
+    source = enumerate(items)
+    in_flight = 0
+    exhausted = False
+    # 消费方离开 (出错或提前结束) 后线程池即关闭: 此后完成的导出不再提交下载，
+    # 否则轮询线程上的 submit 会抛出 "cannot schedule new futures after shutdown"
+    closed = False
+    submit_lock = threading.Lock()
+
+    with ThreadPoolExecutor(max_workers=download_concurrency) as pool:
+
+        def run_finish(index, item, url):
+            try:
+                results.put((index, finish(item, url), None))
+            except BaseException as exc:  # 交由消费方重新抛出
+                results.put((index, None, exc))
+
+        def on_exported(index, item, future):
+            try:
+                url = future.result()
+            except BaseException as exc:
+                results.put((index, None, exc))
+                return
+            with submit_lock:
+                if not closed:
+                    pool.submit(run_finish, index, item, url)
+
+        try:
+            while True:
+                while not exhausted and in_flight < max_pending:
+                    nxt = next(source, None)
+                    if nxt is None:
+                        exhausted = True
+                        break
+                    index, item = nxt
+                    job = prepare(item)
+                    if job is None:
+                        yield index, finish(item, None)
+                        continue
+                    in_flight += 1
+                    future = poller.submit(*job)
+                    future.add_done_callback(lambda f, i=index, it=item: on_exported(i, it, f))
+
+                if in_flight == 0:
+                    return
+                index, result, error = results.get()
+                in_flight -= 1
+                if error is not None:
+                    raise error
+                yield index, result
+        finally:
+            with submit_lock:
+                closed = True
@@ -0,0 +1,230 @@
+"""
+集中式导出轮询器
+================
+单线程调度所有待完成的 (文档, 格式) 导出任务
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional
+
+from .client import ExportType, YuqueClient
+from .metrics import DocTiming
+from .models import Document
+from .polling import PollPolicy
+
+
+@dataclass
+class _PollJob:
+    """一个待完成的导出任务"""
+    doc: Document
+    export_type: ExportType
+    future: Future
+    started: float
+    deadline: float
+    delays: Iterator[float]
+    stats: Optional[Any] = None
+    timing: Optional[DocTiming] = None
+    polls: int = 0
+    triggered: float = 0.0
+
+
+@dataclass(order=True)
+class _HeapEntry:
+    due: float
+    seq: int
+    job: _PollJob = field(compare=False)
+
+
+class ExportPoller:
+    """
+    集中式导出状态轮询器
+
+    所有任务共享一个调度线程：按到期时间轮流发起 触发/查询 请求，
+    每个任务的间隔遵循 PollPolicy，整体请求速率不超过 max_polls_per_second。
+    submit() 返回 Future，完成时结果与 YuqueClient.export_document 相同
+    (下载链接 / "EMPTY_DOC" / None)，可直接交给下载阶段。
+    """
+
+    def __init__(
+        self,
+        client: YuqueClient,
+        policy: Optional[PollPolicy] = None,
+        max_polls_per_second: float = 5.0,
+        stats: Optional[Any] = None
+    ):
+        """
+        Args:
+            client: 已认证的客户端
+            policy: 轮询策略，默认使用 client.poll_policy
+            max_polls_per_second: 全局轮询请求速率上限
+            stats: 可选 StageStats，记录每个任务的 "export" 阶段耗时
+        """
+        self.client = client
+        self.policy = policy or client.poll_policy
+        self.min_gap = 1.0 / max_polls_per_second if max_polls_per_second > 0 else 0.0
+        self.stats = stats
+        self._polls = 0
+
+        self._heap: List[_HeapEntry] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._cancelled = False
+        self._last_poll = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "ExportPoller":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(cancel=exc_type is not None)
+
+    @property
+    def polls(self) -> int:
+        """已发出的触发/查询请求数"""
+        with self._cond:
+            return self._polls
+
+    @property
+    def pending(self) -> int:
+        """尚未完成的任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="yuque-export-poller", daemon=True)
+            self._thread.start()
+
+    def submit(
+        self,
+        doc: Document,
+        export_type: ExportType,
+        stats: Optional[Any] = None,
+        timing: Optional[DocTiming] = None
+    ) -> Future:
+        """
+        登记导出任务 (立即排队触发)，返回完成时给出下载链接的 Future
+
+        Args:
+            stats: 记录该任务 "export" 阶段的 StageStats，默认使用构造时传入的 stats
+                   (多个知识库共用一个轮询器时各自统计)
+            timing: 可选，记录排队、触发、等待耗时与请求次数
+        """
+        now = time.monotonic()
+        job = _PollJob(
+            doc=doc,
+            export_type=export_type,
+            future=Future(),
+            started=now,
+            deadline=now + self.policy.deadline_for(export_type.value),
+            delays=self.policy.delays(),
+            stats=stats if stats is not None else self.stats,
+            timing=timing,
+        )
+        self._schedule(job, now)
+        return job.future
+
+    def close(self, cancel: bool = False) -> None:
+        """
+        停止调度线程
+
+        Args:
+            cancel: True 时放弃剩余任务 (Future 结果为 None)，否则等待全部完成
+        """
+        with self._cond:
+            self._closed = True
+            if cancel:
+                self._cancelled = True
+                for entry in self._heap:
+                    entry.job.future.set_result(None)
+                self._heap.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _schedule(self, job: _PollJob, due: float) -> None:
+        with self._cond:
+            if self._cancelled:
+                job.future.set_result(None)
+                return
+            heapq.heappush(self._heap, _HeapEntry(due, next(self._seq), job))
+            self._cond.notify_all()
+
+    def _next_due(self) -> Optional[_PollJob]:
+        """阻塞直到有任务到期；关闭且无任务时返回 None"""
+        with self._cond:
+            while True:
+                if not self._heap:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                wait = self._heap[0].due - time.monotonic()
+                if wait <= 0:
+                    return heapq.heappop(self._heap).job
+                self._cond.wait(wait)
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_due()
+            if job is None:
+                return
+            self._throttle()
+            try:
+                self._poll(job)
+            except Exception as e:
+                job.future.set_exception(e)
+
+    def _throttle(self) -> None:
+        gap = self._last_poll + self.min_gap - time.monotonic()
+        if gap > 0:
+            time.sleep(gap)
+        self._last_poll = time.monotonic()
+
+    def _poll(self, job: _PollJob) -> None:
+        sent = time.monotonic()
+        state, url = self.client.request_export(job.doc, job.export_type)
+        job.polls += 1
+        with self._cond:
+            self._polls += 1
+        now = time.monotonic()
+        fmt = job.export_type.value
+        if job.polls == 1:
+            job.triggered = now
+            if job.timing is not None:
+                job.timing.queue_seconds = sent - job.started
+                job.timing.trigger_seconds = now - sent
+        if job.timing is not None:
+            job.timing.polls = job.polls
+
+        # 首次触发失败直接放弃；轮询中的单次失败视为仍在处理中
+        waiting = state == "pending" or (state == "error" and job.polls > 1)
+        if waiting:
+            if now < job.deadline:
+                self._schedule(job, min(now + next(job.delays), job.deadline))
+                return
+            self.client.export_latency.add_timeout(fmt)
+            print(f"❌ 导出超时: {job.doc.title}")
+            self._finish(job, now, None)
+            return
+
+        if state == "success":
+            self.client.export_latency.add(fmt, now - job.started)
+        elif state != "empty":
+            print(f"❌ 导出失败: {job.doc.title} state={state}")
+        self._finish(job, now, url)
+
+    def _finish(self, job: _PollJob, now: float, result: Optional[str]) -> None:
+        if job.stats is not None:
+            job.stats.record("export", now - job.started)
+        if job.timing is not None and job.triggered:
+            job.timing.pending_seconds = now - job.triggered
+        job.future.set_result(result)
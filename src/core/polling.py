@@ -0,0 +1,59 @@
+"""
+导出状态轮询策略
+================
+首次快速探测 + 指数退避 (带抖动) + 上限 + 按格式的单文档截止时间
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Iterator
+
+
+def _default_format_deadlines() -> Dict[str, float]:
+    # 以 ExportType.value 为键；Markdown/Word 保持原先 180 秒的等待上限，PDF/Lakebook 服务端渲染明显更慢
+    return {
+        "markdown": 180.0,
+        "word": 180.0,
+        "pdf": 300.0,
+        "lake": 300.0,
+    }
+
+
+@dataclass
+class PollPolicy:
+    """
+    导出状态轮询策略
+
+    Attributes:
+        first_delay: 首次探测前等待 (秒)，小文档通常在此之前已完成
+        initial_interval: 退避起始间隔 (秒)
+        multiplier: 每次退避的倍数
+        max_interval: 单次等待上限 (秒)
+        jitter: 抖动比例 (0.2 表示 ±20%)，避免大量文档同时轮询
+        deadline: 未在 format_deadlines 中配置的格式使用的截止时间 (秒)
+        format_deadlines: 按格式的单文档截止时间 (秒)
+    """
+    first_delay: float = 0.2
+    initial_interval: float = 0.5
+    multiplier: float = 1.6
+    max_interval: float = 5.0
+    jitter: float = 0.2
+    deadline: float = 180.0
+    format_deadlines: Dict[str, float] = field(default_factory=_default_format_deadlines)
+
+    def deadline_for(self, export_format: str) -> float:
+        """获取指定格式的单文档截止时间"""
+        return self.format_deadlines.get(export_format, self.deadline)
+
+    def delays(self) -> Iterator[float]:
+        """依次产出每次轮询前的等待时间 (无限序列，由截止时间终止)"""
+        yield self._apply_jitter(self.first_delay)
+        interval = min(self.initial_interval, self.max_interval)
+        while True:
+            yield self._apply_jitter(interval)
+            interval = min(interval * self.multiplier, self.max_interval)
+
+    def _apply_jitter(self, delay: float) -> float:
+        if self.jitter <= 0:
+            return delay
+        return max(0.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
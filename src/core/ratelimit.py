@@ -0,0 +1,138 @@
+"""
+全局限流器
+==========
+令牌桶限流，遇到 429 / Retry-After 时所有 worker 统一降速
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+class TokenBucket:
+    """
+    令牌桶限流器 (线程安全)
+
+    throttle() 会暂停所有调用方直到 Retry-After 到期，并将速率减半；
+    此后每个 recovery_seconds 未再被限流则恢复 10% 基准速率，直至基准速率。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        min_rate: float = 0.2,
+        recovery_seconds: float = 5.0
+    ):
+        """
+        Args:
+            rate: 基准速率 (请求/秒)
+            burst: 桶容量，默认等于 rate (至少 1)
+            min_rate: 降速下限 (请求/秒)
+            recovery_seconds: 速率恢复步长间隔 (秒)
+        """
+        self._lock = threading.Lock()
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.min_rate = min(min_rate, rate)
+        self.recovery_seconds = recovery_seconds
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_throttle = 0.0
+
+        self.requests = 0
+        self.throttle_events = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self) -> float:
+        """获取一个令牌 (必要时阻塞)，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    self.waited_seconds += waited
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """
+        服务端要求降速 (429 / Retry-After)
+
+        Args:
+            retry_after: 服务端给出的等待秒数；缺省时按当前速率等待一个间隔
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttle_events += 1
+            self._last_throttle = now
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            # 暂停结束前不累积令牌，否则暂停一过就会放出一整批请求
+            self._tokens = 0.0
+            self._updated = self._blocked_until
+
+    def set_base_rate(self, rate: float) -> None:
+        """调整基准速率，保留当前的限流状态 (仍在降速中时不超过新的基准速率)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            throttled = self.rate < self.base_rate
+            self.base_rate = rate
+            self.rate = min(self.rate, rate) if throttled else rate
+            self.capacity = max(1.0, rate)
+            self.min_rate = min(self.min_rate, rate)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "requests": self.requests,
+                "throttle_events": self.throttle_events,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+    def _refill(self, now: float) -> None:
+        # 调用方需持有锁
+        if self.rate < self.base_rate and self._last_throttle:
+            steps = int((now - self._last_throttle) / self.recovery_seconds)
+            if steps > 0:
+                self.rate = min(self.base_rate, self.rate + steps * self.base_rate * 0.1)
+                self._last_throttle += steps * self.recovery_seconds
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头 (秒数或 HTTP 日期)，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -5,7 +5,6 @@
 """
 
 import sys
-import time
 from pathlib import Path
 
 # 添加 src 到路径以便导入 (开发模式)
@@ -13,7 +12,11 @@ sys.path.append(str(Path(__file__).parent))
 
 from core.client import YuqueClient, ExportType
 from core.auth import YuqueAuth, LoginStatus
+from core.catalog import CatalogTree
 from core.exporter import DocumentExporter
+from core.metrics import StageStats
+from core.pipeline import iter_polled
+from core.poller import ExportPoller
 from utils.browser import BrowserManager
 from ui.console import UI
 
@@ -29,10 +32,14 @@ class Application:
         """启动流程"""
         UI.print_banner()
         
-        # 1. 默认无头启动
-        UI.info("正在初始化浏览器环境...")
-        self.page = self.browser_manager.start(headless=True)
-        self.client = YuqueClient(self.page)
+        # 1. 本地凭证有效时使用无浏览器模式，否则无头启动浏览器
+        if self.auth.has_valid_cookies():
+            UI.info("检测到本地凭证，使用无浏览器模式...")
+            self.client = YuqueClient(None)
+        else:
+            UI.info("正在初始化浏览器环境...")
+            self.page = self.browser_manager.start(headless=True)
+            self.client = YuqueClient(self.page)
         
         # 2. 检查登录
         self.check_login()
@@ -42,7 +49,8 @@ class Application:
         
     def check_login(self):
         """检查并处理登录"""
-        status = self.auth.check_login_status(self.page)
+        # 优先使用缓存 / 轻量 API 校验，结果不明确时才加载页面
+        status = self.client.verify_login()
         
         if status != LoginStatus.LOGGED_IN:
             UI.warning("检测到未登录或会话已过期")
@@ -64,11 +72,10 @@ class Application:
         
         if self.client.login():
             UI.success("登录成功！即将切换回后台模式...")
-            time.sleep(2)
-            # 切换回无头模式
-            self.page = self.browser_manager.restart_headless()
-            self.auth.load_cookies(self.page) # 关键修复：切换模式后重新注入 cookies
-            self.client = YuqueClient(self.page)
+            # cookies 已保存到本地，关闭浏览器并切换为无浏览器模式
+            self.browser_manager.quit()
+            self.page = None
+            self.client = YuqueClient(None)
         else:
             UI.error("登录失败")
             sys.exit(1)
@@ -129,12 +136,27 @@ class Application:
         fmt_choice = UI.ask_choice("选择导出格式:", list(format_map.keys()))
         export_type = format_map[fmt_choice]
         
+        # Select Concurrency
+        concurrency_map = {
+            "1 (逐篇导出)": 1,
+            "4": 4,
+            "8": 8,
+            "16": 16
+        }
+        concurrency_choice = UI.ask_choice("同时导出的文档数:", list(concurrency_map.keys()))
+        concurrency = concurrency_map.get(concurrency_choice, 1)
+        
         # Process each repo
         for repo in selected_repos:
-            self.process_repo_export(repo, export_type)
+            self.process_repo_export(repo, export_type, concurrency=concurrency)
 
-    def process_repo_export(self, repo, export_type):
-        """处理单个知识库导出"""
+    def process_repo_export(self, repo, export_type, concurrency=1):
+        """
+        处理单个知识库导出
+        
+        Args:
+            concurrency: 同时下载的文档数；大于 1 时由集中式轮询器调度导出
+        """
         UI.info(f"正在分析知识库: {repo.name}")
         
         # Get Catalog
@@ -143,6 +165,13 @@ class Application:
             UI.error(f"无法获取 [{repo.name}] 的目录结构")
             # Fallback to get_documents? No, catalog is better for structure.
             return
+        
+        # 一次构建目录树索引 (层级、路径、子树查询)
+        try:
+            tree = CatalogTree(nodes)
+        except ValueError as e:
+            UI.error(f"[{repo.name}] 目录结构异常: {e}")
+            return
 
         # Group Filtering Option
         export_scope = UI.ask_choice(
@@ -155,50 +184,22 @@ class Application:
         if export_scope == "全部文档":
             target_docs = nodes
         else:
-            # 构建节点树形展示列表
-            # 1. 整理层级关系
-            node_map = {n.uuid: n for n in nodes}
-            children_map = {}
-            roots = []
-            
-            for node in nodes:
-                children_map.setdefault(node.uuid, [])
-                if node.parent_uuid and node.parent_uuid in node_map:
-                    children_map.setdefault(node.parent_uuid, []).append(node)
-                else:
-                    roots.append(node)
-            
-            # 2. 递归生成选项表 (扁平化带缩进)
+            # 1. 生成选项表 (按目录顺序先序遍历，扁平化带缩进)
             choices = []
-            
-            def add_nodes_to_choices(node_list, level=0):
-                # 排序: 标题优先 (TITLE) ? 还是按 default 顺序
-                # assuming node_list is already sorted by API or we sort them
-                # node_list.sort(key=lambda x: x.id) 
-                
-                for node in node_list:
-                    indent = "  " * level
-                    icon = "📂" if node.type == "TITLE" else "📄"
-                    display_name = f"{indent}{icon} {node.title}"
-                    
-                    choices.append({
-                        "name": display_name,
-                        "value": node,
-                        "checked": False
-                    })
-                    
-                    # Process children
-                    children = children_map.get(node.uuid, [])
-                    if children:
-                        add_nodes_to_choices(children, level + 1)
-
-            add_nodes_to_choices(roots)
+            for node, level in tree.walk():
+                indent = "  " * level
+                icon = "📂" if node.type == "TITLE" else "📄"
+                choices.append({
+                    "name": f"{indent}{icon} {node.title}",
+                    "value": node,
+                    "checked": False
+                })
             
             if not choices:
                 UI.warning("该知识库似乎为空")
                 return
 
-            # 3. 用户选择
+            # 2. 用户选择
             UI.info("💡 提示: 选择[分组]会自动包含其下所有文档")
             selected_nodes = UI.ask_checkbox(
                 "请选择要导出的内容 (支持多选):",
@@ -208,20 +209,8 @@ class Application:
             if not selected_nodes:
                 return
                 
-            # 4. 智能解析: 如果选中了父节点，自动包含所有子孙节点
-            # 使用集合避免重复
-            final_uuids = set()
-            
-            def collect_descendants(node):
-                final_uuids.add(node.uuid)
-                for child in children_map.get(node.uuid, []):
-                    collect_descendants(child)
-            
-            for node in selected_nodes:
-                collect_descendants(node)
-                
-            # 保持原始顺序导出
-            target_docs = [n for n in nodes if n.uuid in final_uuids]
+            # 3. 智能解析: 如果选中了父节点，自动包含所有子孙节点 (保持原始顺序导出)
+            target_docs = tree.select(n.uuid for n in selected_nodes)
         
         if not target_docs:
             UI.warning("未包含任何有效文档")
@@ -230,87 +219,117 @@ class Application:
         # Begin Export
         UI.info(f"开始导出 {len(target_docs)} 篇文档...")
         
-        # 预计算路径映射
-        path_map = self._build_path_map(nodes)
+        stats = StageStats()
         
         success_count = 0
         with UI.create_progress() as progress:
             main_task = progress.add_task(f"导出 [{repo.name}]", total=len(target_docs))
             
-            # 创建下载任务 (隐藏，用于显示单个文件进度)
+            # 创建下载任务 (隐藏，用于显示单个文件进度；并发模式下不显示)
             download_task = progress.add_task("等待下载...", total=None, visible=False)
             
-            for doc in target_docs:
-                progress.update(main_task, description=f"处理: {doc.title}")
-                
-                # Calculate relative path
-                full_path_str = path_map.get(doc.uuid, "")
+            if concurrency > 1:
+                # 并发模式：集中式轮询器负责触发/轮询，下载线程池负责下载
+                def finish_one(doc, url):
+                    progress.update(main_task, description=f"处理: {doc.title}")
+                    return self._finish_single(repo, doc, export_type, tree, stats, url)
                 
-                if doc.type == "TITLE":
-                    self.exporter.get_save_path(doc, repo.name, relative_path=full_path_str)
+                with ExportPoller(self.client, stats=stats) as poller:
+                    for _, ok in iter_polled(
+                        target_docs,
+                        prepare=lambda doc: None if doc.type == "TITLE" else (doc, export_type),
+                        finish=finish_one,
+                        poller=poller,
+                        download_concurrency=concurrency
+                    ):
+                        if ok:
+                            success_count += 1
+                        progress.advance(main_task)
+            else:
+                for doc in target_docs:
+                    progress.update(main_task, description=f"处理: {doc.title}")
+                    if self._export_single(repo, doc, export_type, tree, stats, progress, download_task):
+                        success_count += 1
                     progress.advance(main_task)
-                    continue
-                
-                path_parts = full_path_str.split("/")
-                relative_dir = "/".join(path_parts[:-1]) if len(path_parts) > 1 else ""
-                
+        
+        UI.success(f"[{repo.name}] 导出完成: {success_count}/{len(target_docs)}")
+        UI.show_stage_stats(stats.summary())
+
+    def _export_single(self, repo, doc, export_type, tree, stats, progress=None, download_task=None):
+        """
+        顺序模式下导出单篇文档 (触发并等待导出完成后保存)
+        
+        Returns:
+            bool | None: 成功/失败，分组节点返回 None (不计入成功数)
+        """
+        url = None
+        if doc.type != "TITLE":
+            with stats.track("export"):
                 url = self.client.export_document(doc, export_type)
-                
-                # Determine extension
-                ext = f".{export_type.value}"
-                if export_type == ExportType.MARKDOWN:
-                    ext = ".md"
+        return self._finish_single(repo, doc, export_type, tree, stats, url, progress, download_task)
 
-                save_path = self.exporter.get_save_path(doc, repo.name, extension=ext, relative_path=relative_dir)
+    def _finish_single(self, repo, doc, export_type, tree, stats, url, progress=None, download_task=None):
+        """
+        根据导出结果保存单篇文档 (创建目录/空文件/下载/写入元数据)
+        
+        Returns:
+            bool | None: 成功/失败，分组节点返回 None (不计入成功数)
+        """
+        if doc.type == "TITLE":
+            self.exporter.get_save_path(doc, repo.name, relative_path=tree.path(doc.uuid))
+            return None
+        
+        relative_dir = tree.dir_path(doc.uuid)
+        
+        # Determine extension
+        ext = f".{export_type.value}"
+        if export_type == ExportType.MARKDOWN:
+            ext = ".md"
 
-                if url == "EMPTY_DOC":
-                    # 创建空文件
-                    # Ensure directory exists
-                    save_path.parent.mkdir(parents=True, exist_ok=True)
-                    save_path.touch()
-                    if export_type == ExportType.MARKDOWN:
-                        # 对于 Markdown，可以写入标题作为元数据，即使内容为空
-                        self.exporter.add_metadata(save_path, doc)
-                    success_count += 1
-                    progress.advance(main_task)
-                    continue
+        save_path = self.exporter.get_save_path(doc, repo.name, extension=ext, relative_path=relative_dir)
 
-                if url:
-                    # 定义回调函数
-                    def update_progress(chunk_size, total=None):
-                        progress.update(download_task, visible=True, description=f"⬇️ {doc.title[:15]}...")
-                        if total:
-                            progress.update(download_task, total=total)
-                        if chunk_size:
-                            progress.advance(download_task, chunk_size)
-                    
-                    # 重置下载任务
-                    progress.reset(download_task, total=None, visible=False)
-                    
-                    if self.client.download_file(url, str(save_path), progress_callback=update_progress):
-                        if export_type == ExportType.MARKDOWN:
-                            self.exporter.add_metadata(save_path, doc)
-                        success_count += 1
-                    
-                    # 隐藏下载任务
-                    progress.update(download_task, visible=False)
-                
-                progress.advance(main_task)
-        
-        UI.success(f"[{repo.name}] 导出完成: {success_count}/{len(target_docs)}")
+        if url == "EMPTY_DOC":
+            # 创建空文件
+            # Ensure directory exists
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            save_path.touch()
+            if export_type == ExportType.MARKDOWN:
+                # 对于 Markdown，可以写入标题作为元数据，即使内容为空
+                self.exporter.add_metadata(save_path, doc)
+            return True
 
-    def _build_path_map(self, nodes):
-        """构建 uuid -> full_path string 映射"""
-        node_map = {n.uuid: n for n in nodes}
-        path_map = {}
-        for node in nodes:
-            parts = []
-            curr = node
-            while curr:
-                parts.insert(0, curr.title)
-                curr = node_map.get(curr.parent_uuid)
-            path_map[node.uuid] = "/".join(parts)
-        return path_map
+        if not url:
+            return False
+        
+        update_progress = None
+        if progress is not None:
+            # 定义回调函数
+            def update_progress(chunk_size, total=None):
+                progress.update(download_task, visible=True, description=f"⬇️ {doc.title[:15]}...")
+                if total:
+                    progress.update(download_task, total=total)
+                if chunk_size:
+                    progress.advance(download_task, chunk_size)
+            
+            # 重置下载任务
+            progress.reset(download_task, total=None, visible=False)
+        
+        # Markdown 的 Front Matter 在下载时直接写在正文之前
+        header_writer = None
+        if export_type == ExportType.MARKDOWN:
+            header_writer = self.exporter.front_matter_writer(doc)
+        
+        with stats.track("download"):
+            ok = self.client.download_file(
+                url, str(save_path),
+                progress_callback=update_progress,
+                header_writer=header_writer
+            )
+        
+        if progress is not None:
+            # 隐藏下载任务
+            progress.update(download_task, visible=False)
+        return ok
 
     def show_account_info(self):
         info = self.auth.CREDENTIALS_DIR
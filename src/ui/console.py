@@ -126,6 +126,23 @@ class UI:
             
         console.print(table)
         
+    @staticmethod
+    def show_stage_stats(summary: dict):
+        """展示分阶段吞吐统计 (StageStats.summary 的结果)"""
+        stages = summary.get("stages", {})
+        if not stages:
+            return
+        table = Table(title=f"⏱️ 阶段统计 (总耗时 {summary.get('wall_seconds', 0)}s)")
+        table.add_column("阶段", style="cyan")
+        table.add_column("次数", justify="right")
+        table.add_column("平均耗时(s)", justify="right")
+        table.add_column("吞吐(篇/s)", justify="right")
+        
+        for name, entry in stages.items():
+            table.add_row(name, str(entry["count"]), str(entry["avg_seconds"]), str(entry["per_second"]))
+            
+        console.print(table)
+        
     @staticmethod
     def create_progress():
         return Progress(